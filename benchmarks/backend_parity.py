@@ -0,0 +1,89 @@
+# benchmarks/backend_parity.py
+# 用法: python -m benchmarks.backend_parity [--data data/test_tram.csv] [--limit N]
+# 对比 torch fp32 / ONNX Runtime / ONNX int8 三种推理后端：
+#   - query 向量与 fp32 的 cosine
+#   - 同一批候选上 Cross-Encoder 分数的漂移，以及精排后 top-TOP_K_RERANK 的重合度
+#   - 端到端检索结果 top-TOP_K_RERANK 的重合度
+#   - 编码 / 精排耗时
+
+import argparse
+import gc
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import TOP_K_RERANK
+from mitre.inference_backend import BACKENDS
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+
+
+def top_overlap(a, b, k):
+    return np.mean([len({t for t, _ in x[:k]} & {t for t, _ in y[:k]}) / max(1, min(k, len(x))) for x, y in zip(a, b)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/test_tram.csv")
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    sep = "\t" if args.data.endswith(".tsv") else ","
+    texts = list(pd.read_csv(args.data, sep=sep)["text1"].head(args.limit))
+
+    reference = {}
+    rows = []
+    for backend in BACKENDS:
+        # 关闭分数缓存，否则精排耗时和分数都来自缓存
+        kb = MITREKnowledgeBase(backend=backend, use_rerank_cache=False)
+        retriever = RAGRetriever(kb)
+
+        kb.encode(texts[:2])  # 预热：加载模型 / 首次导出不计入耗时
+        start = time.perf_counter()
+        q_embs = retriever.embed_queries(texts)
+        encode_time = time.perf_counter() - start
+
+        if backend == "torch":
+            # 所有后端都在 fp32 给出的同一批候选上精排，分数才能逐个对比
+            reference["candidates"] = retriever.rerank_candidates_batch(texts, query_embs=q_embs)
+        candidates = reference["candidates"]
+
+        kb.rerank_batch(texts[:2], candidates[:2])
+        start = time.perf_counter()
+        reranked = kb.rerank_batch(texts, candidates)
+        rerank_time = time.perf_counter() - start
+
+        final = [
+            [(r["technique_id"], 0.0) for r in result]
+            for result in retriever.retrieve_batch(texts, query_embs=q_embs)
+        ]
+
+        if backend == "torch":
+            reference.update(q_embs=q_embs, reranked=reranked, final=final)
+        ref_q = reference["q_embs"]
+        cosine = np.sum(q_embs * ref_q, axis=1) / (
+            np.linalg.norm(q_embs, axis=1) * np.linalg.norm(ref_q, axis=1) + 1e-12)
+        drift = [
+            abs(score - dict(ref)[tid])
+            for got, ref in zip(reranked, reference["reranked"]) for tid, score in got
+        ]
+        rows.append((
+            backend, float(cosine.mean()), float(np.mean(drift)), float(np.max(drift)),
+            top_overlap(reranked, reference["reranked"], TOP_K_RERANK),
+            top_overlap(final, reference["final"], TOP_K_RERANK),
+            1000 * encode_time / len(texts), 1000 * rerank_time / len(texts),
+        ))
+
+        del kb, retriever
+        gc.collect()
+
+    print(f"{len(texts)} queries from {args.data}, top-{TOP_K_RERANK}")
+    print(f"{'backend':<11}{'q-cos':>8}{'drift-avg':>11}{'drift-max':>11}"
+          f"{'rerank@k':>10}{'final@k':>9}{'enc ms/q':>10}{'rr ms/q':>9}")
+    for backend, cos, d_avg, d_max, rr, fin, enc, rrt in rows:
+        print(f"{backend:<11}{cos:>8.4f}{d_avg:>11.4f}{d_max:>11.4f}{rr:>10.3f}{fin:>9.3f}{enc:>10.1f}{rrt:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# benchmarks/cascade_report.py
+# 用法: python -m benchmarks.cascade_report [--data data/tram_train.tsv] [--limit N] [--margin M]
+# 对比 单级精排 / 级联精排 / 提前退出 / 级联 + 提前退出：
+#   每条 query 平均送进 Cross-Encoder 的 pair 数、耗时，以及检索准确率（top-1 命中、recall@TOP_K_RERANK）相对基线的变化。
+# 准确率按检索结果计算（不调用 LLM）。
+
+import argparse
+import time
+
+from config import TOP_K_RERANK, CASCADE_KEEP
+from evaluator.metrics import recall_at_k
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+from benchmarks.recall_report import load_labeled
+
+
+def evaluate(retriever, texts, labels, candidates):
+    start = time.perf_counter()
+    reranked = retriever._rerank(texts, candidates)
+    elapsed = time.perf_counter() - start
+
+    top1 = hits = total = 0
+    for label, ranked in zip(labels, reranked):
+        ids = [tid for tid, _ in ranked[:TOP_K_RERANK]]
+        top1 += bool(ids) and ids[0] in set(label)
+        h, t = recall_at_k(label, ids, TOP_K_RERANK)
+        hits += h
+        total += t
+    return top1 / len(texts), hits / total if total else 0.0, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/tram_train.tsv")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--keep", type=int, default=CASCADE_KEEP)
+    parser.add_argument("--margin", type=float, default=5.0, help="提前退出的检索分数差阈值")
+    args = parser.parse_args()
+
+    texts, labels = load_labeled(args.data, args.limit)
+    # 关闭分数缓存，保证每种配置都真实计算
+    kb = MITREKnowledgeBase(use_rerank_cache=False)
+    candidates = RAGRetriever(kb).rerank_candidates_batch(texts)
+
+    configs = [
+        ("single-stage", dict(cascade=False)),
+        ("cascade", dict(cascade=True, cascade_keep=args.keep)),
+        ("early-exit", dict(cascade=False, early_exit_on_id=True, early_exit_margin=args.margin)),
+        ("cascade+exit", dict(cascade=True, cascade_keep=args.keep,
+                              early_exit_on_id=True, early_exit_margin=args.margin)),
+    ]
+
+    print(f"{len(texts)} queries from {args.data}, top-{TOP_K_RERANK}")
+    print(f"{'config':<14}{'exit%':>7}{'light/q':>9}{'heavy/q':>9}{'ms/q':>8}"
+          f"{'top1':>8}{'Δtop1':>8}{'recall':>8}{'Δrecall':>9}")
+    baseline = None
+    for name, kwargs in configs:
+        retriever = RAGRetriever(kb, **{"early_exit_on_id": False, "early_exit_margin": None, **kwargs})
+        top1, recall, elapsed = evaluate(retriever, texts, labels, candidates)
+        if baseline is None:
+            baseline = (top1, recall)
+        report = retriever.rerank_report()
+        print(
+            f"{name:<14}{100 * report['early_exit_rate']:>7.1f}{report['first_stage_pairs_per_query']:>9.1f}"
+            f"{report['heavy_pairs_per_query']:>9.1f}{1000 * elapsed / len(texts):>8.1f}"
+            f"{top1:>8.3f}{top1 - baseline[0]:>+8.3f}{recall:>8.3f}{recall - baseline[1]:>+9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/dense_index_report.py
+# 用法: python -m benchmarks.dense_index_report [--queries data/tram_train.tsv] [--limit N] [--scale S]
+# 对比 DenseIndex 各模式（float32 / float16 / int8，归一化与否，IVF）的内存、QPS、以及相对精确 float32 检索的 recall@k
+# --scale S 把技术向量加噪声复制 S 倍，模拟合并 enterprise + mobile + 自定义技术集合后的规模
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from mitre.dense_index import DenseIndex
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+
+TOP_K = 100
+
+MODES = [
+    # (名称, dtype, normalize, n_clusters)
+    ("f32", "float32", False, 0),
+    ("f16", "float16", False, 0),
+    ("int8", "int8", False, 0),
+    ("f32-norm", "float32", True, 0),
+    ("f16-norm", "float16", True, 0),
+    ("int8-norm", "int8", True, 0),
+    ("ivf-f32-norm", "float32", True, -1),
+    ("ivf-int8-norm", "int8", True, -1),
+]
+
+
+def build_queries(kb, path, limit, rng):
+    if path is None:
+        # 不加载模型：用技术向量加噪声当 query
+        base = np.asarray(kb.embeddings, dtype=np.float32)
+        picks = base[rng.choice(len(base), limit, replace=True)]
+        return picks + rng.normal(scale=base.std(), size=picks.shape).astype(np.float32)
+    sep = "\t" if path.endswith(".tsv") else ","
+    texts = list(pd.read_csv(path, sep=sep)["text1"].head(limit))
+    return RAGRetriever(kb).embed_queries(texts)
+
+
+def overlap(a, b, k):
+    return np.mean([len(set(x[:k]) & set(y[:k])) / k for x, y in zip(a, b)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", default=None, help="带 text1 列的数据文件；不传则用合成 query")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--probe", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    kb = MITREKnowledgeBase()
+    queries = build_queries(kb, args.queries, args.limit, rng)
+
+    vectors = np.asarray(kb.embeddings, dtype=np.float32)
+    if args.scale > 1:
+        noise = rng.normal(scale=vectors.std() * 0.3, size=(args.scale - 1,) + vectors.shape)
+        vectors = np.concatenate([vectors] + list((vectors + noise).astype(np.float32)), axis=0)
+    n_clusters = int(np.sqrt(len(vectors))) * 2
+
+    exact = {}
+    for normalize in (False, True):
+        exact[normalize], _ = DenseIndex(vectors, "float32", normalize).search(queries, TOP_K)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, top-{TOP_K}")
+    print(f"{'mode':<15}{'MB':>9}{'qps':>10}{'R@10':>8}{'R@100':>8}{'R@10 vs raw f32':>17}")
+    for name, dtype, normalize, clusters in MODES:
+        index = DenseIndex(vectors, dtype, normalize,
+                           n_clusters=n_clusters if clusters < 0 else clusters, n_probe=args.probe)
+        found = []
+        start = time.perf_counter()
+        for i in range(0, len(queries), 64):
+            idx, _ = index.search(queries[i:i + 64], TOP_K)
+            found.append(idx)
+        elapsed = time.perf_counter() - start
+        found = np.concatenate(found, axis=0)
+        print(
+            f"{name:<15}{index.nbytes / 2 ** 20:>9.2f}{len(queries) / elapsed:>10.0f}"
+            f"{overlap(found, exact[normalize], 10):>8.3f}{overlap(found, exact[normalize], 100):>8.3f}"
+            f"{overlap(found, exact[False], 10):>17.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
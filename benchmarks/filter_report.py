@@ -0,0 +1,79 @@
+# benchmarks/filter_report.py
+# 用法: python -m benchmarks.filter_report [--backend stub] [--data data/tram_train.tsv] [--limit 1000]
+# tactic / platform 过滤检索 (RAGRetriever.retrieve_batch(..., tactics=..., platforms=...)) 的正确性和耗时：
+#   - 正确性：与“不过滤的流程、每一步截断前剔除分片外技术”的参照实现逐条比较（参照实现向量检索取全量再过滤）
+#   - 耗时：过滤检索 vs 不过滤检索的 queries/sec，以及每条 query 送进 Cross-Encoder 的 pair 数
+# 关闭精排分数缓存和 query 记忆化，每次都真实计算。
+
+import argparse
+import time
+
+import pandas as pd
+
+from config import TOP_K_EMBED
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+from utils.instrument import metrics
+from utils.lru import QueryMemo
+from benchmarks import stub_backend
+
+FILTERS = [
+    {"tactics": ["initial-access"]},
+    {"tactics": ["defense-evasion"]},
+    {"tactics": ["credential-access", "discovery"]},
+    {"platforms": ["Linux"]},
+    {"platforms": ["Windows"]},
+    {"tactics": ["persistence"], "platforms": ["Linux"]},
+]
+
+
+class PostFilterRetriever(RAGRetriever):
+    """参照实现：向量检索对全部技术打分，过滤后再取 TOP_K_EMBED。"""
+
+    def _dense_candidates(self, query_embs, partition=None):
+        full = self.kb.dense_search_batch(query_embs, top_k=len(self.kb.tech_ids))
+        if partition is None:
+            return [ranked[:TOP_K_EMBED] for ranked in full]
+        return [[c for c in ranked if c[0] in partition.allowed][:TOP_K_EMBED] for ranked in full]
+
+
+def _timed(retriever, texts, **filters):
+    metrics.reset()
+    start = time.perf_counter()
+    results = retriever.retrieve_batch(texts, **filters)
+    elapsed = time.perf_counter() - start
+    pairs = metrics.to_dict()["counters"].get("rerank.pairs_total", 0)
+    return results, len(texts) / elapsed, pairs / len(texts)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="stub")
+    parser.add_argument("--data", default="data/tram_train.tsv")
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+    stub_backend.register()
+
+    sep = "\t" if args.data.endswith(".tsv") else ","
+    texts = list(pd.read_csv(args.data, sep=sep)["text1"].dropna().astype(str).head(args.limit))
+    kb = MITREKnowledgeBase(backend=args.backend, use_rerank_cache=False)
+    retriever = RAGRetriever(kb, memo=QueryMemo(0))
+    reference = PostFilterRetriever(kb, memo=QueryMemo(0))
+    # 预热：加载模型、预切描述 token、构建分片
+    retriever.retrieve_batch(["warmup"])
+    retriever.retrieve_batch(["warmup"], tactics=["execution"])
+
+    _, base_qps, base_pairs = _timed(retriever, texts)
+    print(f"\n{len(texts)} queries from {args.data}, backend {args.backend}")
+    print(f"{'filter':<44}{'techs':>6}{'qps':>9}{'speedup':>9}{'pairs/q':>9}{'equal':>7}")
+    print(f"{'(none)':<44}{len(kb.tech_ids):>6}{base_qps:>9.1f}{1.0:>9.2f}{base_pairs:>9.1f}{'':>7}")
+    for filters in FILTERS:
+        results, qps, pairs = _timed(retriever, texts, **filters)
+        expected = reference.retrieve_batch(texts, **filters)
+        label = " ".join(f"{k}={','.join(v)}" for k, v in filters.items())
+        size = len(kb.partitions.get(**filters))
+        print(f"{label:<44}{size:>6}{qps:>9.1f}{qps / base_qps:>9.2f}{pairs:>9.1f}{str(results == expected):>7}")
+
+
+if __name__ == "__main__":
+    main()
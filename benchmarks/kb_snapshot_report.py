@@ -0,0 +1,94 @@
+# benchmarks/kb_snapshot_report.py
+# 用法: python -m benchmarks.kb_snapshot_report [--repeat 5]
+# 知识库加载方式对比：解析 JSON vs mmap 打开编译好的快照 (mitre/snapshot.py)。
+# 每次测量都在新的 spawn 子进程里做，报告：
+#   - 加载耗时（不含 import）
+#   - 加载后访问一遍所有 name / description / tactics 的耗时（快照的大字段是按需解码的）
+#   - 常驻内存增量：RSS 总量，以及其中的匿名页 (RssAnon，进程私有) 和文件页 (RssFile，mmap 可被多个 worker 共享)
+#   - tracemalloc 统计的 Python 堆峰值（单独一次运行，tracemalloc 会拖慢计时）
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+import tracemalloc
+
+from config import MITRE_KNOWLEDGE_BASE, FILTER_ICS, EMBEDDING_CACHE_DIR
+
+
+def _rss_kb():
+    """(VmRSS, RssAnon, RssFile)，单位 KB；非 Linux 时后两项为 0。"""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return tuple(int(fields.get(k, "0 kB").split()[0]) for k in ("VmRSS", "RssAnon", "RssFile"))
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 0, 0
+
+
+def _measure(mode, trace=False):
+    from mitre.knowledge_base import file_sha256
+    from mitre.snapshot import load_snapshot, load_techniques_json
+
+    sha = file_sha256(MITRE_KNOWLEDGE_BASE)
+    before = _rss_kb()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if mode == "json":
+        techniques = load_techniques_json(MITRE_KNOWLEDGE_BASE, FILTER_ICS)
+    else:
+        techniques = load_snapshot(MITRE_KNOWLEDGE_BASE, sha, FILTER_ICS, EMBEDDING_CACHE_DIR)[0].techniques
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chars = 0
+    for info in techniques.values():
+        chars += len(info["name"]) + len(info["description"]) + len(info.get("tactics", []))
+    touch_time = time.perf_counter() - start
+    heap_peak = 0
+    if trace:
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    after = _rss_kb()
+    return {
+        "techniques": len(techniques),
+        "load_ms": 1000 * load_time,
+        "touch_ms": 1000 * touch_time,
+        "rss_kb": after[0] - before[0],
+        "anon_kb": after[1] - before[1],
+        "file_kb": after[2] - before[2],
+        "heap_peak_kb": heap_peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式测几次，取中位数")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        # 确保快照已经存在，构建时间不计入加载耗时
+        pool.apply(_measure, ("snapshot",))
+
+    print(f"{MITRE_KNOWLEDGE_BASE} ({os.path.getsize(MITRE_KNOWLEDGE_BASE) / 1024:.0f} KB), "
+          f"median of {args.repeat} fresh processes")
+    print(f"{'mode':<10}{'techs':>7}{'load ms':>10}{'touch ms':>10}{'RSS KB':>9}{'anon KB':>9}"
+          f"{'file KB':>9}{'heap KB':>9}")
+    for mode in ("json", "snapshot"):
+        runs = []
+        for _ in range(args.repeat):
+            with ctx.Pool(1, maxtasksperchild=1) as pool:
+                runs.append(pool.apply(_measure, (mode,)))
+        m = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        with ctx.Pool(1, maxtasksperchild=1) as pool:
+            m["heap_peak_kb"] = pool.apply(_measure, (mode, True))["heap_peak_kb"]
+        print(f"{mode:<10}{m['techniques']:>7.0f}{m['load_ms']:>10.2f}{m['touch_ms']:>10.2f}{m['rss_kb']:>9.0f}"
+              f"{m['anon_kb']:>9.0f}{m['file_kb']:>9.0f}{m['heap_peak_kb']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
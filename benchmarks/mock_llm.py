@@ -0,0 +1,159 @@
+# benchmarks/mock_llm.py
+# 本地 chat-completions 桩服务，代替 GPT_API_URL 做压测 / 离线评测，不消耗 API 额度：
+#   python -m benchmarks.mock_llm [--port 8001] [--latency 0.3]
+# 然后 LLMClient(api_url="http://127.0.0.1:8001/v1/chat/completions")。
+# 应答固定选候选列表里的 Rank 1（打包 prompt 按条返回数组），按 prompt 长度模拟 usage.prompt_tokens；
+# --latency / --token-latency 模拟网络 + 生成耗时。请求带 "stream": true 时按 SSE 逐 token 推送，
+# --analysis-chars 把 analysis 填充到指定长度，--prediction-first 让 prediction 排在 analysis 前面，用来测流式的收益。
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANDIDATE_ID_PATTERN = re.compile(r"^ID: (T\d{4}(?:\.\d{3})?)", re.MULTILINE)
+ITEM_PATTERN = re.compile(r"^### Item \d+$", re.MULTILINE)
+
+
+STREAM_TOKEN_CHARS = 4  # 流式响应每个事件推送的字符数（约一个 token）
+
+
+def _pick(section, analysis_chars=0, prediction_first=False):
+    analysis = "mock: picked Rank 1 candidate"
+    analysis += " ..." * max(0, (analysis_chars - len(analysis)) // 4)
+    prediction = CANDIDATE_ID_PATTERN.findall(section)[:1]
+    if prediction_first:
+        return {"prediction": prediction, "analysis": analysis}
+    return {"analysis": analysis, "prediction": prediction}
+
+
+def mock_answer(prompt, analysis_chars=0, prediction_first=False):
+    # 打包 prompt (ttp_mapping_batch_prompt) 每条输入以 "### Item i" 开头，按条返回 JSON 数组
+    sections = ITEM_PATTERN.split(prompt)[1:]
+    if sections:
+        return json.dumps([
+            {"item": i, **_pick(section, analysis_chars, prediction_first)} for i, section in enumerate(sections)
+        ])
+    return json.dumps(_pick(prompt, analysis_chars, prediction_first))
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 头和正文分两次写出，不关 Nagle 时 keep-alive 连接上每个请求会多等一个 delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        prompt = body["messages"][-1]["content"]
+        self.server.record(prompt)
+        answer = mock_answer(prompt, self.server.analysis_chars, self.server.prediction_first)
+        if body.get("stream"):
+            self._stream(answer)
+            return
+        delay = self.server.latency + self.server.token_latency * len(answer) / 4
+        if delay:
+            time.sleep(delay)
+
+        data = json.dumps({
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}}],
+            # 粗略按 4 字符 / token 估计
+            "usage": {"prompt_tokens": len(prompt) // 4},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, answer):
+        """SSE：先等 latency（首 token 延迟），之后每 STREAM_TOKEN_CHARS 个字符一个事件，间隔 token_latency。"""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        pieces = [answer[i:i + STREAM_TOKEN_CHARS] for i in range(0, len(answer), STREAM_TOKEN_CHARS)]
+        events = [
+            {"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]} for piece in pieces
+        ]
+        try:
+            for n, event in enumerate(events):
+                if n and self.server.token_latency:
+                    time.sleep(self.server.token_latency)
+                self._write_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端拿到 prediction 后提前断开
+            self.server.record_cancel()
+            self.close_connection = True
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, token_latency=0.0, analysis_chars=0, prediction_first=False):
+        super().__init__(address, MockLLMHandler)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.analysis_chars = analysis_chars
+        self.prediction_first = prediction_first
+        self.requests = 0
+        self.prompt_chars = 0
+        # 流式响应被客户端中途断开的次数
+        self.cancelled = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompt):
+        with self._lock:
+            self.requests += 1
+            self.prompt_chars += len(prompt)
+
+    def record_cancel(self):
+        with self._lock:
+            self.cancelled += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+
+def start_mock_llm(port=0, latency=0.0, token_latency=0.0, analysis_chars=0, prediction_first=False):
+    """
+    在后台线程启动桩服务（port=0 随机端口），返回 server，server.url 即 API 地址。
+    每个请求耗时 = latency + token_latency * 输出 token 数（按 4 字符 / token 估计）。
+    """
+    server = MockLLMServer(("127.0.0.1", port), latency=latency, token_latency=token_latency,
+                           analysis_chars=analysis_chars, prediction_first=prediction_first)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.3, help="每个请求的模拟耗时（秒）")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="每个输出 token 的模拟生成耗时（秒）")
+    parser.add_argument("--analysis-chars", type=int, default=0, help="analysis 字段填充到的长度")
+    parser.add_argument("--prediction-first", action="store_true", help="prediction 排在 analysis 前面")
+    args = parser.parse_args()
+
+    server = MockLLMServer(("127.0.0.1", args.port), latency=args.latency, token_latency=args.token_latency,
+                           analysis_chars=args.analysis_chars, prediction_first=args.prediction_first)
+    print(f"Mock LLM listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/packing_report.py
+# 用法: python -m benchmarks.packing_report [--data data/test_tram.csv] [--limit N] [--pack-sizes 1,4,8,16]
+# 多条打包 (TTPExtractor.extract_many) 与逐条调用的对比，LLM 用本地桩服务 (benchmarks/mock_llm.py)：
+#   每 1000 行的请求数、prompt token 数（桩服务按 4 字符 / token 估计）、墙钟时间，以及回退为单条调用的条数。
+# 候选只检索一次，所有配置共用。
+
+import argparse
+import time
+
+import pandas as pd
+
+from config import MAX_CONCURRENCY
+from evaluator.runner import ConcurrentRunner
+from llm.llm_client import LLMClient
+from llm.rate_limiter import TokenBucket
+from llm.response_cache import ResponseCache
+from llm.ttp_extractor import TTPExtractor
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+from benchmarks.mock_llm import start_mock_llm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/test_tram.csv")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--pack-sizes", default="1,4,8,16")
+    parser.add_argument("--latency", type=float, default=0.5, help="桩服务每个请求的固定耗时（秒）")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="桩服务每个输出 token 的耗时（秒）")
+    args = parser.parse_args()
+
+    sep = "\t" if args.data.endswith(".tsv") else ","
+    texts = list(pd.read_csv(args.data, sep=sep)["text1"].head(args.limit))
+    retriever = RAGRetriever(MITREKnowledgeBase())
+    candidates_list = retriever.retrieve_batch(texts)
+
+    print(f"{len(texts)} rows from {args.data}, concurrency {MAX_CONCURRENCY}, "
+          f"mock latency {args.latency}s + {args.token_latency}s/token")
+    print(f"{'pack':>5}{'req/1k':>9}{'ptok/1k':>11}{'sec/1k':>9}{'fallback':>10}{'same-as-1':>11}")
+    baseline = None
+    for pack_size in [int(x) for x in args.pack_sizes.split(",")]:
+        mock = start_mock_llm(latency=args.latency, token_latency=args.token_latency)
+        llm = LLMClient(rate_limiter=TokenBucket(1e6), cache=ResponseCache(mode="off"), api_url=mock.url)
+        llm.session.trust_env = False  # 不走 HTTP(S)_PROXY
+        extractor = TTPExtractor(retriever, llm=llm)
+
+        groups = [
+            (texts[i:i + pack_size], candidates_list[i:i + pack_size])
+            for i in range(0, len(texts), pack_size)
+        ]
+        start = time.perf_counter()
+        runner = ConcurrentRunner(max_workers=MAX_CONCURRENCY)
+        predictions = [
+            prediction
+            for results in runner.run(lambda g: extractor.extract_many(g[0], g[1], pack_size=pack_size), groups)
+            for prediction, _, _ in results
+        ]
+        elapsed = time.perf_counter() - start
+
+        baseline = baseline or predictions
+        same = sum(a == b for a, b in zip(predictions, baseline)) / len(texts)
+        scale = 1000 / len(texts)
+        print(f"{pack_size:>5}{mock.requests * scale:>9.0f}{mock.prompt_chars / 4 * scale:>11.0f}"
+              f"{elapsed * scale:>9.1f}{extractor.pack_stats['fallback_items']:>10}{same:>11.3f}")
+        mock.shutdown()
+        mock.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/prompt_budget_report.py
+# 用法: python -m benchmarks.prompt_budget_report [--data data/tram_train.tsv] [--limit N] [--budgets none,1200,800,500]
+# 候选列表 token 预算 (llm/prompt_builder.py) 的效果：每条 prompt 的平均 token 数、保留的候选数，
+# 以及标注的正确技术仍在 prompt 候选列表里的比例（不调用 LLM）。
+
+import argparse
+import time
+
+from config import TOP_K_RERANK
+from evaluator.metrics import recall_at_k
+from llm.prompt_builder import CandidateBlockBuilder
+from llm.prompts import ttp_mapping_cot_prompt
+from llm.token_counter import count_tokens
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+from benchmarks.recall_report import load_labeled
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/tram_train.tsv")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--budgets", default="none,1200,800,500")
+    args = parser.parse_args()
+
+    texts, labels = load_labeled(args.data, args.limit)
+    candidates_list = RAGRetriever(MITREKnowledgeBase()).retrieve_batch(texts)
+
+    print(f"{len(texts)} queries from {args.data}, top-{TOP_K_RERANK} candidates")
+    print(f"{'budget':>8}{'kept':>7}{'cand tok':>10}{'prompt tok':>12}{'recall':>8}{'build µs':>10}")
+    for budget in args.budgets.split(","):
+        builder = CandidateBlockBuilder(token_budget=None if budget == "none" else int(budget))
+        kept_total = cand_tokens = prompt_tokens = hits = total = 0
+        build_time = 0.0
+        for text, label, candidates in zip(texts, labels, candidates_list):
+            start = time.perf_counter()
+            candidates_str, kept, tokens = builder.build(candidates[:TOP_K_RERANK])
+            build_time += time.perf_counter() - start
+            kept_total += len(kept)
+            cand_tokens += tokens
+            prompt_tokens += count_tokens(ttp_mapping_cot_prompt(text=text, candidates=candidates_str))
+            h, t = recall_at_k(label, [c["technique_id"] for c in kept], len(kept))
+            hits += h
+            total += t
+        n = len(texts)
+        print(f"{budget:>8}{kept_total / n:>7.1f}{cand_tokens / n:>10.0f}{prompt_tokens / n:>12.0f}"
+              f"{hits / total if total else 0.0:>8.3f}{1e6 * build_time / n:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
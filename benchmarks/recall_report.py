@@ -0,0 +1,69 @@
+# benchmarks/recall_report.py
+# 用法: python -m benchmarks.recall_report [--data data/tram_train.tsv] [--limit N]
+# 对比 dense-only / sparse-only (BM25) / RRF 融合 三种候选来源在 rerank 之前的 recall@k
+
+import argparse
+import time
+
+import pandas as pd
+
+from config import TOP_K_EMBED, TOP_K_SPARSE, RRF_K
+from evaluator.metrics import parse_ttp_list, recall_at_k
+from mitre.fusion import reciprocal_rank_fusion
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+
+KS = (5, 10, 20, 40, 50, 100)
+
+
+def load_labeled(path, limit=None):
+    sep = "\t" if path.endswith(".tsv") else ","
+    df = pd.read_csv(path, sep=sep)
+    if limit:
+        df = df.head(limit)
+    return list(df["text1"]), [parse_ttp_list(x) for x in df["labels"]]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/tram_train.tsv")
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    texts, labels = load_labeled(args.data, args.limit)
+    kb = MITREKnowledgeBase()
+    retriever = RAGRetriever(kb)
+    depth = max(KS)
+
+    start = time.perf_counter()
+    expanded = [retriever._heuristic_query_expansion(t) for t in texts]
+    dense_lists = kb.dense_search_batch(kb.encode(expanded), top_k=max(depth, TOP_K_EMBED))
+    dense_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sparse_lists = kb.bm25.search_batch(expanded, top_k=max(depth, TOP_K_SPARSE))
+    sparse_time = time.perf_counter() - start
+
+    fused_lists = [
+        reciprocal_rank_fusion([d[:TOP_K_EMBED], s[:TOP_K_SPARSE]], k=RRF_K)
+        for d, s in zip(dense_lists, sparse_lists)
+    ]
+
+    channels = {"dense": dense_lists, "sparse": sparse_lists, "fused": fused_lists}
+    print(f"Recall@k over {len(texts)} rows of {args.data} (before rerank)")
+    print(f"{'channel':<8}" + "".join(f"{'@' + str(k):>9}" for k in KS))
+    for name, lists in channels.items():
+        row = f"{name:<8}"
+        for k in KS:
+            hits = total = 0
+            for label, ranked in zip(labels, lists):
+                h, t = recall_at_k(label, [tid for tid, _ in ranked], k)
+                hits += h
+                total += t
+            row += f"{hits / total if total else 0.0:>9.3f}"
+        print(row)
+    print(f"dense (encode + search): {dense_time:.2f}s, sparse (BM25): {sparse_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
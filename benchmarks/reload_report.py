@@ -0,0 +1,94 @@
+# benchmarks/reload_report.py
+# 用法: python -m benchmarks.reload_report [--backend stub] [--changes 20]
+# 知识库热更新 (MITREKnowledgeBase.reload) 与完整重建的耗时对比：
+# 在临时目录生成一份修改过的知识库 JSON（改 --changes 个技术的描述、新增 1 个、删除 1 个），
+#   reload   已加载的知识库调用 reload()，只重新编码变化的技术
+#   rebuild  用同样内容（metadata 不同，避免命中缓存）新建 MITREKnowledgeBase，全部重新编码
+# 报告变更清单、重新编码的条数和耗时，并确认两者得到相同的技术 ID 顺序和向量。
+# 结束后删除本次生成的快照 / 向量缓存文件。
+
+import argparse
+import copy
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from config import MITRE_KNOWLEDGE_BASE, FILTER_ICS, EMBEDDING_CACHE_DIR
+from mitre.knowledge_base import MITREKnowledgeBase, file_sha256
+from mitre.snapshot import snapshot_path
+from benchmarks import stub_backend
+
+
+def _modified_kb(changes, seed):
+    with open(MITRE_KNOWLEDGE_BASE, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    techniques = data["techniques"]
+    rng = random.Random(seed)
+    tids = sorted(tid for tid in techniques if not tid.startswith("T0"))
+    for tid in rng.sample(tids, changes):
+        techniques[tid]["description"] += " (revised)"
+    removed = rng.choice(tids)
+    del techniques[removed]
+    template = techniques[rng.choice([tid for tid in tids if tid != removed])]
+    techniques["T1999"] = {**copy.deepcopy(template), "technique_id": "T1999", "name": "Synthetic New Technique"}
+    return data
+
+
+def _cache_files(kb):
+    vectors_file, ids_file = kb._embedding_cache_paths()
+    return [vectors_file, ids_file, snapshot_path(EMBEDDING_CACHE_DIR, kb.kb_sha256, FILTER_ICS)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="stub")
+    parser.add_argument("--changes", type=int, default=20, help="修改描述的技术数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    stub_backend.register()
+
+    data = _modified_kb(args.changes, args.seed)
+    created = []
+    with tempfile.TemporaryDirectory() as tmp:
+        reload_path = os.path.join(tmp, "kb_reload.json")
+        rebuild_path = os.path.join(tmp, "kb_rebuild.json")
+        with open(reload_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        data["metadata"] = {**data.get("metadata", {}), "benchmark": "full rebuild"}
+        with open(rebuild_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+        kb = MITREKnowledgeBase(backend=args.backend, use_rerank_cache=False)
+        kb.encode(["warmup"])  # 模型加载不计入两边的耗时
+
+        report = kb.reload(reload_path)
+        created += _cache_files(kb)
+
+        start = time.perf_counter()
+        fresh = MITREKnowledgeBase(backend=args.backend, use_rerank_cache=False, kb_path=rebuild_path)
+        fresh.encode(["warmup"])
+        rebuild_time = time.perf_counter() - start - fresh.load_timings.get("embedding_model", 0.0)
+        created += _cache_files(fresh)
+        assert fresh.kb_sha256 == file_sha256(rebuild_path)
+
+        same = kb.tech_ids == fresh.tech_ids and np.allclose(np.asarray(kb.embeddings), np.asarray(fresh.embeddings))
+
+    for path in created:
+        if os.path.exists(path):
+            os.remove(path)
+
+    print(f"\nbackend {args.backend}, {len(kb.techniques)} techniques")
+    for key in ("added", "removed", "changed"):
+        print(f"  {key:<10}{len(report[key]):>5}  {' '.join(report[key][:10])}{' ...' if len(report[key]) > 10 else ''}")
+    print(f"{'':<10}{'encoded':>9}{'seconds':>10}")
+    print(f"{'reload':<10}{report['reembedded']:>9}{report['seconds']:>10.3f}")
+    print(f"{'rebuild':<10}{len(fresh.tech_ids):>9}{rebuild_time:>10.3f}")
+    print(f"same ids and vectors: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/scaling_report.py
+# 用法: python -m benchmarks.scaling_report [--data data/test_tram.csv] [--limit N] [--max-workers N]
+# 多进程分片的扩展效率：1, 2, 4, ... 个 worker 分别跑同一批 query 的检索 + 精排（不调用 LLM），
+# 报告吞吐和扩展效率 = (T1 / TN) / N。模型加载时间单独列出，不计入吞吐。
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from evaluator.sharding import pin_threads, threads_per_worker
+
+
+def _retrieve_shard(texts, num_workers):
+    pin_threads(threads_per_worker(num_workers))
+
+    from mitre.knowledge_base import MITREKnowledgeBase
+    from mitre.rag_retriever import RAGRetriever
+    from utils.lru import QueryMemo
+
+    start = time.perf_counter()
+    # 关闭分数缓存和 query 记忆化，否则后面几轮的结果都来自缓存
+    retriever = RAGRetriever(MITREKnowledgeBase(use_rerank_cache=False), memo=QueryMemo(0))
+    retriever.retrieve_batch(texts[:2])  # 预热：加载模型
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    retriever.retrieve_batch(texts)
+    return load_time, time.perf_counter() - start
+
+
+def run(texts, num_workers):
+    shards = [texts[i::num_workers] for i in range(num_workers)]
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx) as pool:
+        results = list(pool.map(_retrieve_shard, shards, [num_workers] * num_workers))
+    load_time = max(r[0] for r in results)
+    # 各 worker 同时开始计时，最慢的一片决定整体耗时
+    return load_time, max(r[1] for r in results)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/test_tram.csv")
+    parser.add_argument("--limit", type=int, default=512)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    sep = "\t" if args.data.endswith(".tsv") else ","
+    texts = list(pd.read_csv(args.data, sep=sep)["text1"].head(args.limit))
+
+    # 先在父进程里算好技术 Embedding 缓存，各 worker 只做 mmap
+    from mitre.knowledge_base import MITREKnowledgeBase
+    MITREKnowledgeBase(use_rerank_cache=False)
+
+    counts = []
+    n = 1
+    while n <= args.max_workers:
+        counts.append(n)
+        n *= 2
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    print(f"{len(texts)} queries from {args.data}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8}{'threads':>9}{'load s':>9}{'run s':>9}{'q/s':>9}{'speedup':>9}{'eff':>7}")
+    base = None
+    for n in counts:
+        load_time, elapsed = run(texts, n)
+        base = base or elapsed
+        speedup = base / elapsed
+        print(f"{n:>8}{threads_per_worker(n):>9}{load_time:>9.1f}{elapsed:>9.2f}"
+              f"{len(texts) / elapsed:>9.1f}{speedup:>9.2f}{speedup / n:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/service_load.py
+# 用法: python -m benchmarks.service_load [--data data/test_tram.csv] [--requests N] [--concurrency C]
+# 抽取服务压测：本进程内启动 LLM 桩服务 (benchmarks/mock_llm.py) 和抽取服务，
+# 用 C 个并发客户端发 N 个 /extract 请求，报告 p50 / p99 延迟、吞吐和平均微批次大小。
+# --max-batch-size 1 即为不做微批次的对照组。
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+
+from config import SERVICE_MAX_BATCH_SIZE, SERVICE_MAX_WAIT_MS
+from llm.llm_client import LLMClient
+from llm.rate_limiter import TokenBucket
+from llm.response_cache import ResponseCache
+from service.server import ExtractionService, ExtractionServer
+from benchmarks.mock_llm import start_mock_llm
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default="data/test_tram.csv")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="桩服务每个请求的模拟耗时（秒）")
+    parser.add_argument("--max-batch-size", type=int, default=SERVICE_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=SERVICE_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    sep = "\t" if args.data.endswith(".tsv") else ","
+    texts = list(pd.read_csv(args.data, sep=sep)["text1"].head(args.requests))
+
+    mock = start_mock_llm(latency=args.llm_latency)
+    # 关闭 LLM 响应缓存，否则重复文本直接命中缓存；限流放开到不成为瓶颈
+    llm = LLMClient(rate_limiter=TokenBucket(1e6), cache=ResponseCache(mode="off"), api_url=mock.url)
+    service = ExtractionService(llm=llm, max_batch_size=args.max_batch_size,
+                                max_wait_ms=args.max_wait_ms, max_concurrency=args.concurrency)
+    service.warmup()
+    server = ExtractionServer(service, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    local = threading.local()
+
+    def call(text):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            local.session.trust_env = False  # 不走 HTTP(S)_PROXY
+        start = time.perf_counter()
+        resp = local.session.post(f"{server.url}/extract", json={"text": text}, timeout=120)
+        resp.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = np.array(list(pool.map(call, texts)))
+    elapsed = time.perf_counter() - start
+
+    batcher = service.batcher.stats()
+    print(f"{len(texts)} requests, concurrency {args.concurrency}, mock LLM latency {args.llm_latency:.2f}s, "
+          f"max batch {args.max_batch_size} / wait {args.max_wait_ms}ms")
+    print(f"p50 {1000 * np.percentile(latencies, 50):.1f} ms, p99 {1000 * np.percentile(latencies, 99):.1f} ms, "
+          f"mean {1000 * latencies.mean():.1f} ms")
+    print(f"throughput {len(texts) / elapsed:.2f} req/s, avg retrieval batch {batcher['avg_batch_size']:.1f} "
+          f"({batcher['batches']} batches), LLM calls {mock.requests}")
+
+    server.shutdown()
+    server.server_close()
+    service.close()
+    mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
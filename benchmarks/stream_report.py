@@ -0,0 +1,88 @@
+# benchmarks/stream_report.py
+# 用法: python -m benchmarks.stream_report [--requests 5] [--latency 0.3] [--token-latency 0.005] [--analysis-chars 600]
+# 流式响应 (LLM_STREAM) 的 time-to-prediction，LLM 用本地 SSE 桩服务 (benchmarks/mock_llm.py)，不需要网络：
+#   full      非流式，等整个响应
+#   stream    流式，prediction 闭合时记下时间，照常读完
+#   stop      流式，prediction 到齐即断开 (LLM_STREAM_STOP_AFTER_PREDICTION)
+# 分别在 analysis 在前（当前 prompt 要求的顺序）和 prediction 在前两种输出顺序下测，单条和打包 prompt 各一组。
+# 报告 llm.time_to_prediction（打包 prompt 为第一条的 prediction）/ llm.request 的平均耗时、提前断开的请求数，
+# 以及解析出的 prediction 是否与非流式一致。
+
+import argparse
+
+from llm.llm_client import LLMClient
+from llm.prompt_builder import CandidateBlockBuilder
+from llm.prompts import ttp_mapping_cot_prompt, ttp_mapping_batch_prompt
+from llm.rate_limiter import TokenBucket
+from llm.response_cache import ResponseCache
+from llm.ttp_extractor import clean_json_response
+from utils.instrument import metrics
+from benchmarks.mock_llm import start_mock_llm
+
+MODES = {"full": (False, False), "stream": (True, False), "stop": (True, True)}
+
+
+def _prompts(n, pack):
+    builder = CandidateBlockBuilder()
+    prompts = []
+    for i in range(n):
+        items = []
+        for j in range(pack):
+            candidates = [
+                {"technique_id": f"T{1000 + (i * pack + j + r) % 900}", "name": f"Technique {r}",
+                 "description": "Mock description. " * 10, "tactics": ["execution"]}
+                for r in range(10)
+            ]
+            items.append((f"Sample text {i}.{j}", builder.build(candidates)[0]))
+        if pack == 1:
+            prompts.append(ttp_mapping_cot_prompt(text=items[0][0], candidates=items[0][1]))
+        else:
+            prompts.append(ttp_mapping_batch_prompt(items))
+    return prompts
+
+
+def _predictions(response):
+    data = clean_json_response(response)
+    entries = data if isinstance(data, list) else [data]
+    return [entry["prediction"] for entry in entries]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--pack-size", type=int, default=4, help="打包 prompt 的条数")
+    parser.add_argument("--latency", type=float, default=0.3, help="首 token 延迟（秒）")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="每个输出 token 的生成耗时（秒）")
+    parser.add_argument("--analysis-chars", type=int, default=600, help="每条 analysis 的长度")
+    args = parser.parse_args()
+
+    print(f"mock latency {args.latency}s + {args.token_latency}s/token, analysis {args.analysis_chars} chars, "
+          f"{args.requests} requests per row")
+    print(f"{'order':<18}{'prompt':<10}{'mode':<8}{'to-pred ms':>11}{'request ms':>11}{'cancelled':>10}{'same':>6}")
+    for prediction_first in (False, True):
+        mock = start_mock_llm(latency=args.latency, token_latency=args.token_latency,
+                              analysis_chars=args.analysis_chars, prediction_first=prediction_first)
+        llm = LLMClient(rate_limiter=TokenBucket(1e6), cache=ResponseCache(mode="off"), api_url=mock.url)
+        llm.session.trust_env = False  # 不走 HTTP(S)_PROXY
+        order = "prediction-first" if prediction_first else "analysis-first"
+        for pack in (1, args.pack_size):
+            prompts = _prompts(args.requests, pack)
+            reference = None
+            for mode, (stream, stop) in MODES.items():
+                metrics.reset()
+                predictions = [
+                    _predictions(llm.ask(p, stream=stream, stop_after_prediction=stop, expected_predictions=pack))
+                    for p in prompts
+                ]
+                reference = reference or predictions
+                data = metrics.to_dict()
+                timers = data["timers_seconds"]
+                print(f"{order:<18}{'single' if pack == 1 else f'pack {pack}':<10}{mode:<8}"
+                      f"{1000 * timers['llm.time_to_prediction']['mean']:>11.1f}"
+                      f"{1000 * timers['llm.request']['mean']:>11.1f}"
+                      f"{data['counters'].get('llm.stream_cancelled', 0):>10}{str(predictions == reference):>6}")
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
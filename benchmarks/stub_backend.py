@@ -0,0 +1,80 @@
+# benchmarks/stub_backend.py
+# 离线基准用的 "stub" 推理后端：不加载任何模型的确定性替身（特征哈希词袋向量 + 词重叠打分），只依赖 numpy，
+# 在没有网络 / torch 的机器上跑通整条流程。生产配置选不到它，基准脚本在 main() 里先调用 register()：
+#   from benchmarks import stub_backend
+#   stub_backend.register()
+#   kb = MITREKnowledgeBase(backend="stub")
+
+import re
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+from mitre.inference_backend import register_backend
+
+NAME = "stub"
+
+
+class StubTokenizer:
+    """词级 tokenizer：小写单词 -> crc32 哈希 id（跨进程稳定），接口只覆盖本项目用到的部分。"""
+
+    WORD_PATTERN = re.compile(r"[a-z0-9]+")
+    pad_token = "[PAD]"
+    eos_token = "[PAD]"
+    eos_token_id = 0
+
+    def _ids(self, text, max_length=None):
+        ids = [zlib.crc32(w.encode("utf-8")) for w in self.WORD_PATTERN.findall(str(text).lower())]
+        return ids[:max_length] if max_length else ids
+
+    def __call__(self, texts, add_special_tokens=False, truncation=False, max_length=None, **kwargs):
+        limit = max_length if truncation else None
+        if isinstance(texts, str):
+            return {"input_ids": self._ids(texts, limit)}
+        return {"input_ids": [self._ids(t, limit) for t in texts]}
+
+
+class StubEncoder:
+    """特征哈希的词袋 + 相邻词对向量（sublinear tf，L2 归一化），有一定检索能力且完全确定。"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.tokenizer = StubTokenizer()
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            ids = self.tokenizer._ids(text)
+            features = ids + [zlib.crc32(f"{a}:{b}".encode()) for a, b in zip(ids, ids[1:])]
+            for feature in features:
+                sign = 1.0 if (feature >> 31) & 1 else -1.0
+                vectors[row, feature % self.dim] += sign
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class StubCrossEncoder:
+    """词重叠打分：query 词在描述中的覆盖率（按 idf 近似加权），过 Sigmoid 到 (0, 1)。"""
+
+    def score(self, query_ids, desc_ids):
+        if not query_ids:
+            return 0.5
+        desc = set(desc_ids)
+        overlap = sum(1 for t in set(query_ids) if t in desc) / len(set(query_ids))
+        return float(1.0 / (1.0 + np.exp(-8.0 * (overlap - 0.5))))
+
+
+def _load_encoder(model_name, cache_dir):
+    model = StubEncoder()
+    return model.tokenizer, model
+
+
+def _load_cross_encoder(model_name, cache_dir, max_length):
+    return SimpleNamespace(tokenizer=StubTokenizer(), model=StubCrossEncoder(), activation_fn=None,
+                           max_length=max_length)
+
+
+def register():
+    register_backend(NAME, _load_encoder, _load_cross_encoder)
@@ -0,0 +1,189 @@
+# benchmarks/suite.py
+# 用法: python -m benchmarks.suite [--backend stub] [--update-baseline] [--out results.json]
+# 离线基准：在 data/tram_train.tsv 和 data/test_tram.csv 上跑检索 + 抽取，不需要网络：
+#   - LLM 用本地桩服务 (benchmarks/mock_llm.py)，总是选 Rank 1 候选
+#   - 默认用 "stub" 推理后端（benchmarks/stub_backend.py 注册的确定性替身，只依赖 numpy）；--backend torch/onnx 用本地已缓存的真实模型
+# 报告：
+#   - RAGRetriever.retrieve_batch / 逐条 retrieve / TTPExtractor.extract 的 queries/sec
+#   - 各阶段平均耗时 (utils/instrument.py)
+#   - 精排前后的 recall@k，以及桩 LLM 下的端到端命中率（即 top-1 准确率）
+# 与 benchmarks/baseline.json 对比：准确率类指标下降超过 --recall-tolerance、吞吐下降超过 --qps-tolerance 时以非零状态退出。
+# 基线与 --backend / --limit 绑定，改了检索逻辑且确认效果后用 --update-baseline 重新记录。
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from config import TOP_K_RERANK
+from evaluator.metrics import recall_at_k, calculate_coverage, CoverageTotals
+from llm.llm_client import LLMClient
+from llm.rate_limiter import TokenBucket
+from llm.response_cache import ResponseCache
+from llm.ttp_extractor import TTPExtractor
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+from utils.instrument import metrics
+from utils.lru import QueryMemo
+from benchmarks.mock_llm import start_mock_llm
+from benchmarks import stub_backend
+from benchmarks.recall_report import load_labeled
+
+DATASETS = ("data/tram_train.tsv", "data/test_tram.csv")
+KS = (1, 5, 10, TOP_K_RERANK)
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# 逐条 retrieve() 的吞吐只测前 N 条，避免基准太慢
+SINGLE_QUERY_SAMPLE = 100
+
+
+def recall_table(labels, ranked_lists):
+    table = {}
+    for k in KS:
+        hits = total = 0
+        for label, ranked in zip(labels, ranked_lists):
+            h, t = recall_at_k(label, [tid for tid, _ in ranked], k)
+            hits += h
+            total += t
+        table[f"@{k}"] = hits / total if total else 0.0
+    return table
+
+
+def run_dataset(path, limit, retriever, extractor):
+    texts, labels = load_labeled(path, limit)
+    result = {"rows": len(texts)}
+
+    # 1. 批量检索：与 retrieve_batch 相同的步骤，拆开以便同时拿到精排前后的排序
+    metrics.reset()
+    start = time.perf_counter()
+    pre_rerank = retriever.rerank_candidates_batch(texts)
+    reranked = retriever._rerank(texts, pre_rerank)
+    candidates_list = [retriever._format_results(r[:TOP_K_RERANK]) for r in reranked]
+    elapsed = time.perf_counter() - start
+    result["retrieve_batch_qps"] = len(texts) / elapsed
+    result["recall_before_rerank"] = recall_table(labels, pre_rerank)
+    result["recall_after_rerank"] = recall_table(labels, reranked)
+    retrieve_stages = metrics.to_dict()["timers_seconds"]
+
+    # 2. 逐条检索
+    sample = texts[:SINGLE_QUERY_SAMPLE]
+    start = time.perf_counter()
+    for text in sample:
+        retriever.retrieve(text)
+    result["retrieve_qps"] = len(sample) / (time.perf_counter() - start)
+
+    # 3. 抽取（桩 LLM），候选复用第 1 步的结果
+    metrics.reset()
+    totals = CoverageTotals()
+    start = time.perf_counter()
+    for text, label, candidates in zip(texts, labels, candidates_list):
+        prediction, _, _ = extractor.extract(text, candidates=candidates)
+        totals.add(calculate_coverage(label, prediction))
+    result["extract_qps"] = len(texts) / (time.perf_counter() - start)
+    result["extract_hit_rate"] = (totals.full + totals.semi) / totals.all if totals.all else 0.0
+    extract_stages = metrics.to_dict()["timers_seconds"]
+
+    result["stages_ms"] = {
+        name: 1000 * stats["mean"]
+        for name, stats in {**retrieve_stages, **extract_stages}.items()
+    }
+    return result
+
+
+def compare(results, baseline, recall_tolerance, qps_tolerance):
+    """返回回归列表 [(指标, 基线, 当前)]。"""
+    regressions = []
+    for dataset, current in results["datasets"].items():
+        base = baseline["datasets"].get(dataset)
+        if base is None:
+            continue
+        for group in ("recall_before_rerank", "recall_after_rerank"):
+            for k, value in current[group].items():
+                if value < base[group][k] - recall_tolerance:
+                    regressions.append((f"{dataset} {group} {k}", base[group][k], value))
+        if current["extract_hit_rate"] < base["extract_hit_rate"] - recall_tolerance:
+            regressions.append((f"{dataset} extract_hit_rate", base["extract_hit_rate"], current["extract_hit_rate"]))
+        for name in ("retrieve_batch_qps", "retrieve_qps", "extract_qps"):
+            if current[name] < base[name] * (1 - qps_tolerance):
+                regressions.append((f"{dataset} {name}", base[name], current[name]))
+    return regressions
+
+
+def print_results(results, baseline):
+    for dataset, r in results["datasets"].items():
+        base = (baseline or {}).get("datasets", {}).get(dataset, {})
+        print(f"\n== {dataset} ({r['rows']} rows, backend {results['backend']}) ==")
+        for name in ("retrieve_batch_qps", "retrieve_qps", "extract_qps", "extract_hit_rate"):
+            ref = f"  (baseline {base[name]:.3f})" if name in base else ""
+            print(f"  {name:<22}{r[name]:>10.3f}{ref}")
+        print(f"  {'recall':<22}" + "".join(f"{k:>8}" for k in r["recall_after_rerank"]))
+        for group in ("recall_before_rerank", "recall_after_rerank"):
+            print(f"  {group:<22}" + "".join(f"{v:>8.3f}" for v in r[group].values()))
+        print(f"  {'stage':<32}{'mean ms':>10}")
+        for name, ms in r["stages_ms"].items():
+            print(f"  {name:<32}{ms:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="stub")
+    parser.add_argument("--limit", type=int, default=1000, help="每个数据集最多取多少行")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--recall-tolerance", type=float, default=0.005, help="准确率类指标允许的绝对下降")
+    parser.add_argument("--qps-tolerance", type=float, default=0.5, help="吞吐允许的相对下降（与机器相关，默认放宽）")
+    parser.add_argument("--out", default=None, help="本次结果另存为 JSON")
+    args = parser.parse_args()
+    stub_backend.register()
+
+    # 关闭精排分数缓存、LLM 响应缓存和 query 记忆化，每次都真实计算
+    kb = MITREKnowledgeBase(backend=args.backend, use_rerank_cache=False)
+    retriever = RAGRetriever(kb, memo=QueryMemo(0))
+    mock = start_mock_llm()
+    llm = LLMClient(rate_limiter=TokenBucket(1e6), cache=ResponseCache(mode="off"), api_url=mock.url)
+    llm.session.trust_env = False  # 不走 HTTP(S)_PROXY
+    extractor = TTPExtractor(retriever, llm=llm)
+    retriever.retrieve_batch(["warmup"])  # 预热：加载模型不计入吞吐
+
+    results = {
+        "backend": args.backend,
+        "limit": args.limit,
+        "datasets": {path: run_dataset(path, args.limit, retriever, extractor) for path in DATASETS},
+    }
+    mock.shutdown()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline["backend"], baseline["limit"]) != (args.backend, args.limit):
+            print(f"Baseline was recorded with backend={baseline['backend']}, limit={baseline['limit']}; "
+                  f"rerun with matching settings or --update-baseline")
+            baseline = None
+
+    print_results(results, baseline)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    if baseline is None:
+        print("\nNo comparable baseline, skipping regression check")
+        return
+
+    regressions = compare(results, baseline, args.recall_tolerance, args.qps_tolerance)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for name, base, value in regressions:
+            print(f"  {name}: {base:.4f} -> {value:.4f}")
+        sys.exit(1)
+    print("\nNo regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,3 +13,83 @@ GPT_API_KEY = "sk-QxY2t5FPmHe2TF6xEcBaE3B1BcE24b1194B2Fb9422543270"
 # config.py (建议值)
 TOP_K_EMBED = 100  # 粗排多召回一些
 TOP_K_RERANK = 20  # 精排给 LLM 10 个
+
+# 并发评测 (main.py)
+MAX_CONCURRENCY = 8  # 同时在途的抽取请求数
+RATE_LIMIT_RPS = 2.0  # 令牌桶速率 (请求/秒)，收到 429 时自动降速
+RATE_LIMIT_BURST = 4  # 令牌桶容量 (允许的突发请求数)
+EXTRACT_PACK_SIZE = 1  # > 1 时每个 LLM 请求打包多条输入 (TTPExtractor.extract_many)；1 与逐条调用一致
+
+# LLM 响应缓存 (llm/response_cache.py)
+LLM_CACHE_PATH = "cache/llm_responses.sqlite"
+LLM_CACHE_MAX_MB = 512  # 超出后按 LRU 淘汰
+LLM_CACHE_MODE = "on"  # "on" 读写 | "refresh" 只写不读(强制重新请求) | "off" 完全绕过
+
+# LLM 流式响应 (llm/streaming.py)
+LLM_STREAM = False  # True: stream=True 走 SSE，prediction 一闭合就记下 llm.time_to_prediction
+LLM_STREAM_STOP_AFTER_PREDICTION = False  # True: 所有 prediction 到齐后断开流，其后的字段丢弃，这类响应不写缓存
+LLM_MAX_ATTEMPTS = 5  # 每个请求最多尝试几次（连接错误 / 超时 / 429 / 5xx 重试，其他 4xx 直接失败）
+
+# 批量检索 (RAGRetriever.retrieve_batch)
+RETRIEVE_BATCH_SIZE = 32  # Embedding 模型每个 mini-batch 的 query 数
+RERANK_BATCH_SIZE = 64  # Cross-Encoder 每个 batch 的 (query, description) 对数
+PRERETRIEVE_CHUNK = 256  # main.py 每次预检索的行数
+QUERY_MEMO_SIZE = 50000  # 进程内按 query 文本记忆化的向量 / 检索 / 抽取结果条数 (utils/lru.py)；0 关闭
+
+# 知识库 / Embedding 缓存 (mitre/knowledge_base.py)
+FILTER_ICS = True  # 过滤 T0 开头的 ICS 技术
+KB_SNAPSHOT = True  # 知识库编译成二进制快照 (mitre/snapshot.py)，之后 mmap 加载，不再解析 JSON
+EMBEDDING_CACHE_DIR = "cache"  # 缓存文件名带指纹，模型/知识库/模板变化时自动重算
+KEYWORD_MATCH_WORD_BOUNDARY = False  # 强制召回的技术名匹配是否要求单词边界 (False 与原子串匹配一致)
+KEYWORD_BOOST_MODE = "substring"  # 关键词软增强: "substring" 与原实现一致 | "token" 整词匹配，更快
+
+# BM25 词法检索 + RRF 融合 (mitre/bm25.py, mitre/fusion.py)
+MITRE_SEARCH_INDEX = "data/mitre_search_index.json"  # keyword -> 技术 的倒排索引，作为 BM25 的种子
+HYBRID_RETRIEVAL = False  # True: 向量 + BM25 两路候选用 RRF 融合；先用 benchmarks/recall_report.py 对比再打开
+TOP_K_SPARSE = 100  # BM25 通道的候选数
+RRF_K = 60
+RRF_SCORE_SCALE = 3000  # 融合分数放大倍数，使其与向量点积量级相近
+
+# 稠密索引 (mitre/dense_index.py)
+DENSE_INDEX_DTYPE = "float32"  # "float32" 精确 | "float16" | "int8"
+DENSE_INDEX_NORMALIZE = False  # True: cosine；False: 与原实现一致的未归一化点积（后续 +2/词 的增强按这个量级设计）
+DENSE_INDEX_CLUSTERS = 0  # > 0 启用 IVF 聚类剪枝（技术集合很大时再开）
+DENSE_INDEX_PROBE = 8  # IVF 每条 query 扫描的簇数
+
+# Cross-Encoder 精排 (MITREKnowledgeBase.rerank_batch)
+RERANK_DESC_MAX_TOKENS = None  # 技术描述预截断的 token 数；None 与原实现一致（整体 512 截断）
+RERANK_CACHE_ENABLED = True
+RERANK_CACHE_PATH = "cache/rerank_scores.sqlite"
+RERANK_CACHE_MAX_ENTRIES = 2_000_000  # 超出后按 LRU 淘汰
+
+# 推理后端 (mitre/inference_backend.py)，同时作用于 EMBEDDING_MODEL 和 CROSS_ENCODER_MODEL
+INFERENCE_BACKEND = "torch"  # "torch" fp32 | "onnx" ONNX Runtime | "onnx-int8" 动态 int8 量化；导出结果缓存在 EMBEDDING_CACHE_DIR/onnx；离线基准用的 "stub" 替身由 benchmarks/stub_backend.py 注册，这里选不到
+
+# 级联精排 + 提前退出 (RAGRetriever._rerank)
+RERANK_CASCADE = False  # True: 先用轻量 Cross-Encoder 粗筛，主模型只给幸存者打分
+FIRST_STAGE_RERANKER = "cross-encoder/ms-marco-MiniLM-L-12-v2"
+CASCADE_KEEP = 24  # 第一级保留多少个候选给主模型（>= TOP_K_RERANK）
+EARLY_EXIT_ON_ID_MATCH = False  # 文本里直接写了唯一一个技术 ID (强制召回 1000 分) 时跳过精排
+EARLY_EXIT_MARGIN = None  # 第一名与第二名的检索分数差 >= 该值时跳过精排；None 关闭
+
+# LLM prompt 的候选列表 (llm/prompt_builder.py)
+PROMPT_CANDIDATE_TOKEN_BUDGET = None  # 候选列表的 token 预算；None 与原实现一致（全部 TOP_K_RERANK 个候选）
+PROMPT_MIN_CANDIDATES = 5  # 预算再紧也至少保留的候选数
+PROMPT_DESC_CHARS = 100  # 描述截断长度（与原实现一致）
+PROMPT_LONG_DESC_CHARS = 300  # 预算有剩余时，按排名把描述放宽到这个长度
+PROMPT_MERGE_SUBTECHNIQUES = True  # 开启预算时，父技术也在列表里的子技术不再重复 tactics
+
+# 分阶段耗时统计 (utils/instrument.py)
+INSTRUMENT_ENABLED = True  # False 时计时器 / 计数器全部变成空操作
+PROFILE_STAGE = None  # 例如 "retrieve.rerank"：只对该阶段开启 cProfile
+PROFILE_OUTPUT = "cache/profile.prof"
+
+# main.py 输入 / 输出
+INPUT_CSV = "data/wrongtext.csv"
+OUTPUT_CSV = "output_1.csv"  # 逐行写出，检查点在 OUTPUT_CSV + ".ckpt"
+
+# 抽取服务 (python -m service.server)：常驻进程，模型和知识库只加载一次
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8000
+SERVICE_MAX_BATCH_SIZE = 32  # 并发请求凑成微批次再做 Embedding / 精排：批满或等待超时即执行
+SERVICE_MAX_WAIT_MS = 10
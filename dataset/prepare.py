@@ -0,0 +1,169 @@
+# dataset/prepare.py
+# CTI 问答数据集的清洗 + 每种 TTP 抽样（原 change.py 的逻辑），按块流式处理，内存与数据集大小无关：
+#   python -m dataset.prepare "cyber_MITRE_CTI_dataset .csv" [--out-dir data] [--seed 42] [--per-technique 1]
+# 输出：
+#   - cleaned_full.csv       完整清洗版 (question, answer)，与原 change.py 格式一致
+#   - cleaned_full.parquet   同样内容的列存版本，列名用 main.py 的 text1 / labels，可直接 --input 读取
+#                            (.feather 后缀则写 Arrow IPC / Feather v2)
+#   - one_per_ttp.csv        每种 TTP 抽 per_technique 条 (question, answer=['Txxxx'])
+# 抽样是带种子的 bottom-k：每个 (question, TTP) 对分到一个随机数，每种 TTP 保留随机数最小的 k 条，
+# 等价于每种 TTP 内部的无放回均匀抽样；结果与 chunksize 无关，同一个种子结果固定。
+
+import argparse
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+# 两条前缀依次去掉，与原 clean_question 一致
+QUESTION_PREFIXES = (
+    r"Please help to identify the following description belonging to which technique in MITRE and the corresponding tactics[:\s]*",
+    r"Please help to identify the following description belonging to which technique in MITRE and the corresponding tactics\s*[:\.]*",
+)
+TECHNIQUE_PATTERN = r"T\d{4}(?:\.\d{3})?"
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def clean_questions(questions: pd.Series) -> pd.Series:
+    """去掉 Please help to identify... 前缀（向量化版本的 clean_question）。"""
+    cleaned = questions.fillna("").astype(str)
+    for prefix in QUESTION_PREFIXES:
+        cleaned = cleaned.str.replace(prefix, "", regex=True, case=False)
+    return cleaned.str.strip()
+
+
+def extract_techniques(answers: pd.Series) -> pd.Series:
+    """提取所有 Txxxx 或 Txxxx.xxx，去重但保持原始顺序；空值得到 []。"""
+    matches = answers.fillna("").astype(str).str.findall(TECHNIQUE_PATTERN)
+    return matches.map(lambda m: list(dict.fromkeys(m)))
+
+
+def iter_frames(path, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """按块读取 CSV / TSV / Parquet / Feather，逐块产出 DataFrame。"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    elif path.endswith((".feather", ".arrow")):
+        import pyarrow as pa
+        # Feather v2 即 Arrow IPC 文件，memory map 打开，逐个 record batch 读取
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                frame = reader.get_batch(i).to_pandas()
+                yield frame[columns] if columns else frame
+    else:
+        sep = "\t" if path.endswith(".tsv") else ","
+        yield from pd.read_csv(path, sep=sep, chunksize=chunksize, usecols=columns)
+
+
+class ColumnarWriter:
+    """逐块追加写 Parquet（每块一个 row group）或 Feather（每块一个 record batch）。"""
+
+    def __init__(self, path):
+        # 缺依赖时在开始处理前就报错，而不是写到第一块才失败
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError(f"Writing {os.path.basename(path)} requires pyarrow (pip install pyarrow)")
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self._writer = None
+
+    def write(self, frame):
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            if self.path.endswith(".parquet"):
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+            else:
+                self._writer = pa.ipc.new_file(self.tmp_path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self.tmp_path, self.path)
+
+
+class StratifiedSampler:
+    """每种 TTP 保留随机键最小的 k 条 (bottom-k)，内存只占 TTP 种类数 x k。"""
+
+    def __init__(self, per_technique=1, seed=42):
+        self.per_technique = per_technique
+        self.rng = np.random.default_rng(seed)
+        self.reservoir = pd.DataFrame({"technique": [], "question": [], "key": []})
+
+    def add(self, questions: pd.Series, techniques: pd.Series):
+        # 一行有多个 TTP 时每个 TTP 都算一条（与原实现一致）
+        pairs = pd.DataFrame({"question": questions, "technique": techniques}).explode("technique")
+        pairs = pairs.dropna(subset=["technique"])
+        pairs["key"] = self.rng.random(len(pairs))
+        merged = pd.concat([self.reservoir, pairs[["technique", "question", "key"]]], ignore_index=True)
+        self.reservoir = merged.sort_values("key", kind="stable").groupby("technique", sort=False).head(
+            self.per_technique)
+
+    def result(self):
+        """按 TTP 编号排序，answer 存成 "['Txxxx']" 字符串。"""
+        sample = self.reservoir.sort_values(["technique", "key"])
+        return pd.DataFrame({
+            "question": sample["question"].to_numpy(),
+            "answer": [str([t]) for t in sample["technique"]],
+        })
+
+
+def prepare(input_path, out_dir="data", chunksize=DEFAULT_CHUNKSIZE, seed=42, per_technique=1,
+            columnar_format="parquet"):
+    """
+    清洗 input_path 并写出完整版 (CSV + 列存) 和每种 TTP 的抽样，返回输出路径。
+    columnar_format: "parquet" | "feather" | None（不写列存版本）
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    full_csv = os.path.join(out_dir, "cleaned_full.csv")
+    columnar_path = os.path.join(out_dir, f"cleaned_full.{columnar_format}") if columnar_format else None
+    sample_csv = os.path.join(out_dir, "one_per_ttp.csv")
+
+    columnar = ColumnarWriter(columnar_path) if columnar_path else None
+    sampler = StratifiedSampler(per_technique=per_technique, seed=seed)
+    rows = 0
+    with open(full_csv + ".tmp", "w", encoding="utf-8", newline="") as f:
+        for i, chunk in enumerate(iter_frames(input_path, chunksize, columns=["question", "answer"])):
+            questions = clean_questions(chunk["question"])
+            techniques = extract_techniques(chunk["answer"])
+
+            # CSV 里 answer 列与原实现一样是 list 的字符串形式
+            pd.DataFrame({"question": questions, "answer": techniques}).to_csv(f, index=False, header=(i == 0))
+            if columnar:
+                columnar.write(pd.DataFrame({"text1": questions, "labels": techniques.map(str)}))
+            sampler.add(questions, techniques)
+            rows += len(chunk)
+            print(f"  {rows} rows processed")
+    os.replace(full_csv + ".tmp", full_csv)
+    if columnar:
+        columnar.close()
+
+    sample = sampler.result()
+    sample.to_csv(sample_csv, index=False)
+    print(f"完整清洗版已保存：{full_csv}，共 {rows} 条")
+    if columnar:
+        print(f"列存版本已保存：{columnar_path}（main.py --input 可直接读取）")
+    print(f"每种 TTP 抽样已保存：{sample_csv}，共 {sample['answer'].nunique()} 种唯一 TTP，{len(sample)} 条")
+    return {"full_csv": full_csv, "columnar": columnar_path, "sample_csv": sample_csv}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input")
+    parser.add_argument("--out-dir", default="data")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--per-technique", type=int, default=1, help="每种 TTP 抽几条")
+    parser.add_argument("--format", default="parquet", choices=["parquet", "feather", "none"])
+    args = parser.parse_args()
+    prepare(args.input, args.out_dir, args.chunksize, args.seed, args.per_technique,
+            None if args.format == "none" else args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,23 @@
 # evaluator/metrics.py
 
+def parse_ttp_list(s):
+    """把 CSV 里 "['T1005', 'T1005']" 形式的标签解析成列表。"""
+    if s is None or s != s or not s:  # None / NaN / 空串
+        return []
+    s = s.strip("[]").replace("'", "").replace('"', "")
+    return [x.strip() for x in s.split(",") if x.strip()]
+
+
+def recall_at_k(labels, ranked_ids, k):
+    """
+    前 k 个候选里命中了多少个标签（去重后）。
+    返回 (hits, total)，方便在整个数据集上累加后再算比例。
+    """
+    labels_set = set(labels)
+    top = set(ranked_ids[:k])
+    return len(labels_set & top), len(labels_set)
+
+
 def calculate_coverage(labels, check):
     def main(ttp):
         return ttp.split('.')[0] if '.' in ttp else ttp
@@ -26,3 +44,35 @@ def calculate_coverage(labels, check):
         "no_coverage": no,
         "false_positive": fp
     }
+
+
+class CoverageTotals:
+    """full / semi / no / FP 的累计值，逐行 add()，断点续跑时可以从检查点恢复。"""
+
+    def __init__(self):
+        self.full = 0
+        self.semi = 0
+        self.no = 0
+        self.wrong = 0
+        self.all = 0
+
+    def add(self, coverage):
+        self.full += coverage['full_coverage']
+        self.semi += coverage['semi_coverage']
+        self.no += coverage['no_coverage']
+        self.wrong += coverage['false_positive']
+        self.all += (coverage['full_coverage'] + coverage['semi_coverage'] + coverage['false_positive'])
+
+    def merge(self, other):
+        self.full += other.full
+        self.semi += other.semi
+        self.no += other.no
+        self.wrong += other.wrong
+        self.all += other.all
+
+    def print_summary(self):
+        print("full:", self.full)
+        print("semi:", self.semi)
+        print("no::", self.no)
+        print("wrong:", self.wrong)
+        print((self.full + self.semi) / self.all if self.all else 0.0)
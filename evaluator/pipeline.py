@@ -0,0 +1,104 @@
+# evaluator/pipeline.py
+
+import json
+
+from config import MAX_CONCURRENCY, PRERETRIEVE_CHUNK, EXTRACT_PACK_SIZE
+from utils.instrument import metrics
+from dataset.prepare import iter_frames
+from .metrics import calculate_coverage, parse_ttp_list
+from .result_writer import StreamingResultWriter, row_key
+from .runner import ConcurrentRunner
+
+
+def iter_rows(path, chunksize=PRERETRIEVE_CHUNK, shard_index=0, num_shards=1):
+    """
+    分块读取输入（CSV / TSV / dataset.prepare 写出的 Parquet / Feather），逐行产出 (row_key, text, labels)，
+    不把整个数据集读进内存。num_shards > 1 时只产出行号 % num_shards == shard_index 的行。
+    """
+    idx = 0
+    for chunk in iter_frames(path, chunksize, columns=["text1", "labels"]):
+        for text, labels in zip(chunk["text1"], chunk["labels"]):
+            if idx % num_shards == shard_index:
+                yield row_key(idx, text), text, parse_ttp_list(labels)
+            idx += 1
+
+
+def run_pipeline(retriever, extractor, input_path, output_path, resume=True,
+                 shard_index=0, num_shards=1, log_prefix="", pack_size=EXTRACT_PACK_SIZE):
+    """
+    检索 + LLM 抽取 + 覆盖率评估，结果逐行写入 output_path（带检查点，可断点续跑）。
+    pack_size > 1 时每 pack_size 行打包成一个 LLM 请求 (TTPExtractor.extract_many)。
+    返回 StreamingResultWriter（其中 totals 为累计的 full/semi/no/FP）。
+    """
+    # 结果逐行写盘 + 检查点：中途崩溃后重跑会跳过已完成的行，并从文件恢复累计值
+    writer = StreamingResultWriter(output_path, resume=resume).open()
+
+    def with_candidates():
+        # 按块批量预检索（Embedding / Rerank 走 batch），再交给 LLM 并发执行
+        chunk = []
+        for item in iter_rows(input_path, shard_index=shard_index, num_shards=num_shards):
+            if item[0] in writer.done_keys:
+                continue
+            chunk.append(item)
+            if len(chunk) >= PRERETRIEVE_CHUNK:
+                yield from retrieve_chunk(chunk)
+                chunk = []
+        yield from retrieve_chunk(chunk)
+
+    def retrieve_chunk(chunk):
+        if not chunk:
+            return
+        with metrics.timer("pipeline.retrieve_chunk"):
+            candidates_list = retriever.retrieve_batch([text for _, text, _ in chunk])
+        for (key, text, labels), candidates in zip(chunk, candidates_list):
+            yield key, text, labels, candidates
+
+    def packed(items):
+        group = []
+        for item in items:
+            group.append(item)
+            if len(group) >= pack_size:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def process(group):
+        results = extractor.extract_many(
+            [text for _, text, _, _ in group], [candidates for _, _, _, candidates in group], pack_size=pack_size
+        )
+        return [
+            (key, text, labels, check, thinking, related)
+            for (key, text, labels, _), (check, thinking, related) in zip(group, results)
+        ]
+
+    def results():
+        # 并发执行，但结果按输入顺序返回，累计值与串行一致
+        runner = ConcurrentRunner(max_workers=MAX_CONCURRENCY)
+        for group_results in runner.run(process, packed(with_candidates())):
+            yield from group_results
+
+    try:
+        for key, text, labels, check, thinking, related in results():
+            print(f"{log_prefix}Processing {len(writer.done_keys) + 1} ({key})")
+
+            coverage = calculate_coverage(labels, check)
+            metrics.count("pipeline.rows")
+            # --- 关键修改：对长文本字段进行 Base64 编码 ---
+            writer.write(key, {
+                "text1": text,
+                "labels": labels,
+                "check": check,
+                "think": thinking[:3000],
+                "related_techniques": (json.dumps(related, ensure_ascii=False))[:3000],
+                "score": (
+                    f"Full{coverage['full_coverage']}, "
+                    f"Semi{coverage['semi_coverage']}, "
+                    f"No{coverage['no_coverage']}, "
+                    f"FP{coverage['false_positive']}"
+                ),
+                **coverage
+            }, coverage)
+    finally:
+        writer.close()
+    return writer
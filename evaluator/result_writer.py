@@ -0,0 +1,119 @@
+# evaluator/result_writer.py
+
+import csv
+import hashlib
+import io
+import json
+import os
+
+from .metrics import CoverageTotals
+
+FIELDNAMES = [
+    "row_key", "text1", "labels", "check", "think", "related_techniques", "score",
+    "full_coverage", "semi_coverage", "no_coverage", "false_positive",
+]
+
+
+def row_key(idx, text):
+    """行号 + 文本哈希：输入文件被改动过时，旧检查点不会被误用到别的行上。"""
+    return f"{idx}:{hashlib.sha1(str(text).encode('utf-8')).hexdigest()[:12]}"
+
+
+class StreamingResultWriter:
+    """
+    逐行追加写出评测结果，并维护检查点，崩溃 / API 故障后可以从断点继续：
+    - 结果 CSV 与原来 DataFrame.to_csv 的格式一致（utf-8-sig、全部字段加引号、"" 转义）
+    - 检查点 <output>.ckpt 是 JSONL，每写完一行 CSV 记一条 {key, offset, coverage}
+      offset 是该行写完后 CSV 的字节长度；恢复时把 CSV 截断到最后一条检查点的位置，
+      丢掉写了一半的行，再从检查点重建已完成的行号和 full/semi/no/FP 累计值
+    内存占用与数据集大小无关。
+    """
+
+    def __init__(self, path, fieldnames=FIELDNAMES, resume=True):
+        self.path = path
+        self.ckpt_path = path + ".ckpt"
+        self.fieldnames = fieldnames
+        self.resume = resume
+        self.done_keys = set()
+        self.totals = CoverageTotals()
+        self._csv = None
+        self._ckpt = None
+
+    def _encode_row(self, values):
+        buf = io.StringIO()
+        csv.writer(buf, quoting=csv.QUOTE_ALL, doublequote=True, lineterminator="\n").writerow(values)
+        return buf.getvalue().encode("utf-8")
+
+    def _load_checkpoint(self):
+        """返回最后一条完整检查点记录的 CSV 偏移量；没有可用检查点时返回 None。"""
+        if not (os.path.exists(self.path) and os.path.exists(self.ckpt_path)):
+            return None
+        offset = None
+        with open(self.ckpt_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # 最后一行写了一半
+                offset = record["offset"]
+                if record.get("key") is not None:
+                    self.done_keys.add(record["key"])
+                    self.totals.add(record["coverage"])
+        return offset
+
+    def open(self):
+        offset = self._load_checkpoint() if self.resume else None
+        if offset is not None:
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+            # 检查点本身也重写一遍，去掉可能写了一半的最后一行
+            self._rewrite_checkpoint(offset)
+            self._csv = open(self.path, "ab")
+            self._ckpt = open(self.ckpt_path, "a", encoding="utf-8")
+            print(f"Resuming from checkpoint: {len(self.done_keys)} rows already done")
+            return self
+
+        self.done_keys.clear()
+        self.totals = CoverageTotals()
+        self._csv = open(self.path, "wb")
+        self._csv.write(b"\xef\xbb\xbf" + self._encode_row(self.fieldnames))
+        self._csv.flush()
+        self._ckpt = open(self.ckpt_path, "w", encoding="utf-8")
+        self._ckpt.write(json.dumps({"key": None, "offset": self._csv.tell()}) + "\n")
+        self._ckpt.flush()
+        return self
+
+    def _rewrite_checkpoint(self, offset):
+        tmp_path = self.ckpt_path + ".tmp"
+        with open(self.ckpt_path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+            for line in src:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                dst.write(line if line.endswith("\n") else line + "\n")
+                if record["offset"] == offset:
+                    break
+        os.replace(tmp_path, self.ckpt_path)
+
+    def write(self, key, row, coverage):
+        """写一行结果（row 为 dict，缺省字段写空），并在 CSV 落盘后记录检查点。"""
+        values = [key if f == "row_key" else row.get(f, "") for f in self.fieldnames]
+        self._csv.write(self._encode_row(values))
+        self._csv.flush()
+        self._ckpt.write(json.dumps({"key": key, "offset": self._csv.tell(), "coverage": coverage}) + "\n")
+        self._ckpt.flush()
+        self.done_keys.add(key)
+        self.totals.add(coverage)
+
+    def close(self):
+        for f in (self._csv, self._ckpt):
+            if f is not None:
+                f.close()
+        self._csv = self._ckpt = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,33 @@
+# evaluator/runner.py
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ConcurrentRunner:
+    """
+    并发评测执行器：
+    同时保持 max_workers 个抽取任务在途（LLM 调用主要在等网络，线程池足够），
+    但按输入顺序逐个产出结果，保证输出 CSV 的行序和 full/semi/no/FP 累计值与串行路径一致。
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, int(max_workers))
+
+    def run(self, func, items):
+        """对 items 逐个调用 func(item)，按输入顺序 yield 结果。"""
+        if self.max_workers == 1:
+            for item in items:
+                yield func(item)
+            return
+
+        # 在途窗口限制为 2 * max_workers，避免一次性提交整个数据集
+        window = self.max_workers * 2
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for item in items:
+                pending.append(pool.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
@@ -0,0 +1,164 @@
+# evaluator/sharding.py
+# 多进程分片执行：输入按行号取模切成 N 片，每个 worker 进程各自加载一次 MITREKnowledgeBase 跑自己那一片，
+# 最后按行号把各片结果归并成一个 CSV，full/semi/no/FP 累计值逐片相加，结果与单进程逐行一致。
+#   - 每个 worker 的 torch / OpenMP 线程数固定为 cpu_count // N，避免 N 个进程各开满线程互相抢核
+#   - 技术 Embedding 矩阵由父进程先算好写入磁盘缓存，worker 用 np.load(mmap_mode="r") 打开，
+#     只读页由操作系统在进程间共享，N 个进程不会各占一份；ONNX 导出 / 量化同样由父进程先做
+#   - 每片有自己的输出文件和检查点（<output>.shard{i}-of-{N}），中断后重跑只补未完成的行
+#   - LLM 限流按 worker 数平分，总请求速率与单进程相同
+
+import csv
+import heapq
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import RATE_LIMIT_RPS, RATE_LIMIT_BURST, INFERENCE_BACKEND, RERANK_CASCADE
+from utils.instrument import metrics
+from mitre.inference_backend import BACKENDS
+from .metrics import CoverageTotals
+from .result_writer import FIELDNAMES
+
+
+def pin_threads(n_threads, backend=INFERENCE_BACKEND):
+    """
+    在导入 torch / 加载模型之前调用：限制本进程的计算线程数。
+    注册的替身后端（基准用的 "stub"）不加载模型，只设环境变量；没装 torch 时同样跳过（OpenMP / BLAS 仍按环境变量限制）。
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(n_threads)
+    if backend not in BACKENDS:
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(n_threads)
+
+
+def threads_per_worker(num_workers):
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+
+def shard_path(output_path, shard_index, num_shards):
+    return f"{output_path}.shard{shard_index}-of-{num_shards}"
+
+
+def _run_shard(input_path, output_path, resume, shard_index, num_shards):
+    """worker 进程入口（spawn 启动，只依赖参数）。"""
+    pin_threads(threads_per_worker(num_shards))
+
+    from llm.llm_client import LLMClient
+    from llm.rate_limiter import TokenBucket
+    from llm.ttp_extractor import TTPExtractor
+    from mitre.knowledge_base import MITREKnowledgeBase
+    from mitre.rag_retriever import RAGRetriever
+    from .pipeline import run_pipeline
+
+    start = time.perf_counter()
+    kb = MITREKnowledgeBase()
+    retriever = RAGRetriever(kb)
+    llm = LLMClient(rate_limiter=TokenBucket(
+        RATE_LIMIT_RPS / num_shards, max(1, RATE_LIMIT_BURST // num_shards)))
+    extractor = TTPExtractor(retriever, llm=llm)
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    writer = run_pipeline(
+        retriever, extractor, input_path, shard_path(output_path, shard_index, num_shards),
+        resume=resume, shard_index=shard_index, num_shards=num_shards,
+        log_prefix=f"[shard {shard_index}/{num_shards}] ",
+    )
+    return {
+        "shard": shard_index,
+        "rows": len(writer.done_keys),
+        "load_time": load_time,
+        "run_time": time.perf_counter() - start,
+        "totals": writer.totals,
+        "metrics": metrics.snapshot(),
+    }
+
+
+def merge_shards(paths, output_path):
+    """
+    按 row_key 里的行号归并各片 CSV（每片内部本来就是行号递增），流式写出，内存只占每片一行。
+    输出格式与 StreamingResultWriter 相同：utf-8-sig、全部字段加引号。
+    """
+    csv.field_size_limit(sys.maxsize)
+    files = [open(p, "r", encoding="utf-8-sig", newline="") for p in paths]
+    try:
+        readers = []
+        for f in files:
+            reader = csv.reader(f)
+            if next(reader, None) != FIELDNAMES:
+                raise ValueError(f"Unexpected header in shard file: {f.name}")
+            readers.append(reader)
+
+        def row_index(row):
+            return int(row[0].split(":", 1)[0])
+
+        tmp_path = output_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8-sig", newline="") as out:
+            writer = csv.writer(out, quoting=csv.QUOTE_ALL, doublequote=True, lineterminator="\n")
+            writer.writerow(FIELDNAMES)
+            rows = 0
+            for row in heapq.merge(*readers, key=row_index):
+                writer.writerow(row)
+                rows += 1
+        os.replace(tmp_path, output_path)
+    finally:
+        for f in files:
+            f.close()
+    return rows
+
+
+def _prebuild_caches():
+    """
+    父进程先把所有磁盘缓存准备好，再启动 worker：知识库快照、技术 Embedding，
+    以及编码器 / Cross-Encoder 的 ONNX 导出与量化（ONNX 后端）。
+    worker 只需从缓存加载，冷启动时不会 N 个进程同时导出同一个模型，导出开销也只付一次。
+    """
+    from mitre.knowledge_base import MITREKnowledgeBase
+
+    kb = MITREKnowledgeBase()
+    kb.model
+    kb.heavy_reranker.model
+    if RERANK_CASCADE:
+        kb.first_stage_reranker.model
+
+
+def run_sharded(input_path, output_path, num_workers, resume=True):
+    """
+    把输入分成 num_workers 片并行处理，归并写出 output_path。
+    返回 (CoverageTotals, 每片统计列表)。
+    """
+    _prebuild_caches()
+
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=ctx) as pool:
+        futures = [
+            pool.submit(_run_shard, input_path, output_path, resume, i, num_workers)
+            for i in range(num_workers)
+        ]
+        shard_stats = sorted((f.result() for f in futures), key=lambda s: s["shard"])
+    wall_time = time.perf_counter() - start
+
+    paths = [shard_path(output_path, i, num_workers) for i in range(num_workers)]
+    rows = merge_shards(paths, output_path)
+
+    totals = CoverageTotals()
+    for stats in shard_stats:
+        totals.merge(stats["totals"])
+        # 各 worker 的分阶段统计汇总到父进程，main.py 结束时统一输出
+        metrics.merge(stats["metrics"])
+
+    print(f"{num_workers} workers x {threads_per_worker(num_workers)} threads, "
+          f"{rows} rows in {wall_time:.1f}s ({rows / wall_time if wall_time else 0.0:.2f} rows/s)")
+    for stats in shard_stats:
+        rate = stats["rows"] / stats["run_time"] if stats["run_time"] else 0.0
+        print(f"  shard {stats['shard']}: {stats['rows']} rows, load {stats['load_time']:.1f}s, "
+              f"run {stats['run_time']:.1f}s ({rate:.2f} rows/s)")
+    return totals, shard_stats
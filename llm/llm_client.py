@@ -2,28 +2,65 @@
 import time
 import requests
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from config import GPT_API_KEY, GPT_API_URL, GPT_MODEL
+from config import (
+    GPT_API_KEY, GPT_API_URL, GPT_MODEL, RATE_LIMIT_RPS, RATE_LIMIT_BURST, LLM_STREAM,
+    LLM_STREAM_STOP_AFTER_PREDICTION, LLM_MAX_ATTEMPTS
+)
+from utils.instrument import metrics
+from .rate_limiter import TokenBucket
+from .response_cache import ResponseCache
+from .streaming import PredictionScanner, iter_sse_content
+
+# 值得重试的 HTTP 状态码；其他 4xx（鉴权、参数错误）重试也不会成功，直接抛出
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _retry_after_seconds(resp):
+    """解析 429 响应里的 Retry-After（只处理秒数形式）。"""
+    value = resp.headers.get("Retry-After") if resp is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _retryable(error):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in RETRYABLE_STATUS
+    return True
+
 
 class LLMClient:
-    def __init__(self):
+    def __init__(self, rate_limiter: TokenBucket = None, cache: ResponseCache = None, api_url: str = None):
+        # api_url 可指向本地桩服务（benchmarks/mock_llm.py），用于压测 / 离线评测
+        self.api_url = api_url or GPT_API_URL
         self.session = requests.Session()
-        retry_strategy = Retry(
-            total=5,
-            backoff_factor=2,
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["POST"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # 重试全部在 ask() 的循环里做（统一计数、退避，429 还要通知限流器降速），urllib3 层不再重试；
+        # 以前 Retry(total=5) 叠在 5 次循环下面，最坏一个请求要发 30 次
+        adapter = HTTPAdapter(max_retries=0)
         self.session.mount("http://", adapter)
         self.session.mount("https://", adapter)
+        self.rate_limiter = rate_limiter or TokenBucket(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+        self.cache = cache or ResponseCache()
+
+    def ask(self, prompt: str, temperature=0.1, max_retries=LLM_MAX_ATTEMPTS, max_tokens=4000,
+            stream=LLM_STREAM, stop_after_prediction=LLM_STREAM_STOP_AFTER_PREDICTION, expected_predictions=1):
+        """
+        max_retries: 最多尝试次数（含第一次）。
+        stream: 走 SSE 流式响应；stop_after_prediction 时收到 expected_predictions 个 prediction
+        （打包 prompt 为条数）就断开，返回截断后补全的 JSON（analysis 可能缺失），这类响应不写缓存。
+        """
+        cache_key = ResponseCache.make_key(GPT_MODEL, temperature, max_tokens, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            metrics.count("llm.cache_hits")
+            return cached
 
-    def ask(self, prompt: str, temperature=0.1, max_retries=5):
         payload = {
             "model": GPT_MODEL,
             "messages": [{"role": "user", "content": prompt}],
             "temperature": temperature,
-            "max_tokens": 4000
+            "max_tokens": max_tokens
         }
         headers = {
             "Content-Type": "application/json",
@@ -31,19 +68,58 @@ class LLMClient:
         }
 
         for i in range(max_retries):
+            with metrics.timer("llm.rate_limit_wait"):
+                self.rate_limiter.acquire()
+            if i > 0:
+                metrics.count("llm.retries")
             try:
-                resp = self.session.post(
-                    GPT_API_URL,
-                    json=payload,
-                    headers=headers,
-                    timeout=60
-                )
-                resp.raise_for_status()
-                data = resp.json()
-                return data["choices"][0]["message"]["content"]
+                metrics.count("llm.requests")
+                with metrics.timer("llm.request"):
+                    if stream:
+                        content, complete = self._post_stream(
+                            payload, headers, expected_predictions if stop_after_prediction else None)
+                    else:
+                        content, complete = self._post(payload, headers), True
+                self.rate_limiter.on_success()
+                if complete:
+                    self.cache.put(cache_key, content)
+                return content
             except Exception as e:
+                metrics.count("llm.errors")
                 print(f"第 {i+1} 次请求失败: {e}")
-                if i == max_retries - 1:
+                if i == max_retries - 1 or not _retryable(e):
                     raise
                 time.sleep(2 ** i)  # 指数退避
-        return None
\ No newline at end of file
+        return None
+
+    def _check_status(self, resp):
+        if resp.status_code == 429:
+            metrics.count("llm.throttled")
+            self.rate_limiter.on_throttle(_retry_after_seconds(resp))
+        resp.raise_for_status()
+
+    def _post(self, payload, headers):
+        start = time.perf_counter()
+        resp = self.session.post(self.api_url, json=payload, headers=headers, timeout=60)
+        self._check_status(resp)
+        content = resp.json()["choices"][0]["message"]["content"]
+        # 非流式时拿到 prediction 的时间就是整个请求的时间，便于与流式对比
+        metrics.observe("llm.time_to_prediction", time.perf_counter() - start, kind="timer")
+        return content
+
+    def _post_stream(self, payload, headers, stop_after=None):
+        """返回 (content, 是否完整)。stop_after 不为 None 时收到这么多个 prediction 就断开连接。"""
+        start = time.perf_counter()
+        scanner = PredictionScanner()
+        with self.session.post(self.api_url, json={**payload, "stream": True}, headers=headers,
+                               timeout=60, stream=True) as resp:
+            self._check_status(resp)
+            # chunk_size=None：数据到一块处理一块，不等凑满固定字节数
+            for delta in iter_sse_content(resp.iter_content(chunk_size=None)):
+                if scanner.feed(delta) and len(scanner.predictions) == 1:
+                    metrics.observe("llm.time_to_prediction", time.perf_counter() - start, kind="timer")
+                if stop_after is not None and len(scanner.predictions) >= stop_after:
+                    # 退出 with 时关闭连接，服务端停止生成剩余内容
+                    metrics.count("llm.stream_cancelled")
+                    return scanner.repaired(), False
+        return scanner.text, True
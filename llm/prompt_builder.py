@@ -0,0 +1,112 @@
+# llm/prompt_builder.py
+
+from config import (
+    PROMPT_CANDIDATE_TOKEN_BUDGET, PROMPT_MIN_CANDIDATES, PROMPT_DESC_CHARS, PROMPT_LONG_DESC_CHARS,
+    PROMPT_MERGE_SUBTECHNIQUES,
+)
+from .token_counter import count_tokens
+
+
+class CandidateBlockBuilder:
+    """
+    拼接 prompt 里的候选技术列表 (Candidate Techniques)：
+    - 每个技术的格式化文本和 token 数只算一次，之后直接复用（替代每次调用的字符串拼接）
+    - token_budget=None 时输出与原实现逐字一致：全部候选，描述截 PROMPT_DESC_CHARS 字符
+    - 设置 token_budget 后：
+        1. 按排名保留尽可能多的候选（至少 min_candidates 个），放不下的低排名候选丢掉
+        2. 剩余预算按排名把描述放宽到 long_desc_chars，给前几名更多上下文
+        3. 父技术也在列表里的子技术不再重复 tactics，改为引用父技术
+    """
+
+    def __init__(self, token_budget=PROMPT_CANDIDATE_TOKEN_BUDGET, min_candidates=PROMPT_MIN_CANDIDATES,
+                 desc_chars=PROMPT_DESC_CHARS, long_desc_chars=PROMPT_LONG_DESC_CHARS,
+                 merge_subtechniques=PROMPT_MERGE_SUBTECHNIQUES):
+        self.token_budget = token_budget
+        self.min_candidates = min_candidates
+        self.desc_chars = desc_chars
+        self.long_desc_chars = long_desc_chars
+        self.merge_subtechniques = merge_subtechniques
+        # (technique_id, desc_chars, parent_id) -> (text, tokens)
+        self._blocks = {}
+        self._headers = {}
+
+    def clear(self):
+        """丢掉已格式化的候选块（知识库热更新后技术名称 / 描述可能变了）。"""
+        self._blocks.clear()
+
+    def _header(self, rank):
+        if rank not in self._headers:
+            text = f"--- [Rank {rank}] ---\n"
+            self._headers[rank] = (text, count_tokens(text))
+        return self._headers[rank]
+
+    def _block(self, c, desc_chars, parent_id=None):
+        key = (c['technique_id'], desc_chars, parent_id)
+        if key not in self._blocks:
+            if parent_id:
+                tactics_line = f"tactics: same as parent {parent_id}\n\n"
+            else:
+                tactics_line = f"tactics: {c['tactics']}\n\n"
+            # 描述保持压缩，防止候选项撑爆 Prompt 上下文
+            desc = c['description'][:desc_chars].replace("\n", " ") + "..."
+            text = f"ID: {c['technique_id']}\nName: {c['name']}\n{tactics_line}Description: {desc}\n\n"
+            self._blocks[key] = (text, count_tokens(text))
+        return self._blocks[key]
+
+    def _parent_refs(self, candidates):
+        """子技术 -> 同样出现在列表里、tactics 相同的父技术 ID。"""
+        if not self.merge_subtechniques:
+            return [None] * len(candidates)
+        tactics = {c['technique_id']: c['tactics'] for c in candidates}
+        refs = []
+        for c in candidates:
+            parent_id = c['technique_id'].split('.')[0]
+            same = parent_id != c['technique_id'] and tactics.get(parent_id) == c['tactics']
+            refs.append(parent_id if same else None)
+        return refs
+
+    def build(self, candidates):
+        """返回 (candidates_str, 实际放进 prompt 的候选列表, 候选块 token 数)。"""
+        if self.token_budget is None:
+            blocks = [self._block(c, self.desc_chars) for c in candidates]
+            kept = list(candidates)
+        else:
+            kept, blocks = self._fit(candidates)
+
+        parts = []
+        tokens = 0
+        for rank, (text, n) in enumerate(blocks, start=1):
+            header, header_tokens = self._header(rank)
+            parts.append(header)
+            parts.append(text)
+            tokens += header_tokens + n
+        return "".join(parts), kept, tokens
+
+    def _fit(self, candidates):
+        refs = self._parent_refs(candidates)
+
+        # 1. 短描述下按排名能放下几个候选
+        cost = [self._header(r)[1] + self._block(c, self.desc_chars, p)[1]
+                for r, (c, p) in enumerate(zip(candidates, refs), start=1)]
+        used = 0
+        n = 0
+        while n < len(candidates) and (n < self.min_candidates or used + cost[n] <= self.token_budget):
+            used += cost[n]
+            n += 1
+        kept = candidates[:n]
+        # 父技术被丢掉时，子技术要恢复完整的 tactics
+        kept_ids = {c['technique_id'] for c in kept}
+        refs = [p if p in kept_ids else None for p in refs[:n]]
+        blocks = [self._block(c, self.desc_chars, p) for c, p in zip(kept, refs)]
+        used = sum(self._header(r)[1] + b[1] for r, b in enumerate(blocks, start=1))
+
+        # 2. 剩余预算按排名放宽描述
+        if self.long_desc_chars > self.desc_chars:
+            for i, (c, p) in enumerate(zip(kept, refs)):
+                longer = self._block(c, self.long_desc_chars, p)
+                extra = longer[1] - blocks[i][1]
+                if used + extra > self.token_budget:
+                    break
+                blocks[i] = longer
+                used += extra
+        return kept, blocks
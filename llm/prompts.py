@@ -38,4 +38,57 @@ Output strict JSON:
   "analysis": "Step 1: Analyzed text intent (Dev vs Usage). Step 2: Checked Candidate Txxxx... Match found/Not found, defaulting to parent Txxxx.",
   "prediction": ["Txxxx"] 
 }}
-"""
\ No newline at end of file
+"""
+
+def ttp_mapping_batch_prompt(items):
+    """
+    多条输入打包成一个 prompt（规则只出现一次），items: [(text, candidates_str), ...]。
+    要求按 Item 编号返回 JSON 数组，每个元素与单条 prompt 的输出字段相同。
+    """
+    blocks = "\n".join(
+        f"""### Item {i}
+Input Text: "{text}"
+
+Candidate Techniques (The ONLY allowed options for Item {i}):
+{candidates}"""
+        for i, (text, candidates) in enumerate(items)
+    )
+    return f"""
+You are a strict MITRE ATT&CK Classification System. 
+You will receive {len(items)} independent items. For EACH item, select the most accurate technique ID from THAT item's own "Candidate Techniques" list that matches its Input Text.
+Never use one item's candidates or text when classifying another item.
+
+{blocks}
+
+### CRITICAL RULES (STRICT COMPLIANCE REQUIRED, apply to every item):
+
+1. **ANTI-HALLUCINATION POLICY (MOST IMPORTANT):**
+   - NEVER output a Technique ID that is not present in the item's "Candidate Techniques" list.
+   - If no candidate matches the input text, output the Technique IDs you think are right but not in the candidates.
+
+2. **TACTIC CONTEXT CHECK :**
+   - Always analyze the intent (Preparation vs. Usage) before selecting. Ensure the Tactic aligns with the action described in the Input Text.
+
+3. **PRECISION AND FALLBACK :**
+   - **PRIORITIZE** the most specific sub-technique (e.g., T1070.004 for "file deletion") if it is explicitly available in the candidate list.
+   - **CRITICAL FALLBACK:** If the input text clearly matches the *general definition* of a Parent Technique (e.g., T1070 for "Artifact Cleanup") AND the specific Sub-Technique (T1070.004) is NOT present in the list, **YOU MUST select the Parent Technique (T1070)**.
+   - **Do not return [] if a clear Parent Technique match is available.**
+
+4. **MECHANISM OVER GOAL :**
+   - Prioritize the technique describing the **ACTIVE MECHANISM/ACTION** used (e.g., `created volume shadow copies` → **T1006**) over the final goal.
+
+5. **MULTI-TECHNIQUE LIMIT:** Output multiple techniques only when the text clearly shows multiple distinct, sequential behaviors. Maximum 4.
+
+6. **OUTPUT FORMAT:**
+   - For each item, provide a brief analysis justifying your choice based on the text evidence and the selected candidate's description.
+   - Return valid JSON only: an array with exactly one object per item, in item order.
+
+Output strict JSON:
+[
+  {{
+    "item": 0,
+    "analysis": "Step 1: Analyzed text intent (Dev vs Usage). Step 2: Checked Candidate Txxxx... Match found/Not found, defaulting to parent Txxxx.",
+    "prediction": ["Txxxx"]
+  }}
+]
+"""
@@ -0,0 +1,65 @@
+# llm/rate_limiter.py
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶限流器 (线程安全)：
+    替代 main.py 里固定的 time.sleep(0.5)。每个请求发出前先 acquire() 一个令牌，
+    收到 429 时调用 on_throttle() 按比例降速 (乘性减)，之后每次成功请求缓慢恢复 (加性增)，
+    直到回到配置的最大速率。
+    """
+
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = 0.1,
+                 backoff_factor: float = 0.5, recovery_step: float = 0.05):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, float(rate))
+        self.min_rate = min_rate
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        # 收到 Retry-After 时，在该时间点之前不发放任何令牌
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        self.throttle_count = 0
+
+    def _refill(self, now):
+        elapsed = now - self._last
+        self._last = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self):
+        """阻塞直到拿到一个令牌。"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                else:
+                    wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self, retry_after: float = None):
+        """API 返回 429：降低速率，并清空桶里积攒的突发令牌。"""
+        with self._lock:
+            self.throttle_count += 1
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self._tokens = 0.0
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+
+    def on_success(self):
+        """请求成功：速率缓慢回升到 max_rate。"""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.recovery_step * self.max_rate)
@@ -0,0 +1,51 @@
+# llm/response_cache.py
+
+import hashlib
+import json
+
+from config import LLM_CACHE_PATH, LLM_CACHE_MAX_MB, LLM_CACHE_MODE
+from utils.sqlite_cache import SQLiteLRUCache
+
+
+class ResponseCache:
+    """
+    LLM 响应的磁盘缓存（内容寻址）：
+    key = sha256(model, temperature, max_tokens, prompt)，prompt 变一个字符就是新 key。
+    mode:
+      - "on"      读 + 写（默认）
+      - "refresh" 不读旧结果，重新请求并覆盖写入
+      - "off"     完全绕过缓存
+    """
+
+    MODES = ("on", "refresh", "off")
+
+    def __init__(self, path=LLM_CACHE_PATH, max_mb=LLM_CACHE_MAX_MB, mode=LLM_CACHE_MODE):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown LLM cache mode: {mode!r}, expected one of {self.MODES}")
+        self.mode = mode
+        self.store = None
+        if mode != "off":
+            self.store = SQLiteLRUCache(path, max_bytes=int(max_mb * 1024 * 1024))
+
+    @staticmethod
+    def make_key(model, temperature, max_tokens, prompt):
+        raw = json.dumps(
+            {"model": model, "temperature": temperature, "max_tokens": max_tokens, "prompt": prompt},
+            ensure_ascii=False, sort_keys=True
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        if self.mode != "on":
+            return None
+        return self.store.get(key)
+
+    def put(self, key, response):
+        if self.mode == "off" or response is None:
+            return
+        self.store.put(key, response)
+
+    def stats(self):
+        if self.store is None:
+            return {"mode": self.mode}
+        return {"mode": self.mode, **self.store.stats()}
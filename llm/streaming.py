@@ -0,0 +1,137 @@
+# llm/streaming.py
+# chat-completions 流式响应 (stream=True, server-sent events) 的解析：
+#   iter_sse_content(chunks)  把原始字节块解析成逐段的 delta.content
+#   PredictionScanner         增量扫描模型输出的 JSON，"prediction" 的值一闭合就解析出来，
+#                             不必等 analysis 等其余字段生成完；repaired() 把已收到的部分补全成合法 JSON
+
+import json
+
+
+def iter_sse_content(chunks):
+    """
+    chunks: 字节块的迭代器（如 resp.iter_content(chunk_size=None)）。
+    逐个产出 choices[0].delta.content；遇到 "data: [DONE]" 结束，事件里带 error 时抛 RuntimeError。
+    """
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue  # 空行（事件分隔）、注释 (":")、event: / id: 等字段
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                return
+            event = json.loads(data)
+            if "error" in event:
+                raise RuntimeError(f"stream error: {event['error']}")
+            for choice in event.get("choices", []):
+                content = (choice.get("delta") or {}).get("content")
+                if content:
+                    yield content
+
+
+class PredictionScanner:
+    """
+    增量 JSON 扫描器：只跟踪字符串 / 转义 / 括号栈，不做完整解析。
+    顶层对象里键为 key 的值（数组或字符串）闭合时，json.loads 该片段并追加到 predictions；
+    打包 prompt 返回的数组里每个 item 的 prediction 依次出现，predictions 按出现顺序累积。
+    """
+
+    def __init__(self, key="prediction"):
+        self.key = key
+        self.predictions = []
+        self._chunks = []
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._reading_key = False
+        self._key_chars = []
+        self._last_key = None
+        # 正在截取的 prediction 值：(起始字符, 所在层深)；None 表示没有在截取
+        self._capture = None
+        self._capture_chars = []
+        # 最后一个 prediction 结束的位置，以及此时还没闭合的括号
+        self._cut = 0
+        self._closers = ""
+
+    def feed(self, text):
+        """追加一段输出，返回这一段里新闭合的 prediction 列表。"""
+        self._chunks.append(text)
+        found = []
+        for ch in text:
+            pos = self._pos
+            self._pos += 1
+            if self._capture is not None:
+                self._capture_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._reading_key:
+                        self._reading_key = False
+                        self._expect_key = False
+                        self._last_key = "".join(self._key_chars)
+                    elif self._capture is not None and self._capture == ('"', len(self._stack)):
+                        self._finish(pos, found)
+                elif self._reading_key:
+                    self._key_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._stack and self._stack[-1] == "{" and self._expect_key:
+                    self._reading_key = True
+                    self._key_chars = []
+                else:
+                    self._value_start(ch)
+            elif ch in "{[":
+                self._value_start(ch)
+                self._stack.append(ch)
+                self._expect_key = ch == "{"
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                self._expect_key = False
+                if self._capture is not None and self._capture == ("[", len(self._stack)):
+                    self._finish(pos, found)
+            elif ch == "," and self._stack and self._stack[-1] == "{":
+                self._expect_key = True
+        return found
+
+    def _value_start(self, ch):
+        # 只认顶层对象（单条 prompt）或顶层数组里各 item 对象（打包 prompt）的 prediction
+        if (self._capture is None and self._last_key == self.key
+                and self._stack in (["{"], ["[", "{"]) and ch in '"['):
+            self._capture = (ch, len(self._stack))
+            self._capture_chars = [ch]
+        self._last_key = None
+
+    def _finish(self, pos, found):
+        try:
+            value = json.loads("".join(self._capture_chars))
+        except ValueError:
+            value = None
+        self._capture = None
+        self._capture_chars = []
+        if value is None:
+            return
+        self.predictions.append(value)
+        found.append(value)
+        self._cut = pos + 1
+        self._closers = "".join("}" if c == "{" else "]" for c in reversed(self._stack))
+
+    @property
+    def text(self):
+        return "".join(self._chunks)
+
+    def repaired(self):
+        """截到最后一个 prediction 为止，补上未闭合的括号，得到可以 json.loads 的文本。"""
+        return self.text[:self._cut] + self._closers
@@ -0,0 +1,29 @@
+# llm/token_counter.py
+
+import re
+from functools import lru_cache
+
+from config import GPT_MODEL
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """装了 tiktoken 就用与 GPT_MODEL 对应的编码，否则返回 None 走估算。"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(GPT_MODEL)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    # 估算：英文单词 / 标点各约 1 token，长单词会被切成多段
+    return sum(1 + len(w) // 8 for w in _WORD_PATTERN.findall(text))
@@ -1,73 +1,137 @@
 # llm/ttp_extractor.py
 
 import json
+import threading
 
-from config import TOP_K_RERANK
+from config import TOP_K_RERANK, EXTRACT_PACK_SIZE
 from .llm_client import LLMClient
-from .prompts import ttp_mapping_cot_prompt
+from .prompt_builder import CandidateBlockBuilder
+from .prompts import ttp_mapping_cot_prompt, ttp_mapping_batch_prompt
+from .token_counter import count_tokens
 from mitre.rag_retriever import RAGRetriever
+from utils.instrument import metrics
+from utils.lru import QueryMemo, normalize_text
+
+
+def clean_json_response(response: str):
+    """去掉 Markdown 代码块并做强化清洗，返回 json.loads 的结果（失败时抛异常）。"""
+    cleaned_response = response.strip()
+
+    # 清理 Markdown 代码块
+    if cleaned_response.startswith("```json"):
+        cleaned_response = cleaned_response[7:].strip()
+    if cleaned_response.startswith("```"):
+        cleaned_response = cleaned_response[3:].strip()
+    if cleaned_response.endswith("```"):
+        cleaned_response = cleaned_response[:-3].strip()
+
+    # 强化清洗
+    cleaned_response = cleaned_response.replace('\n', ' ').replace('\r', ' ')
+    cleaned_response = cleaned_response.replace('\\', '\\\\')
+
+    return json.loads(cleaned_response)
+
+
+def _as_mapping(data):
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    # 确保 prediction 字段是列表
+    prediction = data.get("prediction", [])
+    if not isinstance(prediction, list):
+        prediction = [prediction]
+    return {"prediction": prediction, "analysis": data.get("analysis", "No analysis")}
 
 
 class TTPExtractor:
 
-    def __init__(self, retriever: RAGRetriever):
+    def __init__(self, retriever: RAGRetriever, llm: LLMClient = None, prompt_builder: CandidateBlockBuilder = None):
         self.retriever = retriever
-        self.llm = LLMClient()
-
-    def extract(self, text: str):
+        self.llm = llm or LLMClient()
+        self.prompt_builder = prompt_builder or CandidateBlockBuilder()
+        # 候选块按 technique_id 缓存，知识库热更新后需要重新格式化
+        kb = getattr(retriever, "kb", None)
+        if kb is not None:
+            kb.reload_listeners.append(self.prompt_builder.clear)
+        # 与 RAGRetriever 共用的记忆化：同一 query + 同一批候选只调用一次 LLM
+        self.memo = getattr(retriever, "memo", None) or QueryMemo(0)
+        # extract_many 的打包统计：打包请求数、其中解析失败回退到单条调用的条数
+        self.pack_stats = {"packed_requests": 0, "packed_items": 0, "fallback_items": 0}
+        # 每个 LLM 请求的 prompt token 数、候选列表 token 数、送进 / 保留的候选数
+        self.prompt_stats = {"requests": 0, "prompt_tokens": 0, "candidate_tokens": 0,
+                             "candidates_in": 0, "candidates_kept": 0}
+        self._stats_lock = threading.Lock()
+
+    def _record_prompt(self, prompt, candidate_tokens, candidates_in, candidates_kept):
+        prompt_tokens = count_tokens(prompt)
+        metrics.observe("extract.prompt_tokens", prompt_tokens)
+        with self._stats_lock:
+            self.prompt_stats["requests"] += 1
+            self.prompt_stats["prompt_tokens"] += prompt_tokens
+            self.prompt_stats["candidate_tokens"] += candidate_tokens
+            self.prompt_stats["candidates_in"] += candidates_in
+            self.prompt_stats["candidates_kept"] += candidates_kept
+        return prompt_tokens
+
+    def prompt_report(self):
+        stats = dict(self.prompt_stats)
+        n = stats["requests"]
+        stats["prompt_tokens_per_request"] = stats["prompt_tokens"] / n if n else 0.0
+        stats["candidate_tokens_per_request"] = stats["candidate_tokens"] / n if n else 0.0
+        return stats
+
+    def _kb_version(self):
+        kb = getattr(self.retriever, "kb", None)
+        return getattr(kb, "version", 0)
+
+    @staticmethod
+    def _memo_key(text, candidates, kb_version):
+        # 带上知识库版本：热更新前开始的 LLM 调用在换版本之后才写回，也不会被新版本命中
+        return kb_version, normalize_text(text), tuple(c['technique_id'] for c in candidates[:TOP_K_RERANK])
+
+    def extract(self, text: str, candidates=None):
+        """
+        candidates: 可选，预先用 RAGRetriever.retrieve_batch 批量检索好的候选；
+        不传则在这里单条检索。
+        相同（只差空白）的文本 + 相同候选的结果记忆化，并发的重复行也只调用一次 LLM。
+        """
+        # 检索之前读版本：中途热更新时结果记在旧版本名下，宁可少命中也不串版本
+        kb_version = self._kb_version()
         # Step 1: Retrieve - 增加 Top K 到 10，防止漏召回
         # 注意：这需要 config.py 中的 TOP_K_RERANK 至少为 10，否则这里取不到 10 个
-        candidates_raw = self.retriever.retrieve(text)[:TOP_K_RERANK]
-
-        # Step 2: Format with Ranking
-        candidates_str = ""
-        for i, c in enumerate(candidates_raw):
-            rank = i + 1
-            candidates_str += f"--- [Rank {rank}] ---\n"
-            candidates_str += f"ID: {c['technique_id']}\n"
-            candidates_str += f"Name: {c['name']}\n"
-            tactics = c['tactics']
-            candidates_str += f"tactics: {tactics}\n\n"
-            # 描述保持压缩，防止 10 个候选项撑爆 Prompt 上下文
-            desc = c['description'][:100].replace("\n", " ") + "..."
-            candidates_str += f"Description: {desc}\n\n"
-
-
-        # Step 3: Call LLM
-        map_prompt = ttp_mapping_cot_prompt(
-            text=text,
-            candidates=candidates_str
+        if candidates is None:
+            candidates = self.retriever.retrieve(text)
+        if not self.memo.enabled:
+            return self._extract(text, candidates)
+        return self.memo.extractions.get_or_compute(
+            self._memo_key(text, candidates, kb_version), lambda: self._extract(text, candidates)
         )
 
-        response = self.llm.ask(map_prompt)
+    def _extract(self, text, candidates):
+        candidates_raw = candidates[:TOP_K_RERANK]
 
-        # --- JSON 清洗与解析 ---
-        mapping = {"prediction": [], "analysis": ""}
-        try:
-            cleaned_response = response.strip()
-
-            # 清理 Markdown 代码块
-            if cleaned_response.startswith("```json"):
-                cleaned_response = cleaned_response[7:].strip()
-            if cleaned_response.startswith("```"):
-                cleaned_response = cleaned_response[3:].strip()
-            if cleaned_response.endswith("```"):
-                cleaned_response = cleaned_response[:-3].strip()
-
-            # 强化清洗
-            cleaned_response = cleaned_response.replace('\n', ' ').replace('\r', ' ')
-            cleaned_response = cleaned_response.replace('\\', '\\\\')
+        # Step 2: Format with Ranking（开启 token 预算时低排名候选可能被丢掉）
+        with metrics.timer("extract.build_prompt"):
+            candidates_in = len(candidates_raw)
+            candidates_str, candidates_raw, candidate_tokens = self.prompt_builder.build(candidates_raw)
 
-            data = json.loads(cleaned_response)
+            # Step 3: Call LLM
+            map_prompt = ttp_mapping_cot_prompt(
+                text=text,
+                candidates=candidates_str
+            )
+            self._record_prompt(map_prompt, candidate_tokens, candidates_in, len(candidates_raw))
 
-            # 确保 prediction 字段是列表
-            mapping["prediction"] = data.get("prediction", [])
-            if not isinstance(mapping["prediction"], list):
-                mapping["prediction"] = [mapping["prediction"]]
+        with metrics.timer("extract.llm"):
+            response = self.llm.ask(map_prompt)
 
-            mapping["analysis"] = data.get("analysis", "No analysis")
+        # --- JSON 清洗与解析 ---
+        mapping = {"prediction": [], "analysis": ""}
+        try:
+            with metrics.timer("extract.parse"):
+                mapping = _as_mapping(clean_json_response(response))
 
         except Exception as e:
+            metrics.count("extract.parse_failures")
             print(f"【JSON解析失败】: {e}")
             print(f"原始响应: {response[:200]}...")
             # 兜底策略：如果解析失败，尝试直接使用 Rank 1 的结果
@@ -75,4 +139,81 @@ class TTPExtractor:
                 print("Using Rank 1 candidate as fallback.")
                 mapping["prediction"] = [candidates_raw[0]['technique_id']]
 
-        return mapping["prediction"], [mapping["analysis"]], candidates_raw
\ No newline at end of file
+        return mapping["prediction"], [mapping["analysis"]], candidates_raw
+
+    def extract_many(self, texts, candidates_list=None, pack_size=EXTRACT_PACK_SIZE):
+        """
+        多条输入打包进一个 prompt（每条带自己的候选列表），按 JSON 数组逐条解析。
+        某条缺失 / 解析失败时只对这一条回退到 extract() 单条调用。
+        返回与逐条调用 extract() 相同格式的列表。
+        """
+        kb_version = self._kb_version()
+        if candidates_list is None:
+            candidates_list = self.retriever.retrieve_batch(texts)
+        if pack_size <= 1:
+            return [self.extract(text, candidates=candidates) for text, candidates in zip(texts, candidates_list)]
+
+        # 已记忆化的直接复用，重复的条目只打包一次
+        keys = [self._memo_key(text, candidates, kb_version) for text, candidates in zip(texts, candidates_list)]
+        results = self.memo.extractions.get_many(keys) if self.memo.enabled else [None] * len(keys)
+        todo = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None and key not in todo:
+                todo[key] = i
+        indices = list(todo.values())
+        computed = {}
+        for start in range(0, len(indices), pack_size):
+            group_indices = indices[start:start + pack_size]
+            group = [(texts[i], candidates_list[i]) for i in group_indices]
+            for i, result in zip(group_indices, self._extract_packed(group)):
+                computed[keys[i]] = result
+                self.memo.extractions.put(keys[i], result)
+        return [computed[k] if r is None else r for k, r in zip(keys, results)]
+
+    def _extract_packed(self, group):
+        if len(group) == 1:
+            return [self._extract(group[0][0], group[0][1])]
+
+        built = [self.prompt_builder.build(candidates[:TOP_K_RERANK]) for _, candidates in group]
+        candidates_raw_list = [kept for _, kept, _ in built]
+        prompt = ttp_mapping_batch_prompt([
+            (text, candidates_str) for (text, _), (candidates_str, _, _) in zip(group, built)
+        ])
+        self._record_prompt(
+            prompt,
+            candidate_tokens=sum(tokens for _, _, tokens in built),
+            candidates_in=sum(min(len(candidates), TOP_K_RERANK) for _, candidates in group),
+            candidates_kept=sum(len(kept) for kept in candidates_raw_list),
+        )
+        with metrics.timer("extract.llm"):
+            # 流式 + 提前断开时，每条都拿到 prediction 才断开
+            response = self.llm.ask(prompt, expected_predictions=len(group))
+        with self._stats_lock:
+            self.pack_stats["packed_requests"] += 1
+            self.pack_stats["packed_items"] += len(group)
+
+        mappings = {}
+        try:
+            data = clean_json_response(response)
+            if isinstance(data, dict):
+                data = data.get("results", data.get("items", []))
+            for position, entry in enumerate(data):
+                try:
+                    index = int(entry.get("item", position)) if isinstance(entry, dict) else position
+                    if 0 <= index < len(group):
+                        mappings.setdefault(index, _as_mapping(entry))
+                except (ValueError, TypeError):
+                    continue
+        except Exception as e:
+            metrics.count("extract.parse_failures")
+            print(f"【打包响应解析失败】: {e}，{len(group)} 条回退为单条调用")
+
+        results = []
+        for i, ((text, candidates), candidates_raw) in enumerate(zip(group, candidates_raw_list)):
+            if i in mappings:
+                results.append((mappings[i]["prediction"], [mappings[i]["analysis"]], candidates_raw))
+            else:
+                with self._stats_lock:
+                    self.pack_stats["fallback_items"] += 1
+                results.append(self._extract(text, candidates))
+        return results
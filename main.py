@@ -1,28 +1,46 @@
 # main.py
-import base64
+import argparse
 
-import pandas as pd
-import json
-import time
 from mitre.knowledge_base import MITREKnowledgeBase
 from mitre.rag_retriever import RAGRetriever
 from llm.ttp_extractor import TTPExtractor
-from evaluator.metrics import calculate_coverage
+from evaluator.pipeline import run_pipeline
+from evaluator.sharding import run_sharded
+from utils.instrument import metrics
+from config import INPUT_CSV, OUTPUT_CSV
 import os
-import csv
 # 设置代理（保留不变）
 os.environ['HTTP_PROXY'] = "127.0.0.1:7890"
 os.environ['HTTPS_PROXY'] = "127.0.0.1:7890"
 
 
-def parse_ttp_list(s):
-    if pd.isna(s) or not s:
-        return []
-    s = s.strip("[]").replace("'", "").replace('"', "")
-    return [x.strip() for x in s.split(",") if x.strip()]
+def report_metrics(path=None):
+    if not metrics.enabled:
+        return
+    print(metrics.summary_table())
+    if path:
+        print(f"Metrics exported to {metrics.export(path)}")
+    profile = metrics.dump_profile()
+    if profile:
+        print(f"cProfile of stage {metrics.profile_stage!r} saved to {profile}")
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input", default=INPUT_CSV)
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--no-resume", action="store_true", help="忽略已有检查点，从头开始")
+    parser.add_argument("--workers", type=int, default=1, help="多进程分片数，每个进程各加载一份模型")
+    parser.add_argument("--metrics-out", default=None, help="分阶段统计导出路径：.json 为 JSON，其他为 Prometheus 文本格式")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        totals, _ = run_sharded(args.input, args.output, args.workers, resume=not args.no_resume)
+        totals.print_summary()
+        report_metrics(args.metrics_out)
+        print(f"Done! Saved {args.output}")
+        return
+
     print(1)
     kb = MITREKnowledgeBase()
     print(2)
@@ -30,58 +48,19 @@ def main():
     print(3)
     extractor = TTPExtractor(retriever)
 
-    df = pd.read_csv("data/wrongtext.csv")
-    results = []
-    full = 0
-    semi = 0
-    all = 0
-    no = 0
-    wrong = 0
-    for idx, row in df.iterrows():
-        print(f"Processing {idx + 1}/{len(df)}")
-
-        text = row["text1"]
-        labels = parse_ttp_list(row["labels"])
+    writer = run_pipeline(retriever, extractor, args.input, args.output, resume=not args.no_resume)
 
-        check, thinking, related = extractor.extract(text)
-        coverage = calculate_coverage(labels, check)
-        full += coverage['full_coverage']
-        semi += coverage['semi_coverage']
-        no += coverage['no_coverage']
-        wrong += coverage['false_positive']
-        all += (coverage['full_coverage']+coverage['semi_coverage']+coverage['false_positive'])
-        # --- 关键修改：对长文本字段进行 Base64 编码 ---
-        results.append({
-            "text1": text,
-            "labels": labels,
-            "check": check,
-            "think": thinking[:3000],
-            "related_techniques": (json.dumps(related, ensure_ascii=False))[:3000],
-            "score": (
-                f"Full{coverage['full_coverage']}, "
-                f"Semi{coverage['semi_coverage']}, "
-                f"No{coverage['no_coverage']}, "
-                f"FP{coverage['false_positive']}"
-            ),
-            **coverage
-        })
-        time.sleep(0.5)
-    print("full:",full)
-    print("semi:",semi)
-    print("no::",no)
-    print("wrong:",wrong)
-    print((full+semi)/all)
-    out_df = pd.DataFrame(results)
-    out_df.to_csv(
-        "output_1.csv",
-        index=False,
-        encoding="utf-8-sig",
-        # 强制对所有字段（包括数字和字符串）使用引号包裹
-        quoting=csv.QUOTE_ALL,
-        # 确保字段内部的引号正确转义（例如："think" 内部的 " 变成 ""）
-        doublequote=True
-    )
-    print("Done! Saved output.csv")
+    writer.totals.print_summary()
+    print("LLM cache:", extractor.llm.cache.stats())
+    print("Prompt:", extractor.prompt_report())
+    # 去重 / 记忆化：unique_ratio = 实际计算次数 / 总请求数，saved = 省下的计算次数
+    print("Dedup:", retriever.memo.report())
+    if kb.rerank_cache:
+        print("Rerank cache:", kb.rerank_cache.stats())
+    print("Rerank:", retriever.rerank_report())
+    print(kb.startup_report())
+    report_metrics(args.metrics_out)
+    print(f"Done! Saved {args.output}")
 
 
 if __name__ == "__main__":
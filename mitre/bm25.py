@@ -0,0 +1,88 @@
+# mitre/bm25.py
+
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'[a-z][a-z0-9]+')
+
+
+def tokenize(text: str):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Retriever:
+    """
+    词法检索通道 (BM25)，与向量检索互补：
+    - 文档 = 技术 name (计 name_weight 次) + description
+    - 用 data/mitre_search_index.json (keyword -> 技术列表) 做种子：索引里登记了、但正文中没出现的词，按 tf=1 补进文档
+    每个词的 BM25 权重在构建时预先算好，查询只是若干个 posting list 的加和。
+    """
+
+    def __init__(self, techniques: dict, search_index_path: str = None,
+                 k1: float = 1.5, b: float = 0.75, name_weight: int = 2):
+        self.tech_ids = list(techniques)
+        index = {tid: i for i, tid in enumerate(self.tech_ids)}
+
+        doc_tf = []
+        for tid in self.tech_ids:
+            info = techniques[tid]
+            tf = Counter(tokenize(info['description']))
+            for token in tokenize(info['name']):
+                tf[token] += name_weight
+            doc_tf.append(tf)
+
+        if search_index_path:
+            with open(search_index_path, "r", encoding="utf-8") as f:
+                search_index = json.load(f)
+            for keyword, tids in search_index.items():
+                for token in tokenize(keyword):
+                    for tid in tids:
+                        i = index.get(tid)
+                        if i is not None and token not in doc_tf[i]:
+                            doc_tf[i][token] = 1
+
+        n_docs = len(doc_tf)
+        doc_len = np.array([sum(tf.values()) for tf in doc_tf], dtype=np.float32)
+        avg_len = float(doc_len.mean()) if n_docs else 1.0
+        norm = k1 * (1 - b + b * doc_len / avg_len)
+
+        postings = defaultdict(list)
+        for i, tf in enumerate(doc_tf):
+            for token, count in tf.items():
+                postings[token].append((i, count))
+
+        # term -> (文档下标, 该词在各文档上的 BM25 分量)
+        self._weights = {}
+        for token, entries in postings.items():
+            docs = np.array([i for i, _ in entries], dtype=np.int32)
+            tf = np.array([c for _, c in entries], dtype=np.float32)
+            df = len(entries)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            self._weights[token] = (docs, idf * tf * (k1 + 1) / (tf + norm[docs]))
+
+    def scores(self, text: str):
+        """text 对所有技术的 BM25 分数 (长度为技术数的数组)。"""
+        scores = np.zeros(len(self.tech_ids), dtype=np.float32)
+        for token in set(tokenize(text)):
+            entry = self._weights.get(token)
+            if entry is not None:
+                docs, weights = entry
+                scores[docs] += weights
+        return scores
+
+    def search(self, text: str, top_k: int = 100):
+        """返回 [(tid, score), ...]，只包含分数 > 0 的技术。"""
+        scores = self.scores(text)
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        top_idx = np.argpartition(-scores, top_k - 1)[:top_k]
+        top_idx = top_idx[np.argsort(-scores[top_idx], kind="stable")]
+        return [(self.tech_ids[i], float(scores[i])) for i in top_idx if scores[i] > 0]
+
+    def search_batch(self, texts, top_k: int = 100):
+        return [self.search(text, top_k) for text in texts]
@@ -0,0 +1,139 @@
+# mitre/dense_index.py
+
+import numpy as np
+
+
+class DenseIndex:
+    """
+    技术向量的稠密索引：
+    - dtype: "float32"（精确）| "float16"（内存减半）| "int8"（每行一个 scale 的对称量化，内存 1/4）
+    - normalize: 存 L2 归一化后的向量，点积即 cosine
+    - n_clusters > 0 时启用 IVF：k-means 聚类，查询只扫描最近的 n_probe 个簇
+      （当前 ~900 个技术用不上，留给以后 enterprise + mobile + 自定义技术集合并后的规模）
+    search() 接受单条 (d,) 或多条 (Q, d) query，用 argpartition 取 top-k，不做全量排序。
+    """
+
+    DTYPES = ("float32", "float16", "int8")
+    # 低精度存储时分块转换回 float32 计算，避免一次性展开整个矩阵
+    BLOCK_ROWS = 4096
+
+    def __init__(self, vectors, dtype="float32", normalize=False, n_clusters=0, n_probe=8, seed=0):
+        if dtype not in self.DTYPES:
+            raise ValueError(f"Unknown dense index dtype: {dtype!r}, expected one of {self.DTYPES}")
+        self.dtype = dtype
+        self.normalize = normalize
+        self.n_probe = n_probe
+        self.scale = None
+
+        if normalize:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        if dtype == "float32":
+            # 不归一化时直接引用（可能是 mmap 的）原数组，不复制
+            self.data = vectors if vectors.dtype == np.float32 else np.asarray(vectors, dtype=np.float32)
+        elif dtype == "float16":
+            self.data = np.asarray(vectors, dtype=np.float16)
+        else:
+            vectors = np.asarray(vectors, dtype=np.float32)
+            self.scale = np.maximum(np.abs(vectors).max(axis=1), 1e-12).astype(np.float32) / 127.0
+            self.data = np.round(vectors / self.scale[:, None]).astype(np.int8)
+
+        self.centroids = None
+        self.lists = None
+        if n_clusters and n_clusters < len(self.data):
+            self._build_ivf(np.asarray(vectors, dtype=np.float32), n_clusters, seed)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        total = self.data.nbytes
+        if self.scale is not None:
+            total += self.scale.nbytes
+        if self.centroids is not None:
+            total += self.centroids.nbytes + sum(ix.nbytes for ix in self.lists)
+        return total
+
+    def subset(self, rows):
+        """
+        只含 rows 这些行的新索引（连续副本，已归一化 / 量化的数据直接复用），返回结果的下标是 rows 内的位置。
+        分片小，不建 IVF，精确检索。
+        """
+        sub = object.__new__(DenseIndex)
+        sub.dtype = self.dtype
+        sub.normalize = self.normalize
+        sub.n_probe = self.n_probe
+        sub.data = np.ascontiguousarray(self.data[rows])
+        sub.scale = None if self.scale is None else self.scale[rows]
+        sub.centroids = None
+        sub.lists = None
+        return sub
+
+    def _build_ivf(self, vectors, n_clusters, seed, n_iter=10):
+        """简单的 k-means（Lloyd 迭代），按内积把向量分到最近的中心。"""
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(n_clusters):
+                members = vectors[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            if self.normalize:
+                centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        self.centroids = centroids.astype(np.float32)
+        self.lists = [np.flatnonzero(assign == c).astype(np.int32) for c in range(n_clusters)]
+
+    def _scores(self, queries, rows=None):
+        """queries (Q, d) 对 rows（默认全部）的内积，返回 float32 的 (Q, len(rows))。"""
+        data = self.data if rows is None else self.data[rows]
+        if self.dtype == "float32":
+            return queries @ data.T
+
+        out = np.empty((len(queries), len(data)), dtype=np.float32)
+        for start in range(0, len(data), self.BLOCK_ROWS):
+            block = data[start:start + self.BLOCK_ROWS].astype(np.float32)
+            out[:, start:start + len(block)] = queries @ block.T
+        if self.scale is not None:
+            scale = self.scale if rows is None else self.scale[rows]
+            out *= scale[None, :]
+        return out
+
+    @staticmethod
+    def _top_k(scores, top_k):
+        """对每行取 top-k：argpartition O(N) 选出 k 个，再只对这 k 个排序。"""
+        top_k = min(top_k, scores.shape[1])
+        if top_k <= 0:
+            return np.zeros((len(scores), 0), dtype=np.int64)
+        if top_k < scores.shape[1]:
+            part = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        else:
+            part = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1)
+
+    def search(self, queries, top_k=20):
+        """返回 (indices, scores)，形状均为 (Q, top_k)，按分数降序。"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.normalize:
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        if self.centroids is None:
+            scores = self._scores(queries)
+            idx = self._top_k(scores, top_k)
+            return idx, np.take_along_axis(scores, idx, axis=1)
+
+        # IVF：每条 query 只扫描最近的 n_probe 个簇
+        probe = self._top_k(queries @ self.centroids.T, self.n_probe)
+        all_idx = np.zeros((len(queries), top_k), dtype=np.int64)
+        all_scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        for q, clusters in enumerate(probe):
+            rows = np.concatenate([self.lists[c] for c in clusters])
+            scores = self._scores(queries[q:q + 1], rows)
+            local = self._top_k(scores, top_k)[0]
+            all_idx[q, :len(local)] = rows[local]
+            all_scores[q, :len(local)] = scores[0, local]
+        return all_idx, all_scores
@@ -0,0 +1,16 @@
+# mitre/fusion.py
+
+
+def reciprocal_rank_fusion(ranked_lists, k: int = 60, top_k: int = None):
+    """
+    Reciprocal Rank Fusion：score(d) = Σ 1 / (k + rank_i(d))，rank 从 1 开始。
+    只看名次不看原始分数，所以向量点积和 BM25 这种量纲完全不同的分数可以直接融合。
+    输入是若干个 [(tid, score), ...]（已按分数降序），返回融合后的 [(tid, rrf_score), ...]。
+    """
+    fused = {}
+    for ranked in ranked_lists:
+        for rank, (tid, _) in enumerate(ranked, start=1):
+            fused[tid] = fused.get(tid, 0.0) + 1.0 / (k + rank)
+
+    merged = sorted(fused.items(), key=lambda x: x[1], reverse=True)
+    return merged[:top_k] if top_k else merged
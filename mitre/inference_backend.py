@@ -0,0 +1,170 @@
+# mitre/inference_backend.py
+# Embedding 编码器 / Cross-Encoder 的推理后端：
+#   - "torch"     原始 PyTorch fp32
+#   - "onnx"      导出为 ONNX，用 ONNX Runtime 在 CPU 上推理
+#   - "onnx-int8" 在 ONNX 基础上做动态 int8 量化（权重 int8，激活运行时量化）
+# 基准 / 测试用的替身后端不在 BACKENDS 里，由调用方用 register_backend() 显式注册
+# （benchmarks/stub_backend.py 的 "stub"），配置文件只能选上面三种。
+# ONNX 模型只在第一次使用时导出，之后直接从磁盘缓存加载，不再加载 PyTorch 权重。
+
+import os
+from types import SimpleNamespace
+
+from utils.atomic import tmp_path
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+# register_backend() 注册的额外后端：name -> (load_encoder, load_cross_encoder)
+_REGISTERED = {}
+
+
+def register_backend(name, load_encoder, load_cross_encoder):
+    """
+    注册一个不加载真实模型的替身后端（只供基准 / 测试使用）。
+    编码器需提供 encode(texts) -> 向量矩阵，Cross-Encoder 的 model 需提供 score(query_ids, desc_ids)。
+    """
+    _REGISTERED[name] = (load_encoder, load_cross_encoder)
+
+
+def is_registered_backend(backend):
+    return backend in _REGISTERED
+
+
+def check_backend(backend):
+    if backend not in BACKENDS and backend not in _REGISTERED:
+        raise ValueError(f"Unknown inference backend: {backend!r}, expected one of {BACKENDS}")
+
+
+def onnx_path(cache_dir, model_name, kind, backend):
+    safe_name = model_name.replace("/", "__")
+    suffix = ".int8.onnx" if backend == "onnx-int8" else ".onnx"
+    return os.path.join(cache_dir, "onnx", f"{safe_name}.{kind}{suffix}")
+
+
+class OnnxModel:
+    """
+    ONNX Runtime 会话的薄封装，调用方式与 HuggingFace 模型相同：
+    model(**inputs) 返回带 last_hidden_state / logits 属性的对象（torch.Tensor），
+    所以 MITREKnowledgeBase.encode / _score_pairs 不需要区分后端。
+    """
+
+    def __init__(self, path, output_name, config):
+        import onnxruntime as ort
+        import torch
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.output_name = output_name
+        self.config = config
+        self.device = torch.device("cpu")
+
+    def eval(self):
+        return self
+
+    def __call__(self, **inputs):
+        import torch
+
+        feed = {k: v.cpu().numpy() for k, v in inputs.items() if k in self.input_names}
+        output = self.session.run([self.output_name], feed)[0]
+        return SimpleNamespace(**{self.output_name: torch.from_numpy(output)})
+
+
+def _export(torch_model, tokenizer, path, output_name):
+    """导出 ONNX（batch / 序列长度为动态维度），先写本进程独有的临时文件再 rename。"""
+    import torch
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sample = tokenizer(["export sample"], ["export sample"], return_tensors="pt")
+    input_names = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in sample]
+    dynamic_axes = {k: {0: "batch", 1: "sequence"} for k in input_names}
+    dynamic_axes[output_name] = {0: "batch"}
+
+    torch_model.eval()
+    tmp = tmp_path(path)
+    with torch.no_grad():
+        torch.onnx.export(
+            torch_model,
+            tuple(sample[k] for k in input_names),
+            tmp,
+            input_names=input_names,
+            output_names=[output_name],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    os.replace(tmp, path)
+
+
+def _quantize(fp32_path, int8_path):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    tmp = tmp_path(int8_path)
+    quantize_dynamic(fp32_path, tmp, weight_type=QuantType.QInt8)
+    os.replace(tmp, int8_path)
+
+
+def _load_onnx(model_name, kind, backend, cache_dir, output_name, load_torch_model, tokenizer):
+    from transformers import AutoConfig
+
+    path = onnx_path(cache_dir, model_name, kind, backend)
+    if not os.path.exists(path):
+        fp32_path = onnx_path(cache_dir, model_name, kind, "onnx")
+        if not os.path.exists(fp32_path):
+            print(f"Exporting {model_name} ({kind}) to ONNX: {fp32_path}")
+            _export(load_torch_model(), tokenizer, fp32_path, output_name)
+        if backend == "onnx-int8":
+            print(f"Quantizing {fp32_path} -> {path}")
+            _quantize(fp32_path, path)
+    return OnnxModel(path, output_name, AutoConfig.from_pretrained(model_name))
+
+
+def load_encoder(model_name, backend, cache_dir):
+    """返回 (tokenizer, model)，model(**inputs).last_hidden_state 可用（注册的替身后端为 model.encode(texts)）。"""
+    check_backend(backend)
+    if backend in _REGISTERED:
+        return _REGISTERED[backend][0](model_name, cache_dir)
+
+    from transformers import AutoTokenizer, AutoModel
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def load_torch_model():
+        # 只用最后一层的 [CLS] 向量，不需要 MLM head（也不需要 pooler）
+        try:
+            model = AutoModel.from_pretrained(model_name, add_pooling_layer=False)
+        except TypeError:
+            model = AutoModel.from_pretrained(model_name)
+        return model.eval()
+
+    if backend == "torch":
+        return tokenizer, load_torch_model()
+    return tokenizer, _load_onnx(model_name, "encoder", backend, cache_dir,
+                                 "last_hidden_state", load_torch_model, tokenizer)
+
+
+def load_cross_encoder(model_name, backend, cache_dir, max_length=512):
+    """
+    torch 后端直接返回 sentence_transformers.CrossEncoder；
+    ONNX 后端返回同样带 tokenizer / model / activation_fn 属性的对象，但不加载 PyTorch 权重。
+    """
+    check_backend(backend)
+    if backend == "torch":
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name, max_length=max_length)
+    if backend in _REGISTERED:
+        return _REGISTERED[backend][1](model_name, cache_dir, max_length)
+
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def load_torch_model():
+        return AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+
+    model = _load_onnx(model_name, "cross_encoder", backend, cache_dir, "logits", load_torch_model, tokenizer)
+    # 与 CrossEncoder 默认一致：单标签输出过 Sigmoid
+    activation = torch.nn.Sigmoid() if model.config.num_labels == 1 else torch.nn.Identity()
+    return SimpleNamespace(tokenizer=tokenizer, model=model, activation_fn=activation, max_length=max_length)
@@ -0,0 +1,113 @@
+# mitre/keyword_matcher.py
+
+import re
+from collections import deque
+
+ID_PATTERN = re.compile(r't\d{4}(?:\.\d{3})?')
+
+ID_MATCH_SCORE = 1000.0
+NAME_MATCH_SCORE = 500.0
+
+
+class AhoCorasick:
+    """
+    多模式串精确匹配自动机：一次扫描文本即可找出所有模式串的出现，
+    耗时与文本长度 (+ 命中数) 成正比，与模式串数量无关。
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value):
+        node = 0
+        for ch in pattern:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """BFS 计算 fail 指针，并把 fail 链上的输出合并到每个节点。"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        self._built = True
+
+    def iter_matches(self, text: str):
+        """依次产出 (start, end, value)，end 为开区间。"""
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in out[node]:
+                yield i + 1 - length, i + 1, value
+
+
+class TechniqueMatcher:
+    """
+    关键词强制召回用的精确匹配器，在知识库加载时构建一次：
+    - ID：正则提取文本里的 Txxxx(.xxx)，再查 dict
+    - Name：所有技术名（小写，长度 > 4）放进一个 Aho-Corasick 自动机
+    word_boundary=False 时与原先的子串匹配 (name_lower in text_lower) 完全一致；
+    设为 True 时要求技术名两侧不是字母/数字，避免 "Proxy" 命中 "proxying" 这类情况。
+    """
+
+    def __init__(self, techniques: dict, word_boundary: bool = False):
+        self.word_boundary = word_boundary
+        # 记录知识库顺序：输出按该顺序排列，保证与逐个遍历 kb.techniques 的结果一致
+        self._order = {tid: i for i, tid in enumerate(techniques)}
+        self._ids = {tid.lower(): tid for tid in techniques}
+        self._names = AhoCorasick()
+        for tid, info in techniques.items():
+            name_lower = info['name'].lower()
+            if len(name_lower) > 4:
+                self._names.add(name_lower, tid)
+        self._names.build()
+
+    @staticmethod
+    def _is_word_char(ch):
+        return ch.isalnum() or ch == "_"
+
+    def match(self, text: str):
+        """返回 [(tid, score), ...]，ID 命中 1000 分，Name 命中 500 分，按知识库顺序排列。"""
+        text_lower = text.lower()
+        scores = {}
+
+        # 规则1：ID 直接匹配
+        for found in ID_PATTERN.findall(text_lower):
+            tid = self._ids.get(found)
+            if tid is not None:
+                scores[tid] = ID_MATCH_SCORE
+
+        # 规则2：Name 完整包含（ID 已命中的技术不再重复计分）
+        for start, end, tid in self._names.iter_matches(text_lower):
+            if tid in scores:
+                continue
+            if self.word_boundary and (
+                (start > 0 and self._is_word_char(text_lower[start - 1])) or
+                (end < len(text_lower) and self._is_word_char(text_lower[end]))
+            ):
+                continue
+            scores[tid] = NAME_MATCH_SCORE
+
+        return sorted(scores.items(), key=lambda x: self._order[x[0]])
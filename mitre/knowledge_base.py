@@ -1,103 +1,404 @@
+import hashlib
 import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 import numpy as np
-import torch
-from sentence_transformers import CrossEncoder
-from transformers import AutoTokenizer, AutoModelForMaskedLM
 import os
-from config import EMBEDDING_MODEL, CROSS_ENCODER_MODEL, MITRE_KNOWLEDGE_BASE
+from config import (
+    EMBEDDING_MODEL, CROSS_ENCODER_MODEL, MITRE_KNOWLEDGE_BASE, RETRIEVE_BATCH_SIZE, RERANK_BATCH_SIZE,
+    FILTER_ICS, EMBEDDING_CACHE_DIR, KEYWORD_MATCH_WORD_BOUNDARY,
+    KEYWORD_BOOST_MODE, MITRE_SEARCH_INDEX, DENSE_INDEX_DTYPE, DENSE_INDEX_NORMALIZE, DENSE_INDEX_CLUSTERS,
+    DENSE_INDEX_PROBE, RERANK_CACHE_ENABLED, INFERENCE_BACKEND, FIRST_STAGE_RERANKER, KB_SNAPSHOT
+)
+from .bm25 import BM25Retriever
+from .dense_index import DenseIndex
+from .inference_backend import load_encoder, check_backend, is_registered_backend
+from .keyword_matcher import TechniqueMatcher
+from .partitions import TechniquePartitions
+from .reranker import CrossEncoderReranker
+from .snapshot import load_snapshot, load_techniques_json
+from .term_index import TermIndex
+from utils.atomic import tmp_path
+from utils.rwlock import RWLock
 
 
-class MITREKnowledgeBase:
+# 编码语料模板：改动模板会改变缓存指纹，自动触发重新编码
+PARENT_CONTEXT_TEMPLATE = "PARENT: {parent_name} ({parent_id}). Parent Tactics: {parent_tactics}. "
+CORPUS_TEMPLATE = (
+    "{parent_context}"
+    "Technique ID: {tid}. "
+    "Name: {name}. "
+    "Description: {description}. "
+    "Tactics: {tactics}. "
+)
 
-    def __init__(self):
-        self.techniques = {}
-        self.tech_ids = []
-        self.embeddings = None
 
-        print("Initializing models...")
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _as_dict(info):
+    # 快照记录 (TechniqueRecord) 和 JSON 的 dict 统一成 dict 比较
+    return info.to_dict() if hasattr(info, "to_dict") else dict(info)
 
-        # Embedding 模型（你已经换成 MITRE 专用，很好）
-        self.tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
-        self.model = AutoModelForMaskedLM.from_pretrained(EMBEDDING_MODEL)
-        print("Tokenizers and Models loaded.")
 
-        # ==================== CrossEncoder 加载 + 强制修复 pad_token 问题 ====================
-        print(f"Loading CrossEncoder: {CROSS_ENCODER_MODEL}")
-        self.reranker = CrossEncoder(CROSS_ENCODER_MODEL, max_length=512)
+class MITREKnowledgeBase:
+    """
+    MITRE ATT&CK 知识库 + 检索模型。
+    torch / transformers / sentence_transformers / onnxruntime 都在第一次用到时才导入和加载，
+    只走缓存的运行（如仅重算指标）启动时不会付出模型加载的开销。
+    """
 
-        # 关键修复：很多模型（Qwen2/Llama/GPT2）没有 pad_token，导致 batch > 1 报错
-        if self.reranker.tokenizer.pad_token is None:
-            print("No pad_token found in CrossEncoder tokenizer, setting to eos_token...")
-            self.reranker.tokenizer.pad_token = self.reranker.tokenizer.eos_token
-            if hasattr(self.reranker.model.config, "pad_token_id"):
-                self.reranker.model.config.pad_token_id = self.reranker.tokenizer.eos_token_id
-        print("CrossEncoder loaded and pad_token fixed.")
-        # ===============================================================================
+    def __init__(self, backend=INFERENCE_BACKEND, use_rerank_cache=RERANK_CACHE_ENABLED, kb_path=MITRE_KNOWLEDGE_BASE):
+        # 推理后端见 mitre/inference_backend.py："torch" | "onnx" | "onnx-int8"（基准另外注册 "stub"）
+        check_backend(backend)
+        self.backend = backend
+        self.kb_path = kb_path
+        self.use_rerank_cache = use_rerank_cache
+        self.techniques = {}
+        # 编译好的二进制快照 (mitre/snapshot.py)；KB_SNAPSHOT = False 时为 None
+        self.snapshot = None
+        self.kb_sha256 = None
+        self.tech_ids = []
+        self.embeddings = None
+        self.dense_index = None
+        self._tokenizer = None
+        self._model = None
+        self._heavy_reranker = None
+        self._first_stage_reranker = None
+        self._bm25 = None
+        self._partitions = None
+        # 各组件的加载耗时（秒），按加载顺序记录
+        self.load_timings = OrderedDict()
+        # 热更新 (reload)：检索持读锁，交换数据时持写锁；version 每次更新 +1，
+        # reload_listeners 在写锁内调用（RAGRetriever 用它清掉依赖旧知识库的记忆化结果）
+        self.version_lock = RWLock()
+        self._reload_lock = threading.Lock()
+        self.version = 1
+        self.reload_listeners = []
 
         print("Loading knowledge base...")
-        self._load()
+        with self._timed("knowledge_base"):
+            self._load()
         print("Embedding techniques...")
-        self._embed()
+        with self._timed("technique_embeddings"):
+            self._embed()
         print(f"Techniques loaded: {len(self.techniques)}")
         print(f"Tech IDs loaded: {len(self.tech_ids)}")  # Check tech_ids length here
 
-        print("Models and knowledge base loaded successfully!")
+        print("Knowledge base loaded successfully! (models load on first use)")
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.load_timings[name] = time.perf_counter() - start
+
+    def startup_report(self):
+        """打印各组件加载耗时；未用到的模型显示 not loaded。"""
+        lines = ["Startup timing:"]
+        for name in ("knowledge_base", "technique_embeddings", "embedding_model", "cross_encoder",
+                     "first_stage_reranker"):
+            if name in self.load_timings:
+                lines.append(f"  {name:<22}{self.load_timings[name]:8.3f}s")
+            else:
+                lines.append(f"  {name:<22}{'not loaded':>9}")
+        return "\n".join(lines)
+
+    # Embedding 模型（你已经换成 MITRE 专用，很好）
+    # 按需加载：Embedding 缓存有效且 query 已预编码时，完全不需要加载模型
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            self._load_encoder()
+        return self._tokenizer
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._load_encoder()
+        return self._model
+
+    @property
+    def heavy_reranker(self):
+        if self._heavy_reranker is None:
+            self._heavy_reranker = CrossEncoderReranker(
+                CROSS_ENCODER_MODEL, self.techniques, self.backend,
+                use_cache=self.use_rerank_cache, timer=lambda: self._timed("cross_encoder")
+            )
+        return self._heavy_reranker
+
+    @property
+    def first_stage_reranker(self):
+        """级联精排的第一级（轻量模型），只在开启级联时用到。"""
+        if self._first_stage_reranker is None:
+            self._first_stage_reranker = CrossEncoderReranker(
+                FIRST_STAGE_RERANKER, self.techniques, self.backend,
+                use_cache=self.use_rerank_cache, timer=lambda: self._timed("first_stage_reranker")
+            )
+        return self._first_stage_reranker
+
+    @property
+    def reranker(self):
+        """主 Cross-Encoder（sentence_transformers.CrossEncoder 或 ONNX 封装）。"""
+        return self.heavy_reranker.model
+
+    @property
+    def rerank_cache(self):
+        return self.heavy_reranker.cache
+
+    @property
+    def bm25(self):
+        """BM25 词法检索通道，第一次用到时构建。"""
+        if self._bm25 is None:
+            self._bm25 = BM25Retriever(self.techniques, search_index_path=MITRE_SEARCH_INDEX)
+        return self._bm25
+
+    @property
+    def partitions(self):
+        """按 tactic / platform 预切的检索分片 (mitre/partitions.py)，第一次过滤检索时构建。"""
+        if self._partitions is None:
+            self._partitions = TechniquePartitions(self.techniques, self.tech_ids, self.dense_index, self.snapshot)
+        return self._partitions
+
+    def _load_encoder(self):
+        print(f"Loading embedding model: {EMBEDDING_MODEL} (backend: {self.backend})")
+        with self._timed("embedding_model"):
+            self._tokenizer, self._model = load_encoder(EMBEDDING_MODEL, self.backend, EMBEDDING_CACHE_DIR)
+        print("Tokenizers and Models loaded.")
 
     def _load(self):
-        """Loads the MITRE knowledge base from a JSON file."""
-        with open(MITRE_KNOWLEDGE_BASE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-       # self.techniques = data["techniques"]
-        self.techniques = {
-            tid: info for tid, info in data["techniques"].items()
-            if not tid.startswith("T0")  # 简单粗暴过滤 T0 开头的 ICS ID
-        }
+        """Loads the MITRE knowledge base from a JSON file (or its compiled snapshot)."""
+        self.kb_sha256 = file_sha256(self.kb_path)
+        self.snapshot, self.techniques = self._read_techniques(self.kb_path, self.kb_sha256)
+        self.keyword_matcher, self.term_index = self._build_keyword_indexes(self.techniques)
+
+    @staticmethod
+    def _read_techniques(path, kb_sha256):
+        """返回 (snapshot, techniques)；KB_SNAPSHOT = False 时 snapshot 为 None。"""
+        if KB_SNAPSHOT:
+            # 快照按知识库哈希 + ICS 过滤开关命名，JSON 只在第一次解析；之后 mmap 打开，多进程共享物理页
+            snapshot, _ = load_snapshot(path, kb_sha256, FILTER_ICS, EMBEDDING_CACHE_DIR)
+            return snapshot, snapshot.techniques
+        return None, load_techniques_json(path, FILTER_ICS)
+
+    @staticmethod
+    def _build_keyword_indexes(techniques):
+        # 关键词强制召回用的 ID / Name 匹配器，以及关键词软增强用的 term-technique 倒排索引，加载时构建一次
+        return (
+            TechniqueMatcher(techniques, word_boundary=KEYWORD_MATCH_WORD_BOUNDARY),
+            TermIndex(techniques, mode=KEYWORD_BOOST_MODE),
+        )
+
+    def _technique_text(self, tid, info, techniques=None):
+        """拼接用于编码的技术文本（子技术带上父技术上下文）。techniques 默认为当前知识库。"""
+        techniques = self.techniques if techniques is None else techniques
+        # 获取父技术ID和信息（假设 _load 已经完成了 Tactic 继承）
+        parent_id = tid.split('.')[0]
+
+        parent_context = ""
+        # 如果是子技术，增加父技术的名称和描述作为上下文
+        if tid != parent_id and parent_id in techniques:
+            parent_info = techniques[parent_id]
+            parent_context = PARENT_CONTEXT_TEMPLATE.format(
+                parent_name=parent_info['name'],
+                parent_id=parent_id,
+                parent_tactics=', '.join(parent_info.get('tactics', [])),
+            )
+
+        # 最终用于编码的文本 (T1070.007 的向量现在包含了 T1070 的信息)
+        return CORPUS_TEMPLATE.format(
+            parent_context=parent_context,
+            tid=tid,
+            name=info['name'],
+            description=info['description'],
+            tactics=', '.join(info.get('tactics', [])),
+        )
+
+    def embedding_fingerprint(self, kb_sha256=None):
+        """
+        Embedding 缓存指纹：模型名 + 推理后端 + 知识库文件哈希 + 语料模板 + ICS 过滤开关。
+        任何一项变化都会得到新的缓存文件名，旧缓存不会被误用。
+        """
+        raw = json.dumps({
+            "model": EMBEDDING_MODEL,
+            "backend": self.backend,
+            "kb_sha256": kb_sha256 or self.kb_sha256 or file_sha256(self.kb_path),
+            "template": [PARENT_CONTEXT_TEMPLATE, CORPUS_TEMPLATE],
+            "filter_ics": FILTER_ICS,
+        }, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def _embedding_cache_paths(self, kb_sha256=None):
+        fingerprint = self.embedding_fingerprint(kb_sha256)
+        base = os.path.join(EMBEDDING_CACHE_DIR, f"mitre_embeddings.{fingerprint}")
+        return base + ".npy", base + ".ids.json"
+
+    def _load_embedding_cache(self, vectors_file, ids_file):
+        """读取缓存；ID 列表和向量行数、当前知识库对不上时返回 False。"""
+        loaded = self._open_embedding_cache(vectors_file, ids_file, self.techniques)
+        if loaded is None:
+            return False
+        self.tech_ids, self.embeddings, self.dense_index = loaded
+        return True
+
+    @staticmethod
+    def _open_embedding_cache(vectors_file, ids_file, techniques):
+        """返回 (tech_ids, embeddings, dense_index)；缓存不存在或与 techniques 对不上时返回 None。"""
+        if not (os.path.exists(vectors_file) and os.path.exists(ids_file)):
+            return None
+        with open(ids_file, "r", encoding="utf-8") as f:
+            tech_ids = json.load(f)
+        # mmap 只读打开：多个 worker 进程共享同一份物理页，不再各自持有一份拷贝
+        embeddings = np.load(vectors_file, mmap_mode="r")
+        if len(tech_ids) != embeddings.shape[0] or set(tech_ids) != set(techniques):
+            print("Embedding cache does not match knowledge base, recomputing...")
+            return None
+        dense_index = DenseIndex(
+            embeddings, dtype=DENSE_INDEX_DTYPE, normalize=DENSE_INDEX_NORMALIZE,
+            n_clusters=DENSE_INDEX_CLUSTERS, n_probe=DENSE_INDEX_PROBE
+        )
+        return tech_ids, embeddings, dense_index
+
+    @staticmethod
+    def _save_embedding_cache(vectors_file, ids_file, tech_ids, embeddings):
+        # 先写临时文件再 rename，避免其他进程读到写了一半的缓存
+        # 临时文件名每个写者不同：多个进程同时保存时不会写进同一个文件
+        os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+        vectors_tmp, ids_tmp = tmp_path(vectors_file), tmp_path(ids_file)
+        with open(vectors_tmp, "wb") as f:
+            np.save(f, embeddings)
+        with open(ids_tmp, "w", encoding="utf-8") as f:
+            json.dump(tech_ids, f)
+        os.replace(vectors_tmp, vectors_file)
+        os.replace(ids_tmp, ids_file)
 
     def _embed(self):
         """Embeds the MITRE techniques using the model."""
-        embeddings_file = "mitre_embeddings.npy"  # File to save/load embeddings
+        vectors_file, ids_file = self._embedding_cache_paths()
 
-        # If embeddings are already saved, load them
-        if os.path.exists(embeddings_file):
-            print("Loading precomputed embeddings...")
-            self.embeddings = np.load(embeddings_file)
-            self.tech_ids = list(self.techniques.keys())
+        # If embeddings are already saved (and match the fingerprint), load them
+        if self._load_embedding_cache(vectors_file, ids_file):
+            print(f"Loading precomputed embeddings from {vectors_file}...")
             return
 
         # Otherwise, compute embeddings
-        corpus = []
-        self.tech_ids = []
-        for tid, info in self.techniques.items():
-            # 获取父技术ID和信息（假设 _load 已经完成了 Tactic 继承）
-            parent_id = tid.split('.')[0]
-
-            parent_context = ""
-            # 如果是子技术，增加父技术的名称和描述作为上下文
-            if tid != parent_id and parent_id in self.techniques:
-                parent_info = self.techniques[parent_id]
-                parent_context = (
-                    f"PARENT: {parent_info['name']} ({parent_id}). "
-                    f"Parent Tactics: {', '.join(parent_info.get('tactics', []))}. "
-                )
-
-            # 最终用于编码的文本 (T1070.007 的向量现在包含了 T1070 的信息)
-            text = (
-                f"{parent_context}"
-                f"Technique ID: {tid}. "
-                f"Name: {info['name']}. "
-                f"Description: {info['description']}. "
-                f"Tactics: {', '.join(info.get('tactics', []))}. "
-            )
-            corpus.append(text)
-            self.tech_ids.append(tid)
+        tech_ids = list(self.techniques.keys())
+        corpus = [self._technique_text(tid, self.techniques[tid]) for tid in tech_ids]
 
         print(f"Encoding {len(corpus)} MITRE techniques...")
 
         # Create inputs in small batches to avoid memory overload
-        batch_size = 8  # You can adjust this based on available memory
+        embeddings = self.encode(corpus, batch_size=8)
+        print(f"Encoding complete. {len(embeddings)} embeddings created.")
+
+        self._save_embedding_cache(vectors_file, ids_file, tech_ids, embeddings)
+        print(f"Embeddings saved to {vectors_file}.")
+
+        self._load_embedding_cache(vectors_file, ids_file)
+
+    def reload(self, path=None):
+        """
+        热更新知识库（ATT&CK 发布新版本后替换 JSON 即可，不用删缓存、不用重启）：
+        1. 与当前知识库逐条比较，找出新增 / 删除 / 内容变化的技术
+        2. 只重新编码编码文本变了的技术（含父技术改名等影响到的子技术），其余向量直接复用
+        3. 在锁外重建快照、向量缓存、稠密索引、关键词索引、BM25（已构建时）
+        4. 持写锁一次性交换，正在进行的检索（持读锁）要么全用旧版本、要么全用新版本
+        旧的快照 / 向量缓存文件不删除：其他 worker 进程可能还在 mmap 它们。
+        返回变更报告 dict。
+        """
+        with self._reload_lock:
+            return self._reload(path)
+
+    def _reload(self, path):
+        start = time.perf_counter()
+        path = path or self.kb_path
+        kb_sha256 = file_sha256(path)
+        report = {"path": path, "version": self.version, "added": [], "removed": [], "changed": [],
+                  "reembedded": 0, "seconds": 0.0}
+        if kb_sha256 == self.kb_sha256:
+            report["seconds"] = time.perf_counter() - start
+            print(f"Knowledge base unchanged ({path}), nothing to reload")
+            return report
+
+        old = self.techniques
+        snapshot, techniques = self._read_techniques(path, kb_sha256)
+        report["added"] = [tid for tid in techniques if tid not in old]
+        report["removed"] = [tid for tid in old if tid not in techniques]
+        report["changed"] = [
+            tid for tid in techniques if tid in old and _as_dict(techniques[tid]) != _as_dict(old[tid])
+        ]
+
+        vectors_file, ids_file = self._embedding_cache_paths(kb_sha256)
+        # 其他 worker 可能已经为同一个新文件算好了向量
+        loaded = self._open_embedding_cache(vectors_file, ids_file, techniques)
+        if loaded is None:
+            tech_ids = list(techniques)
+            texts = [self._technique_text(tid, techniques[tid], techniques) for tid in tech_ids]
+            old_rows = {tid: i for i, tid in enumerate(self.tech_ids)}
+            todo = [
+                i for i, tid in enumerate(tech_ids)
+                if tid not in old_rows or texts[i] != self._technique_text(tid, old[tid], old)
+            ]
+            todo_set = set(todo)
+            keep = [i for i in range(len(tech_ids)) if i not in todo_set]
+            embeddings = np.empty((len(tech_ids), self.embeddings.shape[1]), dtype=np.float32)
+            embeddings[keep] = self.embeddings[[old_rows[tech_ids[i]] for i in keep]]
+            if todo:
+                print(f"Re-encoding {len(todo)} changed MITRE techniques...")
+                embeddings[todo] = self.encode([texts[i] for i in todo], batch_size=8)
+            self._save_embedding_cache(vectors_file, ids_file, tech_ids, embeddings)
+            loaded = self._open_embedding_cache(vectors_file, ids_file, techniques)
+            report["reembedded"] = len(todo)
+        tech_ids, embeddings, dense_index = loaded
+
+        keyword_matcher, term_index = self._build_keyword_indexes(techniques)
+        bm25 = None
+        if self._bm25 is not None:
+            bm25 = BM25Retriever(techniques, search_index_path=MITRE_SEARCH_INDEX)
+
+        with self.version_lock.write():
+            self.kb_path, self.kb_sha256 = path, kb_sha256
+            self.snapshot, self.techniques = snapshot, techniques
+            self.tech_ids, self.embeddings, self.dense_index = tech_ids, embeddings, dense_index
+            self.keyword_matcher, self.term_index = keyword_matcher, term_index
+            self._bm25 = bm25
+            self._partitions = None
+            for reranker in (self._heavy_reranker, self._first_stage_reranker):
+                if reranker is not None:
+                    reranker.set_techniques(techniques)
+            self.version += 1
+            for listener in self.reload_listeners:
+                listener()
+
+        report["version"] = self.version
+        report["seconds"] = time.perf_counter() - start
+        print(f"Knowledge base reloaded to version {self.version} in {report['seconds']:.3f}s: "
+              f"{len(report['added'])} added, {len(report['removed'])} removed, "
+              f"{len(report['changed'])} changed, {report['reembedded']} re-embedded")
+        return report
+
+    def encode(self, texts, batch_size=RETRIEVE_BATCH_SIZE):
+        """
+        批量编码：按 mini-batch 做 padding + 前向，取最后一层 [CLS] 向量。
+        返回 (len(texts), hidden) 的 float32 矩阵。
+        """
+        if is_registered_backend(self.backend):
+            return self.model.encode(list(texts))
+
+        import torch
+
         all_embeddings = []
-        for i in range(0, len(corpus), batch_size):
-            batch = corpus[i:i + batch_size]
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
 
             # Tokenize the batch (Ensure proper padding and truncation)
             inputs = self.tokenizer(batch, padding=True, truncation=True, return_tensors="pt", max_length=512)
@@ -107,38 +408,39 @@ class MITREKnowledgeBase:
 
             # Forward pass: Get model output
             with torch.no_grad():
-                outputs = self.model(**inputs, output_hidden_states=True)
-
-            # Extract embeddings from the last hidden state (usually from the [CLS] token)
-            embeddings = outputs.hidden_states[-1][:, 0, :].squeeze().cpu().numpy()
+                outputs = self.model(**inputs)
 
-            # Append embeddings to the list
-            all_embeddings.extend(embeddings)
+            # Extract embeddings from the last hidden state ([CLS] token)
+            # 不要 squeeze：batch 只有 1 条时会把二维压成一维
+            all_embeddings.append(outputs.last_hidden_state[:, 0, :].cpu().numpy())
 
-        # Convert the list of embeddings to a numpy array
-        self.embeddings = np.array(all_embeddings)
-        print(f"Encoding complete. {len(self.embeddings)} embeddings created.")
-
-        # Save embeddings to a file
-        np.save(embeddings_file, self.embeddings)
-        print(f"Embeddings saved to {embeddings_file}.")
+        if not all_embeddings:
+            return np.zeros((0, self.model.config.hidden_size), dtype=np.float32)
+        return np.concatenate(all_embeddings, axis=0).astype(np.float32)
 
     def dense_search(self, query_emb, top_k=20):
         """Searches the embeddings for the top_k most relevant techniques."""
-        scores = np.dot(self.embeddings, query_emb.T).squeeze()
-        top_idx = np.argsort(scores)[::-1][:top_k]
-        return [(self.tech_ids[i], float(scores[i])) for i in top_idx]
+        return self.dense_search_batch(np.reshape(query_emb, (1, -1)), top_k=top_k)[0]
+
+    def dense_search_batch(self, query_embs, top_k=20):
+        """多条 query 一次检索，返回每条 query 的 [(tid, score), ...]。"""
+        indices, scores = self.dense_index.search(query_embs, top_k=top_k)
+        results = []
+        for idx_row, score_row in zip(indices, scores):
+            results.append([
+                (self.tech_ids[i], float(s)) for i, s in zip(idx_row, score_row) if np.isfinite(s)
+            ])
+        return results
 
     def rerank(self, query, candidates):
         """Re-ranks the candidate techniques based on the query."""
-        texts = []
-        for tid, _ in candidates:
-            info = self.techniques[tid]
-            texts.append([query, info["description"]])
-
-        # Predict using the cross-encoder model
-        scores = self.reranker.predict(texts)
-        reranked = list(zip([c[0] for c in candidates], scores))
+        return self.rerank_batch([query], [candidates])[0]
 
-        reranked.sort(key=lambda x: x[1], reverse=True)
-        return reranked
+    def rerank_batch(self, queries, candidates_list, batch_size=RERANK_BATCH_SIZE, stage="heavy"):
+        """
+        多条 query 的 (query, description) 对拼在一起，共享 Cross-Encoder 的 batch，
+        再按 query 拆回去分别排序。结果与逐条调用 rerank() 相同。
+        stage: "heavy" 用 CROSS_ENCODER_MODEL；"first" 用级联精排的轻量模型 FIRST_STAGE_RERANKER。
+        """
+        reranker = self.first_stage_reranker if stage == "first" else self.heavy_reranker
+        return reranker.rerank_batch(queries, candidates_list, batch_size=batch_size)
@@ -0,0 +1,93 @@
+# mitre/partitions.py
+# 按 tactic / platform 预切的检索分片，RAGRetriever.retrieve(text, tactics=..., platforms=...) 用它缩小搜索范围：
+#   - 每个 tactic、每个 platform 一个分片（第一次用到过滤时一次性构建），多个条件组合的分片按需构建并缓存
+#   - 分片 = 命中位掩码的技术行号 + 这些行的连续向量副本 (DenseIndex.subset) + 允许的技术 ID 集合（过滤强制召回）
+# 过滤语义：同一类里任一命中（tactics=["execution", "persistence"] 取并集），tactic 与 platform 之间同时满足。
+# 位集来自知识库快照 (mitre/snapshot.py)；KB_SNAPSHOT = False 时由技术表现算。
+
+import numpy as np
+
+from utils.lru import LRUCache
+from .snapshot import name_bits, name_mask
+
+# 组合条件的分片缓存条数
+COMBINED_CACHE_SIZE = 256
+
+
+class Partition:
+    """一个过滤条件下的技术子集。"""
+
+    __slots__ = ("key", "rows", "tech_ids", "allowed", "index")
+
+    def __init__(self, key, rows, tech_ids, dense_index):
+        self.key = key
+        self.rows = rows
+        self.tech_ids = [tech_ids[i] for i in rows]
+        self.allowed = frozenset(self.tech_ids)
+        self.index = dense_index.subset(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def dense_search_batch(self, query_embs, top_k=20):
+        """与 MITREKnowledgeBase.dense_search_batch 相同的输出格式，只在分片内检索。"""
+        if not len(self.rows):
+            return [[] for _ in range(len(np.atleast_2d(query_embs)))]
+        indices, scores = self.index.search(query_embs, top_k=top_k)
+        return [
+            [(self.tech_ids[i], float(s)) for i, s in zip(idx_row, score_row) if np.isfinite(s)]
+            for idx_row, score_row in zip(indices, scores)
+        ]
+
+
+class TechniquePartitions:
+
+    def __init__(self, techniques, tech_ids, dense_index, snapshot=None):
+        self.tech_ids = tech_ids
+        self.dense_index = dense_index
+        if snapshot is not None:
+            # 快照的位集按知识库顺序存储，换成向量矩阵的行顺序
+            order = [snapshot.index[tid] for tid in tech_ids]
+            self.tactic_names = list(snapshot.tactic_names)
+            self.platform_names = list(snapshot.platform_names)
+            self.tactic_bits = np.asarray(snapshot.tactic_bits)[order]
+            self.platform_bits = np.asarray(snapshot.platform_bits)[order]
+        else:
+            infos = [techniques[tid] for tid in tech_ids]
+            self.tactic_names = sorted({t for info in infos for t in info.get("tactics", [])})
+            self.platform_names = sorted({p for info in infos for p in info.get("platforms", [])})
+            self.tactic_bits = name_bits([info.get("tactics", []) for info in infos], self.tactic_names)
+            self.platform_bits = name_bits([info.get("platforms", []) for info in infos], self.platform_names)
+
+        # 单个 tactic / platform 的分片预先切好
+        self.slices = {}
+        for name in self.tactic_names:
+            key = ((name,), ())
+            self.slices[key] = self._build(key)
+        for name in self.platform_names:
+            key = ((), (name,))
+            self.slices[key] = self._build(key)
+        self._combined = LRUCache(COMBINED_CACHE_SIZE)
+
+    def _build(self, key):
+        tactics, platforms = key
+        keep = np.ones(len(self.tech_ids), dtype=bool)
+        if tactics:
+            keep &= (self.tactic_bits & name_mask(tactics, self.tactic_names, "tactics")) != 0
+        if platforms:
+            keep &= (self.platform_bits & name_mask(platforms, self.platform_names, "platforms")) != 0
+        return Partition(key, np.flatnonzero(keep), self.tech_ids, self.dense_index)
+
+    def get(self, tactics=None, platforms=None):
+        """返回过滤条件对应的 Partition；两者都为空时返回 None（不过滤）。未知的名字抛 ValueError。"""
+        if isinstance(tactics, str):
+            tactics = [tactics]
+        if isinstance(platforms, str):
+            platforms = [platforms]
+        key = (tuple(sorted(set(tactics or ()))), tuple(sorted(set(platforms or ()))))
+        if key == ((), ()):
+            return None
+        partition = self.slices.get(key)
+        if partition is None:
+            partition = self._combined.get_or_compute(key, lambda: self._build(key))
+        return partition
@@ -1,17 +1,41 @@
 # mitre/rag_retriever.py
 
-import re
-import torch
-from config import TOP_K_EMBED, TOP_K_RERANK
+import threading
+
+import numpy as np
+
+from config import (
+    TOP_K_EMBED, TOP_K_RERANK, RETRIEVE_BATCH_SIZE, HYBRID_RETRIEVAL, TOP_K_SPARSE, RRF_K, RRF_SCORE_SCALE,
+    RERANK_CASCADE, CASCADE_KEEP, EARLY_EXIT_ON_ID_MATCH, EARLY_EXIT_MARGIN, QUERY_MEMO_SIZE
+)
+from utils.instrument import metrics
+from utils.lru import QueryMemo, normalize_text
+from .fusion import reciprocal_rank_fusion
+from .keyword_matcher import ID_MATCH_SCORE
 from .knowledge_base import MITREKnowledgeBase
 
 
 class RAGRetriever:
 
-    def __init__(self, kb: MITREKnowledgeBase):
+    def __init__(self, kb: MITREKnowledgeBase, cascade=RERANK_CASCADE, cascade_keep=CASCADE_KEEP,
+                 early_exit_on_id=EARLY_EXIT_ON_ID_MATCH, early_exit_margin=EARLY_EXIT_MARGIN,
+                 memo: QueryMemo = None):
         self.kb = kb
-        self.model = kb.model
-        self.tokenizer = kb.tokenizer
+        # 按 query 文本记忆化的向量 / 检索结果，TTPExtractor 也用同一个对象缓存抽取结果
+        self.memo = memo if memo is not None else QueryMemo(QUERY_MEMO_SIZE)
+        # 知识库热更新后，检索 / 抽取结果都可能变化（query 向量与知识库无关，保留）
+        kb.reload_listeners.append(self._on_kb_reload)
+        self.cascade = cascade
+        self.cascade_keep = cascade_keep
+        self.early_exit_on_id = early_exit_on_id
+        self.early_exit_margin = early_exit_margin
+        # 精排开销统计：每条 query 平均送进两级 Cross-Encoder 的 pair 数、提前退出的比例
+        self.rerank_stats = {"queries": 0, "early_exit": 0, "first_stage_pairs": 0, "heavy_pairs": 0}
+        self._stats_lock = threading.Lock()
+
+    def _on_kb_reload(self):
+        self.memo.retrievals.clear()
+        self.memo.extractions.clear()
 
     def _heuristic_query_expansion(self, text: str) -> str:
         """
@@ -43,33 +67,18 @@ class RAGRetriever:
             return f"{text} [CONTEXT: {expansion}]"
         return text
 
-    def _keyword_force_recall(self, text, current_candidates, top_k_force=10):
+    def _keyword_force_recall(self, text, current_candidates, top_k_force=10, partition=None):
         """
         关键词强制召回 (Hard Match)：
         如果文本中直接包含某个 Technique 的 Name 或 ID，无视向量分数，强制将其加入候选列表。
         这是解决 "Credential Dumping" 文本却搜不到 T1003 的最有效手段。
+        partition: 过滤检索时只召回分片内的技术。
         """
-        text_lower = text.lower()
-        forced_candidates = []
-
-        # 提取文本中的潜在 ID (如 T1003)
-        potential_ids = re.findall(r't\d{4}(?:\.\d{3})?', text_lower)
-
-        for tid, info in self.kb.techniques.items():
-            name_lower = info['name'].lower()
-
-            # 规则1：ID 直接匹配
-            if tid.lower() in potential_ids:
-                forced_candidates.append((tid, 1000.0))  # 给最高分
-                continue
-
-            # 规则2：Name 完整包含 (例如 text="performed credential dumping", name="os credential dumping")
-            # 这里的逻辑是：如果技术名较长(>3词)且出现在文本里；或者技术名较短但完全匹配
-            if len(name_lower) > 4 and name_lower in text_lower:
-                forced_candidates.append((tid, 500.0))
-
-            # 规则3：Name 的核心词高度重合 (可选，防止过于宽泛)
-            # 这里简单起见，只做精确短语匹配
+        # 规则1：ID 直接匹配 -> 1000 分；规则2：Name 完整包含 -> 500 分
+        # 匹配器在知识库加载时预编译 (Aho-Corasick)，耗时只与文本长度有关
+        forced_candidates = self.kb.keyword_matcher.match(text)
+        if partition is not None:
+            forced_candidates = [(tid, score) for tid, score in forced_candidates if tid in partition.allowed]
 
         # 将强制召回的结果合并到 current_candidates
         # 使用字典去重，保留最高分
@@ -84,60 +93,236 @@ class RAGRetriever:
 
         return merged
 
-    def _keyword_boost(self, text, candidates):
+    def _keyword_boost(self, text, candidates, match_counts=None):
         """
         原来的软性关键词增强 (Soft Boost)
+        命中数来自知识库加载时预建的 TermIndex，一次向量化查表，不再逐个候选拼接文本做子串扫描。
+        match_counts: 可选，TermIndex.match_counts(_batch) 预先算好的整行结果。
         """
-        keywords = set(re.findall(r'\b[a-zA-Z]{3,}\b', text.lower()))
+        if not candidates:
+            return []
+        if match_counts is None:
+            match_counts = self.kb.term_index.match_counts(text)
+        matches = self.kb.term_index.lookup(match_counts, candidates)
 
-        boosted_candidates = []
-        for tid, score in candidates:
-            info = self.kb.techniques[tid]
-            content = (info['name'] + " " + info['description']).lower()
-            matches = sum(1 for kw in keywords if kw in content)
-
-            # 稍微降低一点权重，避免干扰强制召回的高分
-            new_score = score + (matches * 2)
-            boosted_candidates.append((tid, new_score))
+        # 稍微降低一点权重，避免干扰强制召回的高分
+        boosted_candidates = [
+            (tid, score + int(m) * 2) for (tid, score), m in zip(candidates, matches)
+        ]
 
         boosted_candidates.sort(key=lambda x: x[1], reverse=True)
         return boosted_candidates
 
-    def retrieve(self, text: str):
-        # 0. 预处理：查询扩展
-        expanded_query = self._heuristic_query_expansion(text)
-
-        # 1. 向量检索 (Dense Retrieval)
-        # 使用扩展后的 Query 进行检索
-        inputs = self.kb.tokenizer([expanded_query], padding=True, truncation=True, return_tensors="pt", max_length=512)
-
-        with torch.no_grad():
-            outputs = self.model(**inputs, output_hidden_states=True)
-
-        q_emb = outputs.hidden_states[-1][:, 0, :].cpu().numpy()[0]
-
-        # 扩大初筛范围，给后续步骤更多机会
-        dense_candidates = self.kb.dense_search(q_emb, top_k=TOP_K_EMBED)
-
-        # 2. 关键词强制召回 (Hard Recall) - 这是修复漏召回的关键步骤
-        # 注意：这里用原始 text 匹配，防止扩展词干扰精确匹配
-        mixed_candidates = self._keyword_force_recall(text, dense_candidates)
-
-        # 3. 关键词软性增强 (Soft Boost)
-        boosted_candidates = self._keyword_boost(text, mixed_candidates)
-
-        # 4. 准备给 Reranker 的数据
-        # 此时列表头部是 强制召回(Score=1000) + 向量高分
-        # 取前 N 个给精排模型
-        top_n_for_rerank = boosted_candidates[:(TOP_K_RERANK * 2)]  # 扩大 Rerank 范围，例如 20*3=60
+    def embed_queries(self, texts, batch_size=RETRIEVE_BATCH_SIZE):
+        """查询扩展 + 编码，结果可以保存下来作为 retrieve_batch 的 query_embs。"""
+        expanded_queries = [self._heuristic_query_expansion(t) for t in texts]
+        return self._encode_queries(expanded_queries, batch_size=batch_size)
+
+    def _encode_queries(self, expanded_queries, batch_size=RETRIEVE_BATCH_SIZE):
+        """编码扩展后的 query：已记忆化的直接复用，重复的 query 只编码一次。"""
+        if not self.memo.enabled:
+            return self.kb.encode(expanded_queries, batch_size=batch_size)
+
+        cache = self.memo.embeddings
+        vectors = cache.get_many(expanded_queries)
+        todo = list(dict.fromkeys(q for q, v in zip(expanded_queries, vectors) if v is None))
+        if todo:
+            computed = dict(zip(todo, self.kb.encode(todo, batch_size=batch_size)))
+            for q, v in computed.items():
+                cache.put(q, v)
+            vectors = [computed[q] if v is None else v for q, v in zip(expanded_queries, vectors)]
+        if not vectors:
+            return self.kb.encode([], batch_size=batch_size)
+        return np.stack(vectors)
+
+    def _fuse_sparse(self, expanded_queries, dense_lists, partition=None):
+        """
+        混合检索：BM25 候选与向量候选做 RRF 融合，取前 TOP_K_EMBED 个。
+        RRF 分数很小 (<= 2/61)，乘以 RRF_SCORE_SCALE 放大到与向量点积相近的量级，
+        这样后面关键词增强的 +2/词 仍然只是微调，强制召回的 500/1000 分仍然排在最前。
+        """
+        if partition is None:
+            sparse_lists = self.kb.bm25.search_batch(expanded_queries, top_k=TOP_K_SPARSE)
+        else:
+            # BM25 只对命中的词累加分数，本身很便宜：全量打分后过滤再截断
+            sparse_lists = [
+                [c for c in ranked if c[0] in partition.allowed][:TOP_K_SPARSE]
+                for ranked in self.kb.bm25.search_batch(expanded_queries, top_k=len(self.kb.tech_ids))
+            ]
+        fused_lists = []
+        for dense, sparse in zip(dense_lists, sparse_lists):
+            fused = reciprocal_rank_fusion([dense, sparse], k=RRF_K, top_k=TOP_K_EMBED)
+            fused_lists.append([(tid, score * RRF_SCORE_SCALE) for tid, score in fused])
+        return fused_lists
+
+    def retrieve(self, text: str, tactics=None, platforms=None):
+        return self.retrieve_batch([text], tactics=tactics, platforms=platforms)[0]
+
+    def retrieve_batch(self, texts, batch_size=RETRIEVE_BATCH_SIZE, query_embs=None, tactics=None, platforms=None):
+        """
+        批量检索：与逐条调用 retrieve() 结果相同，但
+        - 所有扩展后的 query 按 mini-batch padding 后一起过 Embedding 模型
+        - 向量检索是一次 (Q, N) 的矩阵乘法
+        - 所有 query 的 (query, description) 对共享 Cross-Encoder 的 batch
+        query_embs: 可选，扩展后 query 的预编码向量；传入时不会加载/调用 Embedding 模型。
+        相同（只差空白）的 query 只检索一次，结果记忆化在 self.memo.retrievals 里。
+        整个调用持知识库的读锁，kb.reload() 的交换要等它结束，结果只来自同一个知识库版本。
+        tactics / platforms: 只在对应的技术分片 (mitre/partitions.py) 里检索；结果与不过滤的流程
+        在每一步截断前剔除分片外技术的结果相同，但向量检索只扫描分片、精排不再浪费在分片外的候选上。
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        with self.kb.version_lock.read():
+            partition = self.kb.partitions.get(tactics, platforms) if (tactics or platforms) else None
+            return self._retrieve_batch_memo(texts, batch_size, query_embs, partition)
+
+    def _retrieve_batch_memo(self, texts, batch_size, query_embs, partition=None):
+        if not self.memo.enabled:
+            return self._retrieve_batch(texts, batch_size, query_embs, partition)
+
+        cache = self.memo.retrievals
+        # 带上知识库版本，热更新后旧版本的结果不会再被命中
+        version = self.kb.version
+        partition_key = None if partition is None else partition.key
+        keys = [(version, normalize_text(t), partition_key) for t in texts]
+        results = cache.get_many(keys)
+        # 每个未命中的 key 用它第一次出现的原文计算
+        todo = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None and key not in todo:
+                todo[key] = i
+        if todo:
+            indices = list(todo.values())
+            computed = self._retrieve_batch(
+                [texts[i] for i in indices], batch_size,
+                None if query_embs is None else np.asarray(query_embs)[indices],
+                partition,
+            )
+            computed = dict(zip(todo, computed))
+            for key, result in computed.items():
+                cache.put(key, result)
+            results = [computed[k] if r is None else r for k, r in zip(keys, results)]
+        metrics.count("retrieve.memo_saved", len(texts) - len(todo))
+        return results
+
+    def _retrieve_batch(self, texts, batch_size=RETRIEVE_BATCH_SIZE, query_embs=None, partition=None):
+        rerank_inputs = self._rerank_candidates_batch(texts, batch_size, query_embs, partition)
 
         # 5. Cross-Encoder 重排 (Reranking)
         # 注意：即使是强制召回的高分，也需要经过 Reranker 确认上下文是否真的相关
-        reranked = self.kb.rerank(text, top_n_for_rerank)
+        reranked_lists = self._rerank(texts, rerank_inputs)
 
         # 6. 最终截断
-        final_results = reranked[:TOP_K_RERANK]
+        return [self._format_results(reranked[:TOP_K_RERANK]) for reranked in reranked_lists]
+
+    def rerank_candidates_batch(self, texts, batch_size=RETRIEVE_BATCH_SIZE, query_embs=None,
+                                tactics=None, platforms=None):
+        """检索流程中 Cross-Encoder 之前的部分，返回每条 query 送去精排的 [(tid, score), ...]。"""
+        with self.kb.version_lock.read():
+            partition = self.kb.partitions.get(tactics, platforms) if (tactics or platforms) else None
+            return self._rerank_candidates_batch(texts, batch_size, query_embs, partition)
+
+    def _dense_candidates(self, query_embs, partition=None):
+        if partition is None:
+            return self.kb.dense_search_batch(query_embs, top_k=TOP_K_EMBED)
+        return partition.dense_search_batch(query_embs, top_k=TOP_K_EMBED)
+
+    def _rerank_candidates_batch(self, texts, batch_size, query_embs, partition):
+        metrics.count("retrieve.queries", len(texts))
+        if partition is not None:
+            metrics.count("retrieve.filtered_queries", len(texts))
+        # 0. 预处理：查询扩展
+        with metrics.timer("retrieve.expand"):
+            expanded_queries = [self._heuristic_query_expansion(t) for t in texts]
 
+        # 1. 向量检索 (Dense Retrieval)
+        # 使用扩展后的 Query 进行检索，扩大初筛范围，给后续步骤更多机会
+        if query_embs is None:
+            with metrics.timer("retrieve.embed"):
+                query_embs = self._encode_queries(expanded_queries, batch_size=batch_size)
+        with metrics.timer("retrieve.dense_search"):
+            dense_lists = self._dense_candidates(query_embs, partition)
+
+        # 1.5 可选：BM25 词法检索作为第二个候选来源，RRF 融合
+        if HYBRID_RETRIEVAL:
+            with metrics.timer("retrieve.sparse_fusion"):
+                dense_lists = self._fuse_sparse(expanded_queries, dense_lists, partition)
+
+        # 所有 query 的关键词命中数一次算好 (Q, N)
+        with metrics.timer("retrieve.match_counts"):
+            match_counts = self.kb.term_index.match_counts_batch(texts)
+
+        rerank_inputs = []
+        for text, dense_candidates, counts in zip(texts, dense_lists, match_counts):
+            # 2. 关键词强制召回 (Hard Recall) - 这是修复漏召回的关键步骤
+            # 注意：这里用原始 text 匹配，防止扩展词干扰精确匹配
+            with metrics.timer("retrieve.keyword_force_recall"):
+                mixed_candidates = self._keyword_force_recall(text, dense_candidates, partition=partition)
+
+            # 3. 关键词软性增强 (Soft Boost)
+            with metrics.timer("retrieve.keyword_boost"):
+                boosted_candidates = self._keyword_boost(text, mixed_candidates, match_counts=counts)
+
+            # 4. 准备给 Reranker 的数据
+            # 此时列表头部是 强制召回(Score=1000) + 向量高分
+            # 取前 N 个给精排模型
+            rerank_inputs.append(boosted_candidates[:(TOP_K_RERANK * 2)])  # 扩大 Rerank 范围
+        return rerank_inputs
+
+    def _is_decisive(self, candidates):
+        """检索阶段已经能确定第一名时返回 True，跳过精排。"""
+        if len(candidates) < 2:
+            return bool(candidates) and (self.early_exit_on_id or self.early_exit_margin is not None)
+        top, second = candidates[0][1], candidates[1][1]
+        # 文本里直接出现了唯一一个技术 ID
+        if self.early_exit_on_id and top >= ID_MATCH_SCORE > second:
+            return True
+        return self.early_exit_margin is not None and top - second >= self.early_exit_margin
+
+    def _rerank(self, texts, rerank_inputs):
+        """
+        级联精排：
+        - 提前退出：第一名已经确定的 query 直接沿用检索阶段的排序
+        - 开启级联时，轻量模型先给全部候选打分，只保留前 cascade_keep 个交给主模型
+        """
+        results = list(rerank_inputs)
+        todo = [i for i, cands in enumerate(rerank_inputs) if not self._is_decisive(cands)]
+        with self._stats_lock:
+            self.rerank_stats["queries"] += len(texts)
+            self.rerank_stats["early_exit"] += len(texts) - len(todo)
+        if not todo:
+            return results
+
+        queries = [texts[i] for i in todo]
+        inputs = [rerank_inputs[i] for i in todo]
+        if self.cascade:
+            with self._stats_lock:
+                self.rerank_stats["first_stage_pairs"] += sum(len(c) for c in inputs)
+            with metrics.timer("retrieve.rerank_first_stage"):
+                first = self.kb.rerank_batch(queries, inputs, stage="first")
+            inputs = [ranked[:self.cascade_keep] for ranked in first]
+
+        with self._stats_lock:
+            self.rerank_stats["heavy_pairs"] += sum(len(c) for c in inputs)
+        with metrics.timer("retrieve.rerank"):
+            reranked_lists = self.kb.rerank_batch(queries, inputs)
+        for i, reranked in zip(todo, reranked_lists):
+            results[i] = reranked
+        return results
+
+    def rerank_report(self):
+        with self._stats_lock:
+            stats = dict(self.rerank_stats)
+        n = stats["queries"] or 1
+        return {
+            "queries": stats["queries"],
+            "early_exit_rate": stats["early_exit"] / n,
+            "first_stage_pairs_per_query": stats["first_stage_pairs"] / n,
+            "heavy_pairs_per_query": stats["heavy_pairs"] / n,
+        }
+
+    def _format_results(self, final_results):
         result = []
         for tid, score in final_results:
             info = self.kb.techniques[tid]
@@ -149,4 +334,4 @@ class RAGRetriever:
                 #"score": float(score)
             })
 
-        return result
\ No newline at end of file
+        return result
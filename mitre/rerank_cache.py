@@ -0,0 +1,46 @@
+# mitre/rerank_cache.py
+
+import hashlib
+
+from config import RERANK_CACHE_PATH, RERANK_CACHE_MAX_ENTRIES
+from utils.sqlite_cache import SQLiteLRUCache
+
+# 分数格式版本，算进命名空间：2 = 批量精排路径统一过 CrossEncoder 的输出激活（旧版本缓存的是未过 Sigmoid 的 logit）
+SCORE_VERSION = 2
+
+
+def short_hash(text: str):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class RerankScoreCache:
+    """
+    Cross-Encoder 分数的持久化缓存：(模型, query 哈希, technique_id, 描述哈希) -> score，LRU 淘汰。
+    描述哈希保证知识库更新后旧分数自动失效；模型名和描述截断长度一起算进 query 哈希的命名空间。
+    """
+
+    def __init__(self, model_name: str, desc_budget=None, path=RERANK_CACHE_PATH,
+                 max_entries=RERANK_CACHE_MAX_ENTRIES):
+        self.namespace = f"{model_name}|{desc_budget}|v{SCORE_VERSION}"
+        self.store = SQLiteLRUCache(path, max_entries=max_entries)
+        # 本进程内的统计：总 pair 数 / 真正送进 Cross-Encoder 的 pair 数
+        self.pairs_total = 0
+        self.pairs_scored = 0
+
+    def make_key(self, query: str, tid: str, desc_hash: str):
+        return f"{short_hash(self.namespace + '|' + query)}:{tid}:{desc_hash}"
+
+    def get_many(self, keys):
+        return {k: float(v) for k, v in self.store.get_many(keys).items()}
+
+    def put_many(self, items):
+        self.store.put_many((k, repr(float(v))) for k, v in items)
+
+    def stats(self):
+        avoided = self.pairs_total - self.pairs_scored
+        return {
+            "pairs_total": self.pairs_total,
+            "pairs_scored": self.pairs_scored,
+            "compute_avoided": avoided / self.pairs_total if self.pairs_total else 0.0,
+            **self.store.stats(),
+        }
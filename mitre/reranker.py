@@ -0,0 +1,176 @@
+# mitre/reranker.py
+
+from contextlib import nullcontext
+
+from config import RERANK_DESC_MAX_TOKENS, RERANK_BATCH_SIZE, EMBEDDING_CACHE_DIR
+from utils.instrument import metrics
+from .inference_backend import load_cross_encoder, is_registered_backend
+from .rerank_cache import RerankScoreCache, short_hash
+
+
+class CrossEncoderReranker:
+    """
+    单个 Cross-Encoder 精排模型：按需加载 + 技术描述预 tokenize + 分数持久化缓存。
+    MITREKnowledgeBase 持有主精排模型 (CROSS_ENCODER_MODEL)，开启级联时还会持有一个轻量的第一级模型。
+    """
+
+    def __init__(self, model_name, techniques, backend, use_cache=True, timer=None):
+        self.model_name = model_name
+        self.techniques = techniques
+        self.backend = backend
+        self.use_cache = use_cache
+        self._timer = timer or nullcontext
+        self._model = None
+        self._cache = None
+        self._desc_token_ids = None
+        self._desc_hashes = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._load()
+        return self._model
+
+    def _load(self):
+        # ==================== CrossEncoder 加载 + 强制修复 pad_token 问题 ====================
+        print(f"Loading CrossEncoder: {self.model_name} (backend: {self.backend})")
+        with self._timer():
+            reranker = load_cross_encoder(self.model_name, self.backend, EMBEDDING_CACHE_DIR, max_length=512)
+
+            # 关键修复：很多模型（Qwen2/Llama/GPT2）没有 pad_token，导致 batch > 1 报错
+            if reranker.tokenizer.pad_token is None:
+                print("No pad_token found in CrossEncoder tokenizer, setting to eos_token...")
+                reranker.tokenizer.pad_token = reranker.tokenizer.eos_token
+                if hasattr(reranker.model.config, "pad_token_id"):
+                    reranker.model.config.pad_token_id = reranker.tokenizer.eos_token_id
+            self._model = reranker
+        print("CrossEncoder loaded and pad_token fixed.")
+        # ===============================================================================
+
+    def set_techniques(self, techniques):
+        """知识库热更新后换成新的技术表；预切的 token 和描述哈希下次用到时重新计算，模型不重新加载。"""
+        self.techniques = techniques
+        self._desc_token_ids = None
+        self._desc_hashes = None
+
+    @property
+    def cache(self):
+        if self._cache is None and self.use_cache:
+            self._cache = RerankScoreCache(f"{self.model_name}@{self.backend}", desc_budget=RERANK_DESC_MAX_TOKENS)
+        return self._cache
+
+    @property
+    def desc_hashes(self):
+        """技术描述的哈希，作为分数缓存 key 的一部分：知识库更新后旧分数自动失效。"""
+        if self._desc_hashes is None:
+            self._desc_hashes = {tid: short_hash(info["description"]) for tid, info in self.techniques.items()}
+        return self._desc_hashes
+
+    def _prepare_inputs(self):
+        """
+        所有技术描述只用 Cross-Encoder 的 tokenizer 切一次（可按 RERANK_DESC_MAX_TOKENS 预先截断）。
+        只在确实有 pair 要送进模型时才调用，全部命中缓存时不会加载 Cross-Encoder。
+        """
+        if self._desc_token_ids is not None:
+            return
+        tokenizer = self.model.tokenizer
+        budget = min(RERANK_DESC_MAX_TOKENS or 512, 512)
+        tids = list(self.techniques)
+        descriptions = [self.techniques[tid]["description"] for tid in tids]
+        encoded = tokenizer(descriptions, add_special_tokens=False, truncation=True, max_length=budget)
+        self._desc_token_ids = dict(zip(tids, encoded["input_ids"]))
+
+    def _score_pairs(self, pairs, batch_size):
+        """pairs: [(query_ids, tid), ...]，用预切好的 token 拼成模型输入，返回分数列表。"""
+        if is_registered_backend(self.backend):
+            # 基准用的替身后端（benchmarks/stub_backend.py）直接按 token id 打分
+            return [self.model.model.score(q_ids, self._desc_token_ids[tid]) for q_ids, tid in pairs]
+
+        import torch
+
+        tokenizer = self.model.tokenizer
+        model = self.model.model
+        model.eval()
+        # 与 CrossEncoder.predict 相同：单标签模型输出过 Sigmoid
+        activation = _activation(self.model)
+
+        scores = []
+        for i in range(0, len(pairs), batch_size):
+            features = [
+                tokenizer.prepare_for_model(
+                    q_ids, self._desc_token_ids[tid],
+                    truncation="longest_first", max_length=512, add_special_tokens=True
+                )
+                for q_ids, tid in pairs[i:i + batch_size]
+            ]
+            batch = tokenizer.pad(features, padding=True, return_tensors="pt")
+            batch = {key: value.to(model.device) for key, value in batch.items()}
+            with torch.no_grad():
+                logits = model(**batch).logits
+                if activation is not None:
+                    logits = activation(logits)
+            logits = logits.float().cpu().numpy()
+            scores.extend(logits[:, 0] if logits.shape[1] == 1 else logits.max(axis=1))
+        return [float(s) for s in scores]
+
+    def rerank_batch(self, queries, candidates_list, batch_size=RERANK_BATCH_SIZE):
+        """
+        - 已缓存的 (query, technique) 分数直接复用，只把未命中的 pair 送进模型
+        - 技术描述预先 tokenize，每条 query 也只 tokenize 一次
+        """
+        cache = self.cache
+
+        flat = [(query, tid) for query, candidates in zip(queries, candidates_list) for tid, _ in candidates]
+        keys = [cache.make_key(q, tid, self.desc_hashes[tid]) if cache else None for q, tid in flat]
+        found = cache.get_many(keys) if cache else {}
+
+        # 未命中的 pair：每条 query 只 tokenize 一次
+        query_ids = {}
+        todo, todo_keys = [], []
+        for (query, tid), key in zip(flat, keys):
+            if key in found:
+                continue
+            self._prepare_inputs()
+            if query not in query_ids:
+                query_ids[query] = self.model.tokenizer(query, add_special_tokens=False)["input_ids"]
+            todo.append((query_ids[query], tid))
+            todo_keys.append(key)
+
+        metrics.count("rerank.pairs_total", len(keys))
+        metrics.count("rerank.pairs_scored", len(todo))
+        computed = []
+        if todo:
+            with metrics.timer("rerank.model_forward"):
+                computed = self._score_pairs(todo, batch_size)
+        if cache:
+            cache.pairs_total += len(keys)
+            cache.pairs_scored += len(todo)
+            cache.put_many(zip(todo_keys, computed))
+
+        computed_iter = iter(computed)
+        scores = [found[k] if k in found else next(computed_iter) for k in keys]
+
+        results = []
+        offset = 0
+        for candidates in candidates_list:
+            n = len(candidates)
+            reranked = list(zip([c[0] for c in candidates], scores[offset:offset + n]))
+            reranked.sort(key=lambda x: x[1], reverse=True)
+            results.append(reranked)
+            offset += n
+        return results
+
+
+def _activation(cross_encoder):
+    """
+    CrossEncoder.predict 用的输出激活：新版 sentence-transformers 是 activation_fn，
+    v2/v3 是 default_activation_function（旧版 activation_fct）；都没有时按 num_labels 推断，与 ONNX 后端一致。
+    """
+    for name in ("activation_fn", "default_activation_function", "activation_fct"):
+        activation = getattr(cross_encoder, name, None)
+        if activation is not None:
+            return activation
+    import torch
+
+    config = getattr(getattr(cross_encoder, "model", None), "config", None)
+    return torch.nn.Sigmoid() if getattr(config, "num_labels", 1) == 1 else torch.nn.Identity()
@@ -0,0 +1,313 @@
+# mitre/snapshot.py
+# 知识库的紧凑二进制快照：JSON 只在第一次（或文件变化后）解析一次，之后各进程直接 mmap 快照文件。
+# 文件格式（小端）：
+#   8 字节魔数 | uint64 头长度 | JSON 头（字段表、tactic / platform 名表、各数组的 dtype / shape / 偏移）| 64 字节对齐的数组区
+# 数组：
+#   ids            技术 ID（定长字节串），顺序与 JSON 中一致
+#   parent         父技术的整数下标，-1 表示不是子技术或父技术不在库里
+#   tactic_bits    每个技术的 tactic 位集 (uint64)，platform_bits 同理，用于按 tactic / platform 过滤
+#   <list>_seq/off 每个技术的 tactic / platform 下标序列（保留 JSON 里的原始顺序）
+#   <str>_data/off 字符串池（UTF-8 拼接 + 偏移），name / description / url 等
+#   extra_data/off 其余字段（如 data_sources）按技术存成 JSON，用到时才解码
+# 记录对象 TechniqueRecord 用 __slots__，保留 dict 风格的 info["name"] / info.get("tactics", []) 访问方式，
+# 大字段（description 等）第一次访问时才从 mmap 解码。
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from utils.atomic import tmp_path
+
+MAGIC = b"MITREKB1"
+FORMAT_VERSION = 1
+ALIGN = 64
+STRING_FIELDS = ("technique_id", "name", "description", "url", "version", "created", "modified")
+LIST_FIELDS = ("tactics", "platforms")
+# 记录对象构建时就解码的字段（小、几乎每次都用到）；其余字段第一次访问时才解码
+EAGER_FIELDS = ("technique_id", "name", "tactics", "platforms", "is_subtechnique")
+_MISSING = object()
+
+
+class TechniqueRecord:
+    """单个技术的只读记录，支持 record["name"] / record.get(...) / record.items()，与原来的 dict 用法兼容。"""
+
+    __slots__ = ("_snapshot", "index", "technique_id", "name", "tactics", "platforms", "is_subtechnique",
+                 "parent", "_lazy")
+
+    def __init__(self, snapshot, index, technique_id, name, tactics, platforms, is_subtechnique, parent):
+        self._snapshot = snapshot
+        self.index = index
+        self.technique_id = technique_id
+        self.name = name
+        self.tactics = tactics
+        self.platforms = platforms
+        self.is_subtechnique = is_subtechnique
+        self.parent = parent
+        # 已按需解码的字段
+        self._lazy = None
+
+    def _field(self, key):
+        if self._lazy is None:
+            self._lazy = {}
+        value = self._lazy.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._lazy[key] = self._snapshot._decode_field(self.index, key)
+        return value
+
+    def keys(self):
+        return self._snapshot.field_order[self.index]
+
+    def __getitem__(self, key):
+        if key in EAGER_FIELDS:
+            if key not in self._snapshot.core_fields:
+                return self._field(key)
+            return getattr(self, key)
+        return self._field(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"TechniqueRecord({self.technique_id!r}, {self.name!r})"
+
+
+def _string_pool(values):
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def name_bits(lists, names):
+    """每个技术的 tactic / platform 名列表 -> uint64 位集（第 j 位对应 names[j]）。"""
+    lookup = {name: j for j, name in enumerate(names)}
+    return np.array([sum(1 << lookup[v] for v in set(values)) for values in lists], dtype=np.uint64)
+
+
+def name_mask(names, table, kind):
+    """过滤条件里的名字 -> 与 name_bits 对应的位掩码；不在 table 里的名字抛 ValueError。"""
+    lookup = {name: j for j, name in enumerate(table)}
+    unknown = [n for n in names if n not in lookup]
+    if unknown:
+        raise ValueError(f"Unknown {kind}: {unknown!r}, expected some of {list(table)}")
+    return np.uint64(sum(1 << lookup[n] for n in names))
+
+
+def _index_pool(lists, names):
+    lookup = {name: i for i, name in enumerate(names)}
+    seq = [lookup[v] for values in lists for v in values]
+    offsets = np.zeros(len(lists) + 1, dtype=np.int32)
+    offsets[1:] = np.cumsum([len(values) for values in lists])
+    return np.asarray(seq, dtype=np.uint8), offsets, name_bits(lists, names)
+
+
+def build_snapshot(techniques, path, source_sha256=None, filter_ics=None):
+    """把 {tid: info} 写成快照文件（先写本写者独有的临时文件再 rename，并发构建互不干扰）。"""
+    tids = list(techniques)
+    infos = [techniques[tid] for tid in tids]
+
+    # 所有技术都有、类型也对得上的字段存成列；其余字段（以及缺失情况）放进每条记录的 extra JSON
+    core_strings = [f for f in STRING_FIELDS if all(isinstance(i.get(f), str) for i in infos)]
+    core_lists = [f for f in LIST_FIELDS if all(isinstance(i.get(f), list) for i in infos)]
+    core_bool = all(isinstance(i.get("is_subtechnique"), bool) for i in infos)
+    core = set(core_strings) | set(core_lists) | ({"is_subtechnique"} if core_bool else set())
+
+    tactics = sorted({t for i in infos for t in i.get("tactics", [])}) if "tactics" in core_lists else []
+    platforms = sorted({p for i in infos for p in i.get("platforms", [])}) if "platforms" in core_lists else []
+    if len(tactics) > 64 or len(platforms) > 64:
+        raise ValueError("More than 64 distinct tactics / platforms do not fit in a uint64 bitset")
+
+    index = {tid: n for n, tid in enumerate(tids)}
+    arrays = {
+        "ids": np.array([tid.encode("ascii") for tid in tids]),
+        "parent": np.array([
+            index.get(tid.split(".")[0], -1) if "." in tid else -1 for tid in tids
+        ], dtype=np.int32),
+    }
+    if core_bool:
+        arrays["is_sub"] = np.array([i["is_subtechnique"] for i in infos], dtype=np.bool_)
+    for field, names in (("tactics", tactics), ("platforms", platforms)):
+        if field in core_lists:
+            seq, off, bits = _index_pool([i[field] for i in infos], names)
+            arrays[f"{field}_seq"], arrays[f"{field}_off"], arrays[f"{field}_bits"] = seq, off, bits
+    for field in core_strings:
+        arrays[f"{field}_data"], arrays[f"{field}_off"] = _string_pool([i[field] for i in infos])
+    extras = [
+        {k: v for k, v in info.items() if k not in core} for info in infos
+    ]
+    arrays["extra_data"], arrays["extra_off"] = _string_pool([json.dumps(e, ensure_ascii=False) for e in extras])
+
+    # 每条记录的字段顺序（去重后存表 + 每条一个下标），keys() / items() 与原 dict 一致
+    order_index = {}
+    for info in infos:
+        order_index.setdefault(tuple(info.keys()), len(order_index))
+    field_orders = [list(keys) for keys in order_index]
+    arrays["field_order"] = np.array([order_index[tuple(info.keys())] for info in infos], dtype=np.int32)
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "source_sha256": source_sha256,
+        "filter_ics": filter_ics,
+        "count": len(tids),
+        "core_strings": core_strings,
+        "core_lists": core_lists,
+        "core_bool": core_bool,
+        "field_orders": field_orders,
+        "tactics": tactics,
+        "platforms": platforms,
+        "arrays": {},
+    }
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += -(-array.nbytes // ALIGN) * ALIGN
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = tmp_path(path)
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).tobytes())
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+class KnowledgeBaseSnapshot:
+    """
+    mmap 打开的快照。techniques 是 {tid: TechniqueRecord}（与 JSON 顺序一致），
+    数组字段（parent / tactic_bits / platform_bits）可直接做向量化过滤。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._mmap = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._mmap[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"Not a knowledge base snapshot: {path}")
+        header_len = int(np.frombuffer(self._mmap[len(MAGIC):len(MAGIC) + 8], dtype=np.uint64)[0])
+        header_end = len(MAGIC) + 8 + header_len
+        self.header = json.loads(bytes(self._mmap[len(MAGIC) + 8:header_end]).decode("utf-8"))
+        data_start = -(-header_end // ALIGN) * ALIGN
+
+        self.arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"])) if spec["shape"] else 1
+            start = data_start + spec["offset"]
+            self.arrays[name] = np.frombuffer(
+                self._mmap, dtype=dtype, count=count, offset=start).reshape(spec["shape"])
+
+        self.tactic_names = self.header["tactics"]
+        self.platform_names = self.header["platforms"]
+        self.core_fields = set(self.header["core_strings"]) | set(self.header["core_lists"])
+        if self.header["core_bool"]:
+            self.core_fields.add("is_subtechnique")
+        field_orders = [tuple(keys) for keys in self.header["field_orders"]]
+        self.field_order = [field_orders[j] for j in self.arrays["field_order"].tolist()]
+
+        # 字符串池：memoryview 直接指向 mmap（不拷贝），偏移转成 Python 列表以便快速切片
+        self._pools = {
+            field: (memoryview(self.arrays[f"{field}_data"]), self.arrays[f"{field}_off"].tolist())
+            for field in self.header["core_strings"] + ["extra"]
+        }
+        self.ids = [b.decode("ascii") for b in self.arrays["ids"]]
+        self.index = {tid: i for i, tid in enumerate(self.ids)}
+        self.parent = self.arrays["parent"]
+        zeros = np.zeros(len(self.ids), dtype=np.uint64)
+        self.tactic_bits = self.arrays.get("tactics_bits", zeros)
+        self.platform_bits = self.arrays.get("platforms_bits", zeros)
+        self.techniques = self._build_records()
+
+    def _string(self, field, i):
+        data, off = self._pools[field]
+        return bytes(data[off[i]:off[i + 1]]).decode("utf-8")
+
+    def _build_records(self):
+        # 先整体转成 Python 列表 / bytes 再切片，避免逐个 numpy 标量索引
+        n = len(self.ids)
+        core = self.core_fields
+
+        def strings(field):
+            if field not in core:
+                return [None] * n
+            data, off = self._pools[field]
+            data = data.tobytes()
+            return [data[off[i]:off[i + 1]].decode("utf-8") for i in range(n)]
+
+        def name_lists(field, names):
+            if field not in core:
+                return [None] * n
+            seq = [names[j] for j in self.arrays[f"{field}_seq"].tolist()]
+            off = self.arrays[f"{field}_off"].tolist()
+            return [seq[off[i]:off[i + 1]] for i in range(n)]
+
+        technique_ids = strings("technique_id") if "technique_id" in core else self.ids
+        names = strings("name")
+        tactics = name_lists("tactics", self.tactic_names)
+        platforms = name_lists("platforms", self.platform_names)
+        is_sub = self.arrays["is_sub"].tolist() if "is_sub" in self.arrays else [None] * n
+        parents = self.parent.tolist()
+        return {
+            tid: TechniqueRecord(self, i, technique_ids[i], names[i], tactics[i], platforms[i], is_sub[i], parents[i])
+            for i, tid in enumerate(self.ids)
+        }
+
+    def _decode_field(self, i, key):
+        """按需解码单个字段：核心字符串列直接切字符串池，其余字段从该技术的 extra JSON 里取（缺失时 KeyError）。"""
+        if key in self._pools and key != "extra":
+            return self._string(key, i)
+        if key not in self.field_order[i]:
+            raise KeyError(key)
+        return json.loads(self._string("extra", i))[key]
+
+
+def snapshot_path(cache_dir, source_sha256, filter_ics):
+    raw = json.dumps({"source": source_sha256, "filter_ics": filter_ics, "version": FORMAT_VERSION})
+    return os.path.join(cache_dir, f"mitre_kb.{hashlib.sha256(raw.encode()).hexdigest()[:16]}.snap")
+
+
+def load_techniques_json(path, filter_ics):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        tid: info for tid, info in data["techniques"].items()
+        if not (filter_ics and tid.startswith("T0"))  # 简单粗暴过滤 T0 开头的 ICS ID
+    }
+
+
+def load_snapshot(source_path, source_sha256, filter_ics, cache_dir):
+    """读取（必要时先构建）快照，返回 (KnowledgeBaseSnapshot, 是否新构建)。"""
+    path = snapshot_path(cache_dir, source_sha256, filter_ics)
+    built = False
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        build_snapshot(load_techniques_json(source_path, filter_ics), path, source_sha256, filter_ics)
+        print(f"Knowledge base snapshot built: {path} ({time.perf_counter() - start:.3f}s)")
+        built = True
+    return KnowledgeBaseSnapshot(path), built
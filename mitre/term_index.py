@@ -0,0 +1,91 @@
+# mitre/term_index.py
+
+import re
+from collections import defaultdict
+
+import numpy as np
+
+# 与 RAGRetriever._keyword_boost 原实现相同的 query 关键词规则
+KEYWORD_PATTERN = re.compile(r'\b[a-zA-Z]{3,}\b')
+# 技术文本 (name + description) 切成最长的连续小写字母串
+TOKEN_PATTERN = re.compile(r'[a-z]+')
+
+EMPTY_POSTINGS = np.zeros(0, dtype=np.int32)
+
+
+class TermIndex:
+    """
+    词 -> 技术 的倒排索引（数组形式的稀疏 term-technique 矩阵），知识库加载时构建一次。
+    mode:
+      - "substring"：与原实现完全一致，关键词只要是 (name + " " + description).lower() 的子串就算命中。
+        关键词全是字母，它的任何一次出现都落在某个连续字母串里，所以只需在词表里找包含它的词，
+        再合并这些词的 posting list；结果按关键词缓存，同一个词只算一次。
+      - "token"：关键词必须与整词相同（更快，也更严格，"dump" 不再命中 "dumping"）。
+    """
+
+    MODES = ("substring", "token")
+
+    def __init__(self, techniques: dict, mode: str = "substring"):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown keyword boost mode: {mode!r}, expected one of {self.MODES}")
+        self.mode = mode
+        self.tech_ids = list(techniques)
+        self.index = {tid: i for i, tid in enumerate(self.tech_ids)}
+
+        postings = defaultdict(list)
+        for i, tid in enumerate(self.tech_ids):
+            info = techniques[tid]
+            content = (info['name'] + " " + info['description']).lower()
+            for token in set(TOKEN_PATTERN.findall(content)):
+                postings[token].append(i)
+        self._token_postings = {t: np.array(ix, dtype=np.int32) for t, ix in postings.items()}
+        self._substring_postings = {}
+
+        # 词表的 trigram 索引：子串查询时只需检查与关键词共享最稀有 trigram 的那几个词
+        trigram_tokens = defaultdict(list)
+        for token in self._token_postings:
+            for g in {token[i:i + 3] for i in range(len(token) - 2)}:
+                trigram_tokens[g].append(token)
+        self._trigram_tokens = dict(trigram_tokens)
+
+    @staticmethod
+    def keywords(text: str):
+        return set(KEYWORD_PATTERN.findall(text.lower()))
+
+    def postings(self, keyword: str, mode: str = None):
+        """包含 keyword 的技术下标（升序、无重复）。"""
+        if (mode or self.mode) == "token":
+            return self._token_postings.get(keyword, EMPTY_POSTINGS)
+
+        found = self._substring_postings.get(keyword)
+        if found is None:
+            grams = [keyword[i:i + 3] for i in range(len(keyword) - 2)]
+            rarest = min(grams, key=lambda g: len(self._trigram_tokens.get(g, ())))
+            parts = [
+                self._token_postings[token]
+                for token in self._trigram_tokens.get(rarest, ())
+                if keyword in token
+            ]
+            found = np.unique(np.concatenate(parts)) if parts else EMPTY_POSTINGS
+            self._substring_postings[keyword] = found
+        return found
+
+    def match_counts(self, text: str, mode: str = None):
+        """每个技术命中了 text 中多少个不同的关键词，返回长度为技术数的 int32 数组。"""
+        counts = np.zeros(len(self.tech_ids), dtype=np.int32)
+        for kw in self.keywords(text):
+            counts[self.postings(kw, mode)] += 1
+        return counts
+
+    def match_counts_batch(self, texts, mode: str = None):
+        """批量版本，返回 (len(texts), 技术数) 的矩阵。"""
+        counts = np.zeros((len(texts), len(self.tech_ids)), dtype=np.int32)
+        for row, text in enumerate(texts):
+            for kw in self.keywords(text):
+                counts[row, self.postings(kw, mode)] += 1
+        return counts
+
+    def lookup(self, counts, candidates):
+        """从 match_counts 的结果里一次性取出候选列表对应的命中数。"""
+        idx = np.fromiter((self.index[tid] for tid, _ in candidates), dtype=np.int64, count=len(candidates))
+        return counts[idx]
@@ -0,0 +1,88 @@
+# service/batcher.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    把并发到达的单条请求凑成微批次交给 batch_func 处理（线程安全）：
+    后台线程取到第一条后最多再等 max_wait 秒，或凑满 max_batch_size 条就立即执行。
+    batch_func(items) 必须按顺序返回等长的结果列表；抛异常时这一批的所有请求都收到该异常。
+    """
+
+    def __init__(self, batch_func, max_batch_size=32, max_wait=0.01, name="micro-batcher"):
+        self.batch_func = batch_func
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._closed = False
+
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                # 关闭信号放回去，处理完这一批再退出
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_func(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"batch_func returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            self.batches += 1
+            self.items += len(items)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
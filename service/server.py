@@ -0,0 +1,190 @@
+# service/server.py
+# 常驻抽取服务：MITREKnowledgeBase / RAGRetriever / TTPExtractor 只加载一次，
+# 并发请求的检索阶段（Embedding + 精排）由 MicroBatcher 凑成批次走 retrieve_batch，LLM 调用仍按请求并发。
+#   python -m service.server [--port 8000] [--api-url http://127.0.0.1:8001/v1/chat/completions]
+#   curl -X POST localhost:8000/extract -d '{"text": "captures window titles."}'
+# GET /health 返回 ok，GET /stats 返回批处理 / 缓存 / 分阶段耗时统计，GET /metrics 为 Prometheus 文本格式。
+# POST /reload（可选 {"path": ...}）热更新知识库 (MITREKnowledgeBase.reload)，不中断正在处理的请求；
+# path 必须位于 MITRE_KNOWLEDGE_BASE 所在目录下，否则返回 400。
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import (
+    SERVICE_HOST, SERVICE_PORT, SERVICE_MAX_BATCH_SIZE, SERVICE_MAX_WAIT_MS, MAX_CONCURRENCY,
+    MITRE_KNOWLEDGE_BASE,
+)
+from llm.llm_client import LLMClient
+from llm.ttp_extractor import TTPExtractor
+from mitre.knowledge_base import MITREKnowledgeBase
+from mitre.rag_retriever import RAGRetriever
+from utils.instrument import metrics
+from .batcher import MicroBatcher
+
+
+class ExtractionService:
+
+    def __init__(self, kb=None, llm=None, max_batch_size=SERVICE_MAX_BATCH_SIZE,
+                 max_wait_ms=SERVICE_MAX_WAIT_MS, max_concurrency=MAX_CONCURRENCY):
+        self.kb = kb or MITREKnowledgeBase()
+        self.retriever = RAGRetriever(self.kb)
+        self.extractor = TTPExtractor(self.retriever, llm=llm)
+        self.batcher = MicroBatcher(self.retriever.retrieve_batch, max_batch_size, max_wait_ms / 1000.0)
+        # 同时在途的 LLM 请求数，与 main.py 的 MAX_CONCURRENCY 含义相同
+        self._llm_slots = threading.BoundedSemaphore(max_concurrency)
+
+    def warmup(self):
+        """启动时先跑一条，模型加载不算进第一个请求的延迟。"""
+        self.retriever.retrieve_batch(["warmup"])
+
+    def extract(self, text):
+        start = time.perf_counter()
+        candidates = self.batcher(text)
+        retrieved = time.perf_counter()
+        with self._llm_slots:
+            prediction, analysis, candidates_raw = self.extractor.extract(text, candidates=candidates)
+        done = time.perf_counter()
+        return {
+            "prediction": prediction,
+            "analysis": analysis[0],
+            "candidates": [c["technique_id"] for c in candidates_raw],
+            "timings_ms": {
+                "retrieve": round(1000 * (retrieved - start), 2),
+                "llm": round(1000 * (done - retrieved), 2),
+            },
+        }
+
+    def reload(self, path=None):
+        """path 为空时重新加载当前知识库文件；否则只接受知识库目录下已存在的文件（ValueError）。"""
+        if path is not None:
+            path = _resolve_kb_path(path)
+        return self.kb.reload(path)
+
+    def stats(self):
+        stats = {"kb_version": self.kb.version, "batcher": self.batcher.stats(), "llm_cache": self.extractor.llm.cache.stats()}
+        if self.kb.rerank_cache:
+            stats["rerank_cache"] = self.kb.rerank_cache.stats()
+        stats["metrics"] = metrics.to_dict()
+        return stats
+
+    def close(self):
+        self.batcher.close()
+
+
+def _resolve_kb_path(path):
+    if not isinstance(path, str) or not path:
+        raise ValueError("'path' must be a non-empty string")
+    kb_dir = os.path.realpath(os.path.dirname(MITRE_KNOWLEDGE_BASE) or ".")
+    resolved = os.path.realpath(path)
+    if os.path.commonpath([kb_dir, resolved]) != kb_dir:
+        raise ValueError(f"'path' must be under {kb_dir}")
+    if not os.path.isfile(resolved):
+        raise ValueError(f"no such knowledge base file: {path}")
+    return resolved
+
+
+class ExtractionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 头和正文分两次写出，不关 Nagle 时 keep-alive 连接上每个请求会多等一个 delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/stats":
+            self._send_json(200, self.server.service.stats())
+        elif self.path == "/metrics":
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path == "/reload":
+            self._reload()
+            return
+        if self.path != "/extract":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            text = body["text"]
+            if not isinstance(text, str) or not text.strip():
+                raise ValueError("'text' must be a non-empty string")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": f"bad request: {e}"})
+            return
+        try:
+            self._send_json(200, self.server.service.extract(text))
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def _reload(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self._send_json(200, self.server.service.reload(body.get("path")))
+        except (ValueError, AttributeError) as e:
+            self._send_json(400, {"error": f"bad request: {e}"})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ExtractionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service, host=SERVICE_HOST, port=SERVICE_PORT):
+        super().__init__((host, port), ExtractionHandler)
+        self.service = service
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--api-url", default=None, help="覆盖 GPT_API_URL，例如指向 benchmarks/mock_llm.py")
+    parser.add_argument("--max-batch-size", type=int, default=SERVICE_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=SERVICE_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    service = ExtractionService(
+        llm=LLMClient(api_url=args.api_url),
+        max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms,
+    )
+    service.warmup()
+    server = ExtractionServer(service, args.host, args.port)
+    print(f"Extraction service listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
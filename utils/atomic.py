@@ -0,0 +1,12 @@
+# utils/atomic.py
+# 缓存文件的原子写入：先写到同目录下每个写者独有的临时文件，再 os.replace 到目标路径。
+# 多个进程（分片 worker）或线程（/reload）同时生成同一个缓存文件时各写各的临时文件，
+# 最后一次 rename 生效，读者不会看到写了一半或多个写者交错的内容。
+
+import os
+import threading
+
+
+def tmp_path(path):
+    """与 path 同目录、按进程号和线程号区分的临时文件名。"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
@@ -0,0 +1,287 @@
+# utils/instrument.py
+# 轻量的分阶段耗时统计：
+#   from utils.instrument import metrics
+#   with metrics.timer("retrieve.dense_search"):   # 耗时记入同名直方图
+#       ...
+#   metrics.count("llm.retries")                   # 计数器
+#   metrics.observe("extract.prompt_tokens", n)    # 任意数值的直方图
+# 运行结束后 metrics.summary_table() 打印汇总，metrics.export(path) 写出 JSON（.json）或 Prometheus 文本格式（其他后缀）。
+# 关闭时 (INSTRUMENT_ENABLED = False) timer() 直接返回一个共享的空上下文，count / observe 立即返回，开销可以忽略。
+# PROFILE_STAGE 设为某个阶段名时，只对该阶段开启 cProfile，结束后写到 PROFILE_OUTPUT；
+# 阶段都是普通函数调用，py-spy record / dump 直接能看到各阶段的调用栈，不需要额外钩子。
+
+import bisect
+import json
+import math
+import threading
+import time
+from contextlib import nullcontext
+
+from config import INSTRUMENT_ENABLED, PROFILE_STAGE, PROFILE_OUTPUT
+
+_NULL = nullcontext()
+
+
+def _bucket_bounds(low=1e-6, high=1e4, factor=1.5):
+    """对数等比的桶边界：1µs ~ 10000（秒或任意单位），相邻边界相差 1.5 倍，分位数估计误差 < 25%。"""
+    bounds = []
+    value = low
+    while value < high:
+        bounds.append(value)
+        value *= factor
+    return bounds
+
+
+BUCKET_BOUNDS = _bucket_bounds()
+
+
+class Histogram:
+    """固定对数桶的直方图：记录 count / sum / min / max，分位数由桶估计，内存与样本数无关。"""
+
+    __slots__ = ("counts", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                # 桶内按上下边界线性插值，再夹到实际观测到的 min / max 之内
+                lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0.0
+                upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                value = lower + (upper - lower) * (rank - (seen - n)) / n
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "max": self.max if self.count else 0.0,
+        }
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "start", "profiling")
+
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.profiling = False
+
+    def __enter__(self):
+        if self.name == self.registry.profile_stage:
+            self.profiling = self.registry._profile_start()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.profiling:
+            self.registry._profile_stop()
+        self.registry.observe(self.name, elapsed, kind="timer")
+
+
+class Metrics:
+    """计时器 / 计数器 / 直方图的注册表（线程安全）。"""
+
+    def __init__(self, enabled=INSTRUMENT_ENABLED, profile_stage=PROFILE_STAGE, profile_output=PROFILE_OUTPUT):
+        self.enabled = enabled
+        self.profile_stage = profile_stage
+        self.profile_output = profile_output
+        self.counters = {}
+        self.histograms = {}
+        # 名字 -> "timer" | "histogram"，决定导出时的单位
+        self.kinds = {}
+        self._lock = threading.Lock()
+        self._profiler = None
+        # cProfile 同一时间只能在一个线程里开启，其他线程的同名阶段照常计时但不进 profile
+        self._profile_lock = threading.Lock()
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """装饰器版本的 timer。"""
+        def decorator(func):
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            wrapper.__name__ = func.__name__
+            wrapper.__doc__ = func.__doc__
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value, kind="histogram"):
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+                self.kinds[name] = kind
+            hist.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.kinds.clear()
+
+    # ---------- cProfile ----------
+
+    def _profile_start(self):
+        if not self._profile_lock.acquire(blocking=False):
+            return False
+        import cProfile
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return True
+
+    def _profile_stop(self):
+        self._profiler.disable()
+        self._profile_lock.release()
+
+    def dump_profile(self):
+        """把累计的 cProfile 结果写到 profile_output（可用 snakeviz / pstats 查看），返回路径。"""
+        if self._profiler is None:
+            return None
+        self._profiler.dump_stats(self.profile_output)
+        return self.profile_output
+
+    # ---------- 多进程汇总 ----------
+
+    def snapshot(self):
+        """可 pickle 的快照，worker 进程返回给父进程后用 merge() 累加。"""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: (self.kinds[name], hist) for name, hist in self.histograms.items()},
+            }
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, n in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            for name, (kind, other) in snapshot["histograms"].items():
+                hist = self.histograms.get(name)
+                if hist is None:
+                    hist = self.histograms[name] = Histogram()
+                    self.kinds[name] = kind
+                hist.merge(other)
+
+    # ---------- 输出 ----------
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "counters": dict(sorted(self.counters.items())),
+                "timers_seconds": {
+                    name: hist.to_dict() for name, hist in sorted(self.histograms.items())
+                    if self.kinds[name] == "timer"
+                },
+                "histograms": {
+                    name: hist.to_dict() for name, hist in sorted(self.histograms.items())
+                    if self.kinds[name] != "timer"
+                },
+            }
+
+    def summary_table(self):
+        data = self.to_dict()
+        lines = []
+        if data["timers_seconds"]:
+            lines.append(f"{'stage':<32}{'count':>9}{'total s':>10}{'mean ms':>10}"
+                         f"{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+            for name, h in data["timers_seconds"].items():
+                lines.append(f"{name:<32}{h['count']:>9}{h['sum']:>10.2f}{1000 * h['mean']:>10.2f}"
+                             f"{1000 * h['p50']:>10.2f}{1000 * h['p99']:>10.2f}{1000 * h['max']:>10.2f}")
+        if data["histograms"]:
+            lines.append(f"{'histogram':<32}{'count':>9}{'mean':>10}{'p50':>10}{'p99':>10}{'max':>10}")
+            for name, h in data["histograms"].items():
+                lines.append(f"{name:<32}{h['count']:>9}{h['mean']:>10.1f}{h['p50']:>10.1f}"
+                             f"{h['p99']:>10.1f}{h['max']:>10.1f}")
+        if data["counters"]:
+            lines.append(f"{'counter':<32}{'value':>9}")
+            for name, n in data["counters"].items():
+                lines.append(f"{name:<32}{n:>9}")
+        return "\n".join(lines) if lines else "(no metrics recorded)"
+
+    def to_prometheus(self, prefix="ttp"):
+        """Prometheus 文本格式：计时器为 <name>_seconds 直方图，计数器为 <name>_total。"""
+        def metric_name(name, suffix=""):
+            return f"{prefix}_{name}".replace(".", "_").replace("-", "_") + suffix
+
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items())
+            kinds = dict(self.kinds)
+        lines = []
+        for name, n in counters:
+            metric = metric_name(name, "_total")
+            lines += [f"# TYPE {metric} counter", f"{metric} {n}"]
+        for name, hist in histograms:
+            metric = metric_name(name, "_seconds" if kinds[name] == "timer" else "")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKET_BOUNDS, hist.counts):
+                cumulative += n
+                # 只输出有变化的桶，减少行数（Prometheus 允许稀疏的 le）
+                if n:
+                    lines.append(f'{metric}_bucket{{le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {hist.count}')
+            lines.append(f"{metric}_sum {hist.sum}")
+            lines.append(f"{metric}_count {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """.json 写 JSON，其他后缀写 Prometheus 文本格式（可给 node_exporter textfile collector）。"""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            else:
+                f.write(self.to_prometheus())
+        return path
+
+
+# 进程级单例，各模块直接 import 使用
+metrics = Metrics()
@@ -0,0 +1,142 @@
+# utils/lru.py
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def normalize_text(text):
+    """去掉首尾空白并把连续空白压成一个空格，作为去重 / 记忆化的 key。"""
+    return " ".join(str(text).split())
+
+
+class LRUCache:
+    """
+    进程内 LRU（线程安全），maxsize=0 时不缓存。
+    get_or_compute() 对同一个 key 只计算一次：并发请求同一 key 时，后到的线程等待第一个线程的结果，
+    不会重复调用 compute（数据集里的重复行同时在途时也只算一次）。
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def get_many(self, keys, default=None):
+        """
+        批量查询，返回与 keys 对应的列表。批内重复的 key 只算一次查询：
+        第一次出现按命中 / 未命中计，之后的重复都计为命中（调用方对未命中的 key 只计算一次），
+        stats() 的 computed / saved 与实际计算次数一致。
+        """
+        results = []
+        seen = set()
+        with self._lock:
+            for key in keys:
+                if key in seen:
+                    self.hits += 1
+                    results.append(self._data.get(key, default))
+                    continue
+                seen.add(key)
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    results.append(self._data[key])
+                else:
+                    self.misses += 1
+                    results.append(default)
+        return results
+
+    def put(self, key, value):
+        if not self.maxsize:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            future = self._inflight.get(key)
+            if future is not None:
+                # 同一 key 正在别的线程里计算
+                self.hits += 1
+                owner = False
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                owner = True
+
+        if not owner:
+            return future.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        self.put(key, value)
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "requests": total,
+            "computed": self.misses,
+            "saved": self.hits,
+            "unique_ratio": self.misses / total if total else 0.0,
+            "entries": len(self._data),
+        }
+
+
+class QueryMemo:
+    """
+    一次运行内按 query 文本（normalize_text 之后）记忆化的中间结果，RAGRetriever 和 TTPExtractor 共用：
+    - embeddings: 扩展后 query -> 向量
+    - retrievals: (知识库版本, query, 过滤条件) -> 最终候选列表
+    - extractions: (知识库版本, query, 候选 ID) -> LLM 抽取结果
+    """
+
+    def __init__(self, maxsize=10000):
+        self.embeddings = LRUCache(maxsize)
+        self.retrievals = LRUCache(maxsize)
+        self.extractions = LRUCache(maxsize)
+
+    @property
+    def enabled(self):
+        return bool(self.retrievals.maxsize)
+
+    def clear(self):
+        for cache in (self.embeddings, self.retrievals, self.extractions):
+            cache.clear()
+
+    def report(self):
+        return {name: cache.stats() for name, cache in
+                (("embeddings", self.embeddings), ("retrievals", self.retrievals), ("extractions", self.extractions))}
@@ -0,0 +1,51 @@
+# utils/rwlock.py
+# 读写锁：检索时持读锁（可多线程并发），知识库热更新 (MITREKnowledgeBase.reload) 交换数据时持写锁。
+#   with lock.read():    ...
+#   with lock.write():   ...
+# 写者优先：有写者在等时新的读者排队，避免写者饿死；同一线程已持有读锁时可重入（嵌套调用不会和等待中的写者死锁）。
+
+import threading
+from contextlib import contextmanager
+
+
+class RWLock:
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read(self):
+        depth = getattr(self._local, "depth", 0)
+        with self._cond:
+            if depth == 0:
+                while self._writer or self._writers_waiting:
+                    self._cond.wait()
+            self._readers += 1
+        self._local.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
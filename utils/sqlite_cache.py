@@ -0,0 +1,166 @@
+# utils/sqlite_cache.py
+
+import os
+import sqlite3
+import threading
+import time
+
+
+class SQLiteLRUCache:
+    """
+    基于 SQLite 的持久化 key-value 缓存，按最近访问时间做 LRU 淘汰。
+    - max_bytes / max_entries：任意一个超限就从最久未访问的条目开始删除
+    - 线程安全（单连接 + 锁），WAL 模式下允许多个进程同时读写同一个文件
+    - 条目数 / 总字节数在打开时统计一次，之后随写入和淘汰增量维护，写入时不再全表扫描；
+      估计值超限时先重新统计一次（其他进程也可能写过同一个文件）再淘汰
+    - 读命中只在内存里记下访问时间，攒够 touch_batch 条、下一次写入或 close() 时再批量写回，
+      读多写少时查询不用每次都拿 SQLite 写锁
+    """
+
+    def __init__(self, path: str, max_bytes: int = None, max_entries: int = None, touch_batch: int = 256):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        # 尚未写回的访问时间 key -> last_access
+        self._touched = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        dirname = os.path.dirname(path)
+        if dirname:
+            os.makedirs(dirname, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+        self._conn.commit()
+        self._count, self._total = self._totals()
+
+    def _totals(self):
+        return self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+
+    def _over_limit(self):
+        return ((self.max_entries and self._count > self.max_entries) or
+                (self.max_bytes and self._total > self.max_bytes))
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """批量查询，返回 {key: value}，未命中的 key 不出现在结果里。"""
+        keys = list(keys)
+        found = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            # SQLite 默认最多 999 个绑定参数
+            for i in range(0, len(keys), 900):
+                part = keys[i:i + 900]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({marks})", part
+                ).fetchall()
+                found.update(rows)
+            for k in found:
+                self._touched[k] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched()
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _flush_touched(self):
+        """把攒下的访问时间写回（调用方持锁并负责 commit）。"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                [(t, k) for k, t in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def put(self, key, value: str):
+        self.put_many([(key, value)])
+
+    def put_many(self, items):
+        now = time.time()
+        rows = [(k, v, len(v.encode("utf-8")), now) for k, v in items]
+        if not rows:
+            return
+        rows = list({row[0]: row for row in rows}.values())
+        with self._lock:
+            # 被覆盖的旧条目先从计数里扣掉（按主键查，不扫表）
+            replaced = {}
+            for i in range(0, len(rows), 900):
+                part = [row[0] for row in rows[i:i + 900]]
+                marks = ",".join("?" * len(part))
+                replaced.update(self._conn.execute(
+                    f"SELECT key, size FROM entries WHERE key IN ({marks})", part
+                ).fetchall())
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            for row in rows:
+                self._touched.pop(row[0], None)
+            # 淘汰按 last_access 排序，先把读命中的访问时间写回
+            self._flush_touched()
+            self._count += len(rows) - len(replaced)
+            self._total += sum(row[2] for row in rows) - sum(replaced.values())
+            if self._over_limit():
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        self._count, self._total = self._totals()
+        while self._over_limit():
+            victims = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY last_access ASC LIMIT 256"
+            ).fetchall()
+            if not victims:
+                break
+            for key, size in victims:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._count -= 1
+                self._total -= size
+                self.evictions += 1
+                if not self._over_limit():
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._touched.clear()
+            self._count, self._total = 0, 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        with self._lock:
+            count, total = self._totals()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()